@@ -0,0 +1,284 @@
+"""
+In-memory database
+==================
+
+Stand-in for `F1Database` holding the drivers, sessions, stints, lap, weather and lap telemetry
+tables in memory. It answers the same calls with the same {"exists": ..., "data": [...]} shapes
+and column sets as the Supabase-backed service, and makes the same number of round trips (reads
+are paged like `database_service.paginate`), each counted in the db.* counters and optionally
+delayed by `latency` seconds to model the network.
+
+    with use_fake_database(FakeF1Database(latency=0.002)) as fake:
+        store_session_stints(2025, "Australia", "HAM", "Race")
+
+"""
+
+import time
+import itertools
+from contextlib import contextmanager
+
+from db_utils.supa_db import DriverData, SessionData, StintData, LapData, LapTelemetryData, WeatherData
+from db_utils.telemetry_codec import decode_telemetry, from_bytea
+from db_utils.database_service import PAGE_SIZE, MAX_ROWS, TELEMETRY_BATCH_SIZE
+from utils.instrumentation import incr
+
+STINT_COLUMNS = ["id", "stint_number", "tyre_compound", "initial_tyre_age", "num_laps"]
+LAP_COLUMNS = ["id", "lap_number", "lap_time", "tyre_age", "sector1_time", "sector2_time", "sector3_time", "weather"]
+WEATHER_COLUMNS = ["id", "time", "air_temp", "track_temp", "pressure", "rainfall", "humidity", "wind_direction", "wind_speed"]
+
+def select(row, columns):
+    return {column: row.get(column) for column in columns}
+
+def get_driver_key(driver_data):
+    # driver_number is an integer column, FastF1 hands it over as a string
+    return driver_data["driver_name"], int(driver_data["driver_number"]), driver_data["team"]
+
+class FakeF1Database:
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.tables = {"drivers": [], "sessions": [], "stints": [], "lap": [], "weather_table": [], "lap_telemetry": []}
+        self._ids = {table: itertools.count(1) for table in self.tables}
+        # Secondary indexes standing in for the database's own
+        self._laps_by_stint = {}
+        self._weather_by_time = {}
+        self._weather_by_id = {}
+        self._telemetry_by_lap = {}
+
+    def _round_trip(self, method="get", rows=0):
+        incr("db.round_trips")
+        incr(f"db.{method}")
+        incr("db.rows", rows)
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _read_pages(self, rows, page_size=PAGE_SIZE, max_rows=MAX_ROWS):
+        """Round trips of `database_service.paginate` reading `rows`: full pages, then a short (maybe empty) one"""
+        page = min(page_size, max_rows)
+        for start in range(0, len(rows) + 1, page):
+            self._round_trip(rows=len(rows[start:start + page]))
+        return rows
+
+    def _insert(self, table, data):
+        row = dict(data, id=next(self._ids[table]))
+        self.tables[table].append(row)
+        self._round_trip("post", 1)
+        return row
+
+    # Existence checks and stores
+
+    def driver_exists(self, driver_data: DriverData) -> dict:
+        rows = [
+            select(row, ["id", "driver_name", "driver_number", "team"]) for row in self.tables["drivers"]
+            if get_driver_key(row) == get_driver_key(driver_data)
+        ]
+        self._round_trip(rows=len(rows))
+        return {"exists": bool(rows), "data": rows or None}
+
+    def session_exists(self, session_data: SessionData) -> dict:
+        rows = [
+            select(row, ["id", "event", "session_type"]) for row in self.tables["sessions"]
+            if (row["event"], row["session_type"], row["year"]) == (session_data["event"], session_data["session_type"], session_data["year"])
+        ]
+        self._round_trip(rows=len(rows))
+        return {"exists": bool(rows), "data": rows or None}
+
+    def weather_exists(self, weather_data: WeatherData) -> dict:
+        row = self._weather_by_time.get(weather_data["time"])
+        self._round_trip(rows=int(row is not None))
+        return {"exists": True, "data": [select(row, ["id", "time"])]} if row else {"exists": False, "data": None}
+
+    def store_driver(self, driver_data: DriverData) -> dict:
+        existing_driver = self.driver_exists(driver_data)
+        if existing_driver["exists"]:
+            return existing_driver
+        return {"exists": False, "data": [self._insert("drivers", dict(driver_data, driver_number=int(driver_data["driver_number"])))]}
+
+    def store_session(self, session_data: SessionData) -> dict:
+        processed_data = session_data.copy()
+        if isinstance(processed_data["weather_type"], str):
+            processed_data["weather_type"] = processed_data["weather_type"].lower() == "wet"
+        existing_session = self.session_exists(processed_data)
+        if existing_session["exists"]:
+            return existing_session
+        return {"exists": False, "data": [self._insert("sessions", processed_data)]}
+
+    def store_stint(self, stint_data: StintData) -> dict:
+        return {"exists": False, "data": [self._insert("stints", stint_data)]}
+
+    def store_lap(self, lap_data: LapData) -> dict:
+        row = self._insert("lap", lap_data)
+        self._laps_by_stint.setdefault(row["stint_id"], []).append(row)
+        return {"exists": False, "data": [row]}
+
+    def store_laps(self, laps: list, batch_size: int = 500) -> dict:
+        stored = []
+        for i in range(0, len(laps), batch_size):
+            batch = laps[i:i + batch_size]
+            for lap_data in batch:
+                row = dict(lap_data, id=next(self._ids["lap"]))
+                self.tables["lap"].append(row)
+                self._laps_by_stint.setdefault(row["stint_id"], []).append(row)
+                stored.append(row)
+            self._round_trip("post", len(batch))
+        return {"exists": False, "data": stored}
+
+    def store_stints(self, stints: list) -> dict:
+        rows = [dict(stint_data, id=next(self._ids["stints"])) for stint_data in stints]
+        self.tables["stints"] += rows
+        self._round_trip("post", len(rows))
+        return {"exists": False, "data": rows}
+
+    def update_stints(self, stints: list) -> dict:
+        by_id = {row["id"]: row for row in self.tables["stints"]}
+        for stint_data in stints:
+            by_id[stint_data["id"]].update(stint_data)
+        self._round_trip("post", len(stints))
+        return {"exists": True, "data": [{"id": stint_data["id"]} for stint_data in stints]}
+
+    def update_session(self, session_id: int, values: dict) -> dict:
+        rows = [row for row in self.tables["sessions"] if row["id"] == session_id]
+        for row in rows:
+            row.update(values)
+        self._round_trip("patch", len(rows))
+        return {"exists": True, "data": [dict(row) for row in rows]}
+
+    def store_lap_telemetries(self, rows: list, batch_size: int = 100) -> dict:
+        for i in range(0, len(rows), batch_size):
+            batch = rows[i:i + batch_size]
+            for lap_telemetry_data in batch:
+                existing = self._telemetry_by_lap.get(lap_telemetry_data["lap_id"])
+                row = dict(lap_telemetry_data, id=existing["id"] if existing else next(self._ids["lap_telemetry"]))
+                if existing:
+                    self.tables["lap_telemetry"].remove(existing)
+                self.tables["lap_telemetry"].append(row)
+                self._telemetry_by_lap[row["lap_id"]] = row
+            self._round_trip("post", len(batch))
+        return {"exists": False, "data": [{"lap_id": row["lap_id"]} for row in rows]}
+
+    def store_lap_telemetry(self, lap_telemetry_data: LapTelemetryData) -> dict:
+        return self.store_lap_telemetries([lap_telemetry_data])
+
+    def store_weather(self, weather_data: WeatherData) -> dict:
+        existing_weather = self.weather_exists(weather_data)
+        if existing_weather["exists"]:
+            return existing_weather
+        row = self._insert("weather_table", weather_data)
+        self._weather_by_time[row["time"]] = row
+        self._weather_by_id[row["id"]] = row
+        return {"exists": False, "data": [row]}
+
+    # Reads
+
+    def get_driver_id(self, driver_data: DriverData) -> int:
+        rows = self.driver_exists(driver_data)["data"]
+        return rows[0]["id"] if rows else None
+
+    def get_all_drivers(self, page_size: int = PAGE_SIZE) -> list:
+        return self._read_pages([dict(row) for row in self.tables["drivers"]], page_size) or None
+
+    def _get_stints(self, driver_id, session_id, page_size=PAGE_SIZE):
+        stints = sorted(
+            (row for row in self.tables["stints"] if row["driver_id"] == driver_id and row["session_id"] == session_id),
+            key=lambda row: row["stint_number"]
+        )
+        return self._read_pages([select(row, STINT_COLUMNS) for row in stints], page_size)
+
+    def get_driver_stints(self, driver_data: DriverData, event: str, year: int, page_size: int = PAGE_SIZE) -> list:
+        driver_id = self.get_driver_id(driver_data)
+        if not driver_id:
+            return []
+        sessions = self._read_pages([row for row in self.tables["sessions"] if row["event"] == event and row["year"] == year], page_size)
+        all_stints = []
+        for session in sessions:
+            for stint in self._get_stints(driver_id, session["id"], page_size):
+                stint["session_type"] = session["session_type"]
+                stint["session_id"] = session["id"]
+                stint["session_date"] = session["date"]
+                all_stints.append(stint)
+        return all_stints
+
+    def get_driver_stints_by_session(self, driver_data: DriverData, event: str, year: int, session_type: str, page_size: int = PAGE_SIZE) -> list:
+        driver_id = self.get_driver_id(driver_data)
+        if not driver_id:
+            return []
+        sessions = [
+            row for row in self.tables["sessions"]
+            if row["event"] == event and row["year"] == year and row["session_type"] == session_type
+        ]
+        self._round_trip(rows=len(sessions))
+        if not sessions:
+            return []
+        session = sessions[0]
+        stints = self._get_stints(driver_id, session["id"], page_size)
+        for stint in stints:
+            stint["session_type"] = session_type
+            stint["session_id"] = session["id"]
+            stint["session_weather"] = session["weather_type"]
+        return stints
+
+    def get_stint_laps(self, stint_id: int, page_size: int = PAGE_SIZE) -> list:
+        laps = sorted(self._laps_by_stint.get(stint_id, []), key=lambda row: row["lap_number"])
+        return self._read_pages([select(row, LAP_COLUMNS) for row in laps], page_size)
+
+    def get_lap_weather(self, weather_id: int) -> dict:
+        if not weather_id:
+            return None
+        row = self._weather_by_id.get(weather_id)
+        self._round_trip(rows=int(row is not None))
+        return select(row, WEATHER_COLUMNS) if row else None
+
+    def get_lap_telemetry(self, lap_ids: list, batch_size: int = TELEMETRY_BATCH_SIZE) -> dict:
+        lap_ids = list(lap_ids)
+        decoded = {}
+        for i in range(0, len(lap_ids), batch_size):
+            rows = self._read_pages([self._telemetry_by_lap[lap_id] for lap_id in lap_ids[i:i + batch_size] if lap_id in self._telemetry_by_lap], batch_size)
+            decoded.update({row["lap_id"]: decode_telemetry(from_bytea(row["data"])) for row in rows})
+        return decoded
+
+    def get_fastest_lap_telemetry(self, year: int, session_type: str = None, event: str = None, page_size: int = TELEMETRY_BATCH_SIZE) -> list:
+        """Same rows as the fastest_lap_telemetry view"""
+        laps = {row["id"]: row for row in self.tables["lap"]}
+        stints = {row["id"]: row for row in self.tables["stints"]}
+        sessions = {row["id"]: row for row in self.tables["sessions"]}
+        drivers = {row["id"]: row for row in self.tables["drivers"]}
+        fastest = {}
+        for telemetry in self.tables["lap_telemetry"]:
+            lap = laps[telemetry["lap_id"]]
+            stint = stints[lap["stint_id"]]
+            session = sessions[stint["session_id"]]
+            if session["year"] != year or (session_type and session["session_type"] != session_type) or (event and session["event"] != event):
+                continue
+            key = (stint["session_id"], stint["driver_id"])
+            if key not in fastest or lap["lap_time"] < fastest[key][0]["lap_time"]:
+                fastest[key] = (lap, stint, session, telemetry)
+
+        rows = []
+        for (session_id, driver_id), (lap, stint, session, telemetry) in sorted(fastest.items(), key=lambda item: item[1][3]["lap_id"]):
+            driver = drivers[driver_id]
+            rows.append({
+                "lap_id": telemetry["lap_id"], "session_id": session_id, "driver_id": driver_id,
+                "driver_name": driver["driver_name"], "team": driver["team"], "event": session["event"],
+                "year": session["year"], "session_type": session["session_type"], "tyre_compound": stint["tyre_compound"],
+                "lap_number": lap["lap_number"], "lap_time": lap["lap_time"], "codec_version": telemetry["codec_version"],
+                "step": telemetry["step"], "telemetry": decode_telemetry(from_bytea(telemetry["data"]))
+            })
+        return self._read_pages(rows, page_size)
+
+    def get_row_counts(self) -> dict:
+        return {table: len(rows) for table, rows in self.tables.items()}
+
+@contextmanager
+def use_fake_database(fake=None):
+    """
+    Route the pipeline's database calls to `fake` (a new FakeF1Database by default) inside the
+    block. The cleaned data cache is bypassed, its keys do not tell the two databases apart.
+    """
+    from data_engine import race_data, live_ingest, clean_cache
+
+    fake = fake or FakeF1Database()
+    original, use_cache = race_data.db, clean_cache.USE_CLEANED_CACHE
+    race_data.db, live_ingest.db, clean_cache.USE_CLEANED_CACHE = fake, fake, False
+    try:
+        yield fake
+    finally:
+        race_data.db, live_ingest.db, clean_cache.USE_CLEANED_CACHE = original, original, use_cache
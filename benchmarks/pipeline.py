@@ -0,0 +1,291 @@
+"""
+Pipeline benchmarks
+===================
+
+Runs ingest (`store_session_stints`), cleaning (`get_cleaned_weekend_data`), training
+(`abs_performance_model`) and rendering (`render_batch`) offline, on synthetic sessions and the
+in-memory database, and reports throughput and peak memory at each scale. Scale N is N driver
+weekends: up to 20 drivers per event, adding events beyond that.
+
+    python -m benchmarks.pipeline                       # 1x, 10x and 100x, every stage
+    python -m benchmarks.pipeline --scales 1 10 --stages ingest clean
+    python -m benchmarks.pipeline --save-baseline       # store these results as the baseline
+    python -m benchmarks.pipeline --latency 0.002       # add 2ms to every database round trip
+
+Results are compared against the stored baseline and the run fails if any stage's throughput
+dropped, or its peak memory grew, by more than the tolerance. Peak memory (tracemalloc, Python
+and numpy allocations) is measured in a second run of each stage so it does not skew the timing.
+100x rendering draws 400 charts and takes a few minutes.
+
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import argparse
+import tempfile
+import tracemalloc
+
+from benchmarks.synthetic import GRID, generate_weekend, use_synthetic_sessions
+from benchmarks.fake_db import FakeF1Database, use_fake_database
+from utils.instrumentation import configure_logging, get_counters, reset
+
+SCALES = [1, 10, 100]
+STAGES = ["ingest", "clean", "train", "render"]
+EVENTS = ["Australia", "China", "Japan", "Bahrain", "Saudi Arabia"]
+SESSIONS = ("FP1", "FP2", "FP3", "Qualifying", "Race")
+YEAR = 2025
+COMPOUNDS = ["SOFT", "MEDIUM", "HARD"]
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+TOLERANCE = 0.25
+
+## Workload
+
+def get_scale_plan(scale):
+    """(events, drivers) covering `scale` driver weekends"""
+    n_events = math.ceil(scale / len(GRID))
+    n_drivers = min(scale, len(GRID))
+    return EVENTS[:n_events], GRID[:n_drivers]
+
+def get_driver_data(entry):
+    from db_utils.supa_db import create_driver_data
+    name, number, team = entry
+    return create_driver_data(name, int(number), team)
+
+class Workload:
+    """Synthetic sessions for one scale, generated once and shared by every stage"""
+    def __init__(self, scale):
+        self.scale = scale
+        self.events, self.drivers = get_scale_plan(scale)
+        self.sessions = []
+        for event in self.events:
+            self.sessions += generate_weekend(YEAR, event, SESSIONS, n_drivers=len(self.drivers), telemetry=False)
+        self._render_sessions = None
+        self._ingested = None
+        self._cleaned = None
+
+    def render_sessions(self):
+        """Qualifying with telemetry; FastF1's driver-ahead calculation needs a second car on track"""
+        if self._render_sessions is None:
+            self._render_sessions = [
+                session for event in self.events
+                for session in generate_weekend(YEAR, event, ("Qualifying",), n_drivers=max(len(self.drivers), 2))
+            ]
+        return self._render_sessions
+
+    def ingested(self):
+        """A database holding this workload, ingested once for the stages downstream of ingest"""
+        if self._ingested is None:
+            self._ingested = FakeF1Database()
+            run_ingest(self, self._ingested)
+        return self._ingested
+
+    def cleaned(self):
+        if self._cleaned is None:
+            self._cleaned = run_clean(self, self.ingested())[1]
+        return self._cleaned
+
+## Stages, each returning (units of work done, output)
+
+def run_ingest(workload, fake):
+    from data_engine.race_data import store_session_stints
+
+    with use_synthetic_sessions(workload.sessions), use_fake_database(fake):
+        for event in workload.events:
+            for name, _, _ in workload.drivers:
+                for session in SESSIONS:  # FP1 first, it creates the driver
+                    store_session_stints(YEAR, event, name, session)
+    return len(fake.tables["lap"]), fake
+
+def run_clean(workload, fake):
+    import pandas as pd
+    from data_engine.race_data import get_cleaned_weekend_data
+
+    laps_by_event = {}
+    with use_fake_database(fake):
+        for event in workload.events:
+            frames = [get_cleaned_weekend_data(get_driver_data(entry), event, YEAR) for entry in workload.drivers]
+            laps_by_event[event] = pd.concat(frames, ignore_index=True)
+    return sum(len(laps) for laps in laps_by_event.values()), laps_by_event
+
+def run_train(laps_by_event):
+    """One model per compound per event, as `main.py train` does"""
+    from models.per_model import abs_performance_model
+
+    trained = 0
+    for event_laps in laps_by_event.values():
+        for compound in COMPOUNDS:
+            compound_laps = event_laps[event_laps["tyre_compound"] == compound]
+            if len(compound_laps) < 10:
+                continue
+            abs_performance_model(event_laps, compound)
+            trained += len(compound_laps)
+    return trained, None
+
+def get_render_specs(workload):
+    from visualizer.batch_render import create_chart_spec, SINGLE_DRIVER_CHARTS, PAIR_CHARTS
+
+    names = [name for name, _, _ in workload.drivers]
+    specs = []
+    for event in workload.events:
+        for name in names:
+            specs += [create_chart_spec(chart, event, "Qualifying", YEAR, [name]) for chart in SINGLE_DRIVER_CHARTS]
+        for pair in zip(names[::2], names[1::2]):  # teammates
+            specs += [create_chart_spec(chart, event, "Qualifying", YEAR, pair) for chart in PAIR_CHARTS]
+    return specs
+
+def run_render(workload, specs):
+    from visualizer.batch_render import render_batch
+
+    with use_synthetic_sessions(workload.render_sessions()), tempfile.TemporaryDirectory() as out_dir:
+        results = render_batch(specs, out_dir, workers=1)
+    errors = [result["error"] for result in results if result["error"]]
+    if errors:
+        raise RuntimeError(f"{len(errors)} chart(s) failed, first: {errors[0]}")
+    return len(results), None
+
+STAGE_UNITS = {"ingest": "laps", "clean": "laps", "train": "laps", "render": "charts"}
+
+def get_stage(stage, workload, latency):
+    """(setup, run) for a stage; setup builds fresh inputs so the stage can run twice"""
+    if stage == "ingest":
+        return lambda: FakeF1Database(latency), lambda fake: run_ingest(workload, fake)
+    if stage == "clean":
+        def setup():
+            fake = workload.ingested()
+            fake.latency = latency
+            return fake
+        return setup, lambda fake: run_clean(workload, fake)
+    if stage == "train":
+        return workload.cleaned, run_train
+    if stage == "render":
+        return lambda: get_render_specs(workload), lambda specs: run_render(workload, specs)
+    raise ValueError(f"Unknown stage: {stage}")
+
+## Measurement
+
+def measure(setup, run, memory=True):
+    state = setup()
+    reset()
+    start = time.perf_counter()
+    work, _ = run(state)
+    seconds = time.perf_counter() - start
+    counters = get_counters()
+
+    peak_mb = None
+    if memory:
+        state = setup()
+        tracemalloc.start()
+        try:
+            run(state)
+            peak_mb = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        finally:
+            tracemalloc.stop()
+
+    return {
+        "work": work,
+        "seconds": seconds,
+        "throughput": work / seconds if seconds else float("inf"),
+        "peak_mb": peak_mb,
+        "round_trips": counters.get("db.round_trips", 0)
+    }
+
+def warm_up(stages):
+    """Import each stage's libraries up front so the first scale is not charged for them"""
+    import data_engine.race_data
+    if "train" in stages:
+        import sklearn.metrics
+        import models.per_model
+        data_engine.race_data.pd.DataFrame, models.per_model.xgb.XGBRegressor
+    if "render" in stages:
+        import visualizer.batch_render
+
+def run(scales=SCALES, stages=STAGES, latency=0.0, memory=True):
+    warm_up(stages)
+    results = {}
+    for scale in scales:
+        workload = Workload(scale)
+        for stage in stages:
+            key = f"{stage}@{scale}x"
+            try:
+                results[key] = measure(*get_stage(stage, workload, latency), memory=memory)
+            except Exception as e:
+                results[key] = {"error": f"{type(e).__name__}: {e}"}
+            print_result(key, stage, results[key])
+    return results
+
+## Baseline
+
+def load_baseline(path=BASELINE_PATH):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+def save_baseline(results, path=BASELINE_PATH):
+    baseline = load_baseline(path)
+    baseline.update({key: result for key, result in results.items() if "error" not in result})
+    with open(path, "w") as f:
+        json.dump(baseline, f, indent=2)
+
+def find_regressions(results, baseline, tolerance=TOLERANCE):
+    """Human-readable regressions: throughput down or peak memory up by more than `tolerance`"""
+    regressions = []
+    for key, result in results.items():
+        reference = baseline.get(key)
+        if reference is None or "error" in result:
+            continue
+        if result["throughput"] < reference["throughput"] * (1 - tolerance):
+            regressions.append(f"{key}: throughput {result['throughput']:.1f}/s vs baseline {reference['throughput']:.1f}/s")
+        if result["peak_mb"] and reference.get("peak_mb") and result["peak_mb"] > reference["peak_mb"] * (1 + tolerance):
+            regressions.append(f"{key}: peak memory {result['peak_mb']:.1f} MB vs baseline {reference['peak_mb']:.1f} MB")
+    return regressions
+
+## Output
+
+def print_header():
+    print(f"{'Benchmark':<16}{'Work':>10}{'Time (s)':>10}{'Throughput':>18}{'Peak (MB)':>11}{'Round trips':>13}")
+
+def print_result(key, stage, result):
+    if "error" in result:
+        print(f"{key:<16}{'ERROR':>10}  {result['error']}")
+        return
+    throughput = f"{result['throughput']:.1f} {STAGE_UNITS[stage]}/s"
+    peak = f"{result['peak_mb']:.1f}" if result["peak_mb"] is not None else "-"
+    print(f"{key:<16}{result['work']:>10}{result['seconds']:>10.2f}{throughput:>18}{peak:>11}{result['round_trips']:>13}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", type=int, nargs="+", default=SCALES)
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every database round trip")
+    parser.add_argument("--no-memory", action="store_true", help="skip the peak memory runs")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    parser.add_argument("--output", default=None, help="also write results as JSON")
+    args = parser.parse_args()
+
+    configure_logging("ERROR")
+    print_header()
+    results = run(args.scales, args.stages, args.latency, memory=not args.no_memory)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.save_baseline:
+        save_baseline(results, args.baseline)
+        print(f"\nBaseline saved to {args.baseline}")
+        sys.exit(0)
+
+    baseline = load_baseline(args.baseline)
+    if not baseline:
+        print(f"\nNo baseline at {args.baseline}, run with --save-baseline to store one")
+    regressions = find_regressions(results, baseline, args.tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    failed = regressions or any("error" in result for result in results.values())
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,138 @@
+"""
+Prediction service benchmark
+============================
+
+Trains per-compound models on a synthetic weekend (as `main.py train` does), registers them in a
+temporary registry and fires concurrent single-scenario predictions at `PredictionService`,
+in-process or over its HTTP front end, reporting p50/p99 latency and throughput.
+
+    python -m benchmarks.serving                          # 16 clients, in-process
+    python -m benchmarks.serving --clients 64 --http
+    python -m benchmarks.serving --reload                 # retrain a model mid-run
+
+"""
+
+import json
+import time
+import argparse
+import tempfile
+import threading
+import http.client
+
+from benchmarks.pipeline import Workload, YEAR, COMPOUNDS
+from utils.instrumentation import configure_logging, get_counters
+
+CLIENTS = 16
+REQUESTS = 500  # per client
+
+def register_models(laps_by_event, registry_dir):
+    from models.per_model import abs_performance_model, preprocess_data
+    from models.registry import save_model
+
+    registered = []
+    for event, laps in laps_by_event.items():
+        for compound in COMPOUNDS:
+            if (laps["tyre_compound"] == compound).sum() < 10:
+                continue
+            model = abs_performance_model(laps, compound)
+            save_model(model, event, YEAR, compound, preprocess_data(laps, compound)[0].columns, registry_dir=registry_dir)
+            registered.append((event, compound))
+    return registered
+
+def get_scenarios(laps_by_event, models):
+    """Cleaned laps as request payloads, one list per registered model"""
+    return {
+        (event, compound): laps_by_event[event][laps_by_event[event]["tyre_compound"] == compound].to_dict("records")
+        for event, compound in models
+    }
+
+def run_clients(predict, scenarios, clients, requests):
+    keys = list(scenarios)
+    errors = []
+
+    def client(i):
+        for j in range(requests):
+            event, compound = keys[(i + j) % len(keys)]
+            rows = scenarios[(event, compound)]
+            try:
+                predict(event, compound, rows[j % len(rows)])
+            except Exception as e:
+                errors.append(e)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start, errors
+
+def get_http_predict(port):
+    local = threading.local()
+
+    def predict(event, compound, scenario):
+        if not hasattr(local, "connection"):
+            local.connection = http.client.HTTPConnection("127.0.0.1", port)
+        body = json.dumps({"event": event, "year": YEAR, "compound": compound, "scenario": scenario}, default=str).encode()
+        local.connection.request("POST", "/predict", body, {"Content-Type": "application/json"})
+        response = local.connection.getresponse()
+        payload = json.loads(response.read())
+        if response.status != 200:
+            raise RuntimeError(payload["error"])
+        return payload["prediction"]
+    return predict
+
+def run(clients=CLIENTS, requests=REQUESTS, http=False, reload=False, scale=20):
+    from models.serving import PredictionService, create_server
+
+    workload = Workload(scale)
+    laps_by_event = workload.cleaned()
+    with tempfile.TemporaryDirectory() as registry_dir:
+        models = register_models(laps_by_event, registry_dir)
+        scenarios = get_scenarios(laps_by_event, models)
+
+        with PredictionService(registry_dir, reload_interval=0.2) as service:
+            server = None
+            if http:
+                server = create_server(service, port=0)
+                threading.Thread(target=server.serve_forever, daemon=True).start()
+                predict = get_http_predict(server.server_address[1])
+            else:
+                predict = lambda event, compound, scenario: service.predict(event, YEAR, compound, scenario)
+
+            # Warm up the boosters and connections before measuring
+            run_clients(predict, scenarios, clients, 5)
+            service.reset_stats()
+
+            retrainer = None
+            if reload:
+                event, compound = models[0]
+                retrainer = threading.Thread(target=register_models, args=({event: laps_by_event[event]}, registry_dir))
+                retrainer.start()
+            seconds, errors = run_clients(predict, scenarios, clients, requests)
+            if retrainer is not None:
+                retrainer.join()
+            stats = service.get_stats()
+            if server is not None:
+                server.shutdown()
+                server.server_close()
+
+    stats.update({"clients": clients, "seconds": seconds, "errors": len(errors), "reloads": get_counters().get("serving.reloads", 0)})
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=CLIENTS)
+    parser.add_argument("--requests", type=int, default=REQUESTS, help="requests per client")
+    parser.add_argument("--http", action="store_true", help="go through the HTTP front end")
+    parser.add_argument("--reload", action="store_true", help="re-register models during the run")
+    args = parser.parse_args()
+
+    configure_logging("ERROR")
+    stats = run(args.clients, args.requests, args.http, args.reload)
+    print(f"{stats['requests']} predictions from {stats['clients']} clients in {stats['seconds']:.2f}s")
+    print(f"p50 {stats['p50_ms']:.2f} ms, p99 {stats['p99_ms']:.2f} ms, {stats['throughput']:.0f} predictions/s")
+    print(f"{stats['batches']} batches, {stats['mean_batch_size']:.1f} requests per batch, {stats['models']} models, {stats['reloads']} loads")
+    if stats["errors"]:
+        print(f"{stats['errors']} request(s) failed")
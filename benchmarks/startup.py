@@ -0,0 +1,77 @@
+"""
+Import-time budget check
+========================
+
+Imports each module in a fresh interpreter, the way a CLI command or pool worker starts, and fails
+if it takes longer than the budget or actually executes one of the heavy libraries that should only
+load on first use.
+
+    python -m benchmarks.startup [--budget 0.5]
+
+"""
+
+import sys
+import json
+import argparse
+import subprocess
+
+BUDGET_SECONDS = 0.5
+
+MODULES = [
+    "db_utils.supa_db",
+    "db_utils.database_service",
+    "data_engine.race_data",
+    "data_engine.vis_data",
+    "data_engine.head_to_head",
+    "data_engine.snapshots",
+    "data_engine.live_ingest",
+    "data_engine.circuit_geometry",
+    "data_engine.telemetry_processing",
+    "models.per_model",
+    "models.degradation",
+]
+
+HEAVY_MODULES = ["fastf1", "pandas", "matplotlib", "seaborn", "scipy", "xgboost", "sklearn", "supabase", "pyarrow"]
+
+PROBE = """
+import sys, json, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+from utils.lazy import is_loaded
+print(json.dumps({{"seconds": elapsed, "loaded": [name for name in {heavy!r} if is_loaded(name)]}}))
+"""
+
+def measure_import(module, repeats=3):
+    """Best of `repeats` cold imports, and the heavy modules the import executed"""
+    results = []
+    for _ in range(repeats):
+        process = subprocess.run(
+            [sys.executable, "-c", PROBE.format(module=module, heavy=HEAVY_MODULES)],
+            capture_output=True, text=True
+        )
+        if process.returncode != 0:
+            error = process.stderr.strip().splitlines()[-1] if process.stderr.strip() else "import failed"
+            return {"seconds": float("inf"), "loaded": [], "error": error}
+        results.append(json.loads(process.stdout.strip().splitlines()[-1]))
+    return min(results, key=lambda result: result["seconds"])
+
+def run(budget=BUDGET_SECONDS, modules=MODULES):
+    failures = 0
+    print(f"{'Module':<32}{'Import (s)':>12}  Heavy modules loaded")
+    for module in modules:
+        result = measure_import(module)
+        ok = result["seconds"] <= budget and not result["loaded"]
+        failures += not ok
+        if "error" in result:
+            print(f"{module:<32}{'ERROR':>12}  {result['error']}")
+            continue
+        print(f"{module:<32}{result['seconds']:>12.3f}  {', '.join(result['loaded']) or '-'}{'' if ok else '  FAIL'}")
+    return failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget", type=float, default=BUDGET_SECONDS)
+    args = parser.parse_args()
+    sys.exit(1 if run(args.budget) else 0)
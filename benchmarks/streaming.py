@@ -0,0 +1,88 @@
+"""
+Streaming ingest benchmark
+==========================
+
+Records a synthetic session's timing feed and replays it through `live_ingest.stream_feed` into
+the in-memory database, next to batch ingest (`store_session_stints` for every driver) of the same
+session. Reports database round trips for both, per-lap write latency for the stream, and checks
+both produced the same stints and laps.
+
+    python -m benchmarks.streaming                          # as fast as possible
+    python -m benchmarks.streaming --speed 200 --latency 0.005
+
+"""
+
+import os
+import time
+import argparse
+import tempfile
+
+from benchmarks.synthetic import GRID, generate_session, use_synthetic_sessions
+from benchmarks.fake_db import FakeF1Database, use_fake_database
+from utils.instrumentation import configure_logging, get_counters, reset
+
+YEAR = 2025
+EVENT = "Australia"
+SESSIONS = ("FP1", "Race")  # drivers are created by FP1
+
+def get_stints(fake):
+    """Stints by session, driver and number, comparable across databases"""
+    drivers = {row["id"]: row["driver_name"] for row in fake.tables["drivers"]}
+    sessions = {row["id"]: row["session_type"] for row in fake.tables["sessions"]}
+    return sorted(
+        (sessions[row["session_id"]], drivers[row["driver_id"]], row["stint_number"], row["tyre_compound"], row["initial_tyre_age"], row["num_laps"])
+        for row in fake.tables["stints"]
+    )
+
+def run_batch(sessions, latency):
+    from data_engine.race_data import store_session_stints
+
+    fake = FakeF1Database(latency)
+    reset()
+    start = time.perf_counter()
+    with use_synthetic_sessions(sessions), use_fake_database(fake):
+        for session in sessions:
+            for driver, _, _ in GRID[:len(session.drivers)]:
+                store_session_stints(YEAR, EVENT, driver, session.name)
+    return fake, time.perf_counter() - start, get_counters().get("db.round_trips", 0)
+
+def run_stream(sessions, latency, speed, max_batch, max_delay):
+    from data_engine.live_ingest import record_feed, stream_feed
+
+    fake = FakeF1Database(latency)
+    with tempfile.TemporaryDirectory() as feed_dir:
+        paths = []
+        with use_synthetic_sessions(sessions):
+            for session in sessions:
+                paths.append(os.path.join(feed_dir, f"{session.name}.jsonl"))
+                record_feed(YEAR, EVENT, session.name, paths[-1])
+
+        reset()
+        start = time.perf_counter()
+        with use_fake_database(fake):
+            stats = [stream_feed(path, speed, max_batch=max_batch, max_delay=max_delay) for path in paths]
+        seconds = time.perf_counter() - start
+    return fake, seconds, get_counters().get("db.round_trips", 0), stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--drivers", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every database round trip")
+    parser.add_argument("--speed", type=float, default=None, help="replay at this multiple of real time")
+    parser.add_argument("--batch-size", type=int, default=20)
+    parser.add_argument("--max-delay", type=float, default=1.0)
+    args = parser.parse_args()
+
+    configure_logging("ERROR")
+    sessions = [generate_session(YEAR, EVENT, name, args.drivers, telemetry=False) for name in SESSIONS]
+
+    batch_db, batch_seconds, batch_trips = run_batch(sessions, args.latency)
+    stream_db, stream_seconds, stream_trips, stats = run_stream(sessions, args.latency, args.speed, args.batch_size, args.max_delay)
+
+    print(f"batch:  {batch_db.get_row_counts()['lap']} laps in {batch_seconds:.2f}s, {batch_trips} round trips")
+    print(f"stream: {stream_db.get_row_counts()['lap']} laps in {stream_seconds:.2f}s, {stream_trips} round trips")
+    for name, session_stats in zip(SESSIONS, stats):
+        print(f"  {name}: {session_stats['batches']} batches of {session_stats['mean_batch_size']:.1f} laps, "
+              f"latency p50 {session_stats['p50_ms']:.1f} ms, p99 {session_stats['p99_ms']:.1f} ms, max {session_stats['max_ms']:.1f} ms")
+    print("stints match" if get_stints(batch_db) == get_stints(stream_db) else "stints differ")
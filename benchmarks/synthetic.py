@@ -0,0 +1,353 @@
+"""
+Synthetic sessions
+==================
+
+FastF1-shaped sessions generated offline: `laps`, `weather_data`, `car_data`/`pos_data` telemetry
+and circuit info for any number of drivers and laps, built on a made-up closed circuit with a
+physically plausible speed profile. Laps and telemetry are real `fastf1.core.Laps`/`Telemetry`
+objects, so the pipeline's own FastF1 calls (pick_drivers, pick_fastest, lap.telemetry,
+get_car_data, split_qualifying_sessions) run unchanged.
+
+    session = generate_session(2025, "Australia", "Race", n_drivers=20)
+    with use_synthetic_sessions([session]):
+        store_session_stints(2025, "Australia", "HAM", "Race")
+
+"""
+
+import math
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+GRID = [
+    ("VER", "1", "Red Bull Racing"), ("TSU", "22", "Red Bull Racing"),
+    ("LEC", "16", "Ferrari"), ("HAM", "44", "Ferrari"),
+    ("NOR", "4", "McLaren"), ("PIA", "81", "McLaren"),
+    ("RUS", "63", "Mercedes"), ("ANT", "12", "Mercedes"),
+    ("ALO", "14", "Aston Martin"), ("STR", "18", "Aston Martin"),
+    ("GAS", "10", "Alpine"), ("COL", "43", "Alpine"),
+    ("ALB", "23", "Williams"), ("SAI", "55", "Williams"),
+    ("HAD", "6", "Racing Bulls"), ("LAW", "30", "Racing Bulls"),
+    ("OCO", "31", "Haas F1 Team"), ("BEA", "87", "Haas F1 Team"),
+    ("HUL", "27", "Kick Sauber"), ("BOR", "5", "Kick Sauber"),
+]
+
+SESSION_LAPS = {"FP1": 24, "FP2": 28, "FP3": 20, "Qualifying": 18, "Race": 57}
+SESSION_OFFSET = {"FP1": 1.6, "FP2": 1.1, "FP3": 0.8, "Qualifying": -1.0, "Race": 1.5}
+COMPOUND_OFFSET = {"SOFT": 0.0, "MEDIUM": 0.45, "HARD": 0.85}
+COMPOUND_DEG = {"SOFT": 0.09, "MEDIUM": 0.055, "HARD": 0.035}
+SECTOR_SPLIT = (0.31, 0.38, 0.31)
+
+BASE_LAP_TIME = 84.0
+FUEL_EFFECT = 0.03
+SAMPLE_PERIOD = 0.27  # seconds, roughly FastF1's car data rate
+
+## Circuit
+
+def generate_circuit(seed=0, length=5300.0, n_corners=14, n_points=2000):
+    """
+    Closed circuit (metres) of straights and constant-radius corners, with the speed, throttle,
+    brake and gear profile a car would follow around it
+    """
+    rng = np.random.default_rng(seed)
+
+    # Corner angles sum to one full turn, a few of them turning the other way
+    angles = rng.uniform(0.5, 2.4, n_corners) * np.where(rng.random(n_corners) < 0.3, -1, 1)
+    positive = angles > 0
+    angles[positive] *= (2 * np.pi - angles[~positive].sum()) / angles[positive].sum()
+    radii = rng.uniform(15.0, 160.0, n_corners)
+    arcs = np.abs(angles) * radii
+    arcs *= min(1.0, 0.45 * length / arcs.sum())
+    straights = rng.dirichlet(np.ones(n_corners)) * (length - arcs.sum())
+
+    # Alternate straight, corner, straight, corner...
+    segment_lengths = np.column_stack([straights, arcs]).ravel()
+    segment_curvature = np.column_stack([np.zeros(n_corners), angles / arcs]).ravel()
+    boundaries = np.cumsum(segment_lengths)
+
+    step = length / n_points
+    distance = np.arange(n_points) * step
+    curvature = segment_curvature[np.minimum(np.searchsorted(boundaries, distance, side="right"), len(boundaries) - 1)]
+    heading = np.cumsum(curvature) * step
+    x = np.cumsum(np.cos(heading)) * step
+    y = np.cumsum(np.sin(heading)) * step
+    ramp = np.arange(1, n_points + 1) / n_points  # spread the closing error around the lap
+    x, y = x - ramp * x[-1], y - ramp * y[-1]
+    scale = length / np.hypot(np.diff(x, append=x[:1]), np.diff(y, append=y[:1])).sum()
+    x, y = x * scale, y * scale
+
+    # Grip limited corner speed, then acceleration/braking limited passes around the lap
+    speed = np.minimum(np.sqrt(40.0 / np.maximum(np.abs(curvature), 1e-6)), 92.0)  # m/s, ~4g lateral
+    for _ in range(2):
+        for i in range(n_points):
+            speed[i] = min(speed[i], math.sqrt(speed[i - 1] ** 2 + 2 * 9.0 * step))
+        for i in range(n_points - 1, -1, -1):
+            speed[i] = min(speed[i], math.sqrt(speed[(i + 1) % n_points] ** 2 + 2 * 45.0 * step))
+
+    accel = np.gradient(speed ** 2 / 2, step)
+    step = np.hypot(np.diff(x, append=x[:1]), np.diff(y, append=y[:1]))  # as driven, after closing the loop
+
+    throttle = np.where(accel > 1.0, 100.0, np.where(accel < -5.0, 0.0, 35.0 + speed / 92.0 * 60.0))
+    kmh = speed * 3.6
+    gear = np.clip(1 + (kmh - 60) // 38, 1, 8)
+
+    return {
+        "x": x, "y": y, "distance": np.concatenate([[0.0], np.cumsum(step)[:-1]]), "length": length,
+        "speed": kmh, "throttle": throttle, "brake": accel < -5.0, "gear": gear,
+        "time": np.concatenate([[0.0], np.cumsum(step / speed)[:-1]]),
+        "lap_time": float(np.sum(step / speed)),
+        "corner_distance": np.interp(boundaries[0::2] + arcs / 2, distance, np.cumsum(step) - step)
+    }
+
+def get_corners(circuit):
+    idx = np.minimum((circuit["corner_distance"] / circuit["length"] * len(circuit["x"])).astype(int), len(circuit["x"]) - 1)
+    return pd.DataFrame({
+        "X": circuit["x"][idx] * 10, "Y": circuit["y"][idx] * 10,
+        "Number": np.arange(1, len(idx) + 1), "Letter": "",
+        "Angle": 0.0, "Distance": circuit["corner_distance"]
+    })
+
+## Laps
+
+def plan_stints(session_type, n_laps, rng):
+    """(compound, laps) per stint, with the garage time before each run in seconds"""
+    if session_type == "Qualifying":
+        return [("SOFT", 3, 300.0 if i % 2 else 60.0) for i in range(max(n_laps // 3, 3))]
+    if session_type == "Race":
+        first = int(n_laps * rng.uniform(0.3, 0.45))
+        compounds = ["MEDIUM", "HARD"] if rng.random() < 0.7 else ["SOFT", "HARD"]
+        return [(compounds[0], first, 0.0), (compounds[1], n_laps - first, 0.0)]
+    n_stints = max(2, n_laps // 7)
+    compounds = ["SOFT", "MEDIUM", "HARD"]
+    lengths = np.diff(np.linspace(0, n_laps, n_stints + 1).astype(int))
+    return [(compounds[i % 3], int(length), rng.uniform(300, 900)) for i, length in enumerate(lengths)]
+
+def generate_driver_laps(driver, number, team, session_type, n_laps, base_lap_time, rng, driver_offset, split_times):
+    rows = []
+    clock = 600.0
+    lap_number = 0
+    stints = plan_stints(session_type, n_laps, rng)
+    for stint, (compound, stint_laps, garage_time) in enumerate(stints, start=1):
+        clock += garage_time
+        segment = 0
+        if split_times is not None:  # spread qualifying runs across Q1, Q2 and Q3
+            segment = (stint - 1) * len(split_times) // len(stints)
+            clock = max(clock, split_times[segment] + 30.0)
+        for age in range(stint_laps):
+            lap_number += 1
+            is_out = age == 0 and not (session_type == "Race" and stint == 1)
+            is_in = age == stint_laps - 1 and not (session_type == "Race" and stint == len(stints))
+            lap_time = (base_lap_time + driver_offset + SESSION_OFFSET[session_type] + COMPOUND_OFFSET[compound]
+                        + COMPOUND_DEG[compound] * age + rng.normal(0, 0.2))
+            if session_type == "Race":
+                lap_time += FUEL_EFFECT * (n_laps - lap_number)
+            if session_type == "Qualifying" and not (is_out or is_in):
+                lap_time -= 0.5 + 0.8 * segment  # track evolution and engine modes
+            if is_out:
+                lap_time += 20.0 if session_type == "Race" else 12.0
+            if is_in:
+                lap_time += 4.0 if session_type == "Race" else 15.0
+            slow = rng.random()
+            track_status = "4" if slow < 0.03 else "1"
+            if slow < 0.03:
+                lap_time += 12.0
+            elif slow < 0.08:
+                lap_time += rng.uniform(1.0, 4.0)  # traffic
+
+            sectors = np.array(SECTOR_SPLIT) * lap_time + rng.normal(0, 0.05, 3)
+            sectors[2] = lap_time - sectors[0] - sectors[1]
+            rows.append({
+                "Time": clock + lap_time, "Driver": driver, "DriverNumber": number,
+                "LapTime": lap_time, "LapNumber": float(lap_number), "Stint": float(stint),
+                "PitOutTime": clock if is_out else np.nan,
+                "PitInTime": clock + lap_time if is_in else np.nan,
+                "Sector1Time": sectors[0], "Sector2Time": sectors[1], "Sector3Time": sectors[2],
+                "Compound": compound, "TyreLife": float(age + 1), "FreshTyre": True, "Team": team,
+                "LapStartTime": clock, "TrackStatus": track_status,
+                "Deleted": bool(rng.random() < 0.02), "IsAccurate": not (is_out or is_in),
+            })
+            clock += lap_time
+    return rows
+
+def add_personal_best(laps):
+    """Mark laps that were the driver's best so far, as the timing feed does"""
+    valid = laps["LapTime"].where(~laps["Deleted"] & laps["IsAccurate"])
+    best_so_far = valid.fillna(pd.Timedelta.max).groupby(laps["Driver"]).cummin()
+    laps["IsPersonalBest"] = valid.eq(best_so_far)
+    return laps
+
+## Telemetry
+
+def generate_driver_telemetry(laps, circuit, t0_date):
+    """
+    Car and position samples covering every lap of one driver. Like the live feed, every car is
+    sampled on the same session clock, which FastF1's driver-ahead calculation relies on.
+    """
+    car_frames, pos_frames = [], []
+    for start, lap_time in zip(laps["LapStartTime"].dt.total_seconds(), laps["LapTime"].dt.total_seconds()):
+        scale = lap_time / circuit["lap_time"]
+        lap_clock = circuit["time"] * scale
+        for frames, offset in ((car_frames, 0.0), (pos_frames, SAMPLE_PERIOD / 2)):
+            first = math.ceil((start - offset) / SAMPLE_PERIOD) * SAMPLE_PERIOD + offset
+            t = np.arange(first, start + lap_time, SAMPLE_PERIOD)
+            d = np.interp(t - start, lap_clock, circuit["distance"])
+            frames.append((t, d, scale))
+
+    def build(frames, channels):
+        session_time = pd.to_timedelta(np.concatenate([t for t, _, _ in frames]), unit="s")
+        distance = np.concatenate([d for _, d, _ in frames])
+        scale = np.concatenate([np.full(len(t), s) for t, _, s in frames])
+        data = {"Date": t0_date + session_time, "SessionTime": session_time, "Time": session_time}
+        data.update(channels(distance, scale))
+        return data
+
+    car = build(car_frames, lambda d, scale: {
+        "RPM": 9500 + 2500 * (np.interp(d, circuit["distance"], circuit["speed"]) % 38) / 38,
+        "Speed": np.interp(d, circuit["distance"], circuit["speed"]) / scale,
+        "nGear": np.interp(d, circuit["distance"], circuit["gear"]).round().astype(int),
+        "Throttle": np.interp(d, circuit["distance"], circuit["throttle"]),
+        "Brake": np.interp(d, circuit["distance"], circuit["brake"].astype(float)) > 0.5,
+        "DRS": np.zeros(len(d), dtype=int),
+        "Source": "car",
+    })
+    pos = build(pos_frames, lambda d, scale: {
+        "X": np.interp(d, circuit["distance"], circuit["x"]) * 10,
+        "Y": np.interp(d, circuit["distance"], circuit["y"]) * 10,
+        "Z": np.zeros(len(d)),
+        "Status": "OnTrack",
+        "Source": "pos",
+    })
+    return car, pos
+
+## Weather
+
+def generate_weather(duration, rng, rain_probability=0.0):
+    minutes = np.arange(0, duration / 60 + 2)
+    drift = np.cumsum(rng.normal(0, 0.05, len(minutes)))
+    return pd.DataFrame({
+        "Time": pd.to_timedelta(minutes * 60, unit="s"),
+        "AirTemp": 24.0 + drift,
+        "Humidity": 45.0 - drift,
+        "Pressure": 1012.0 + rng.normal(0, 0.1, len(minutes)),
+        "Rainfall": rng.random(len(minutes)) < rain_probability,
+        "TrackTemp": 38.0 + 2 * drift,
+        "WindDirection": rng.integers(0, 360, len(minutes)),
+        "WindSpeed": np.abs(rng.normal(2.0, 0.8, len(minutes))),
+    })
+
+## Sessions
+
+class SyntheticSession:
+    """The parts of `fastf1.core.Session` the pipeline uses; `load()` is a no-op"""
+    _QUALI_LIKE_SESSIONS = ("Qualifying", "Sprint Qualifying")
+    _RACE_LIKE_SESSIONS = ("Race", "Sprint")
+
+    def __init__(self, year, event, name, date, laps, weather_data, car_data, pos_data, circuit_info,
+                 session_status=None, split_times=None):
+        from fastf1.core import Laps, Telemetry
+
+        self.year = year
+        self.name = name
+        self.date = date
+        self.t0_date = date
+        self.event = pd.Series({"EventName": event, "EventDate": date, "Location": event, "RoundNumber": 1})
+        self.api_path = f"synthetic/{year}/{event}/{name}/"
+        self.weather_data = weather_data
+        self.session_status = session_status
+        self._session_split_times = split_times
+        self.drivers = list(laps["DriverNumber"].unique())
+        self.laps = Laps(laps, session=self)
+        self.car_data = {drv: Telemetry(data, session=self, driver=drv) for drv, data in car_data.items()}
+        self.pos_data = {drv: Telemetry(data, session=self, driver=drv) for drv, data in pos_data.items()}
+        self._circuit_info = circuit_info
+
+    def load(self, **kwargs):
+        pass
+
+    def get_circuit_info(self):
+        return self._circuit_info
+
+    def __repr__(self):
+        return f"SyntheticSession({self.year} {self.event['EventName']} {self.name}, {len(self.laps)} laps)"
+
+def generate_session(year, event, session_type, n_drivers=20, n_laps=None, telemetry=True, seed=None, drivers=None):
+    """
+    A session for the first `n_drivers` of the grid (or the named `drivers`), `n_laps` per driver
+    (defaults by session type). Seeded from the event and session so repeat runs match.
+    """
+    from fastf1.mvapi import CircuitInfo
+
+    if seed is None:
+        seed = sum(map(ord, f"{year}{event}{session_type}"))
+    rng = np.random.default_rng(seed)
+    circuit = generate_circuit(seed=sum(map(ord, event)))
+    n_laps = n_laps or SESSION_LAPS[session_type]
+    grid = [entry for entry in GRID if drivers is None or entry[0] in drivers][:n_drivers]
+    date = pd.Timestamp(f"{year}-03-16 05:00:00")
+
+    split_times = None
+    session_status = None
+    if session_type == "Qualifying":
+        split_times = [pd.Timedelta(seconds=s) for s in (600, 600 + 1500, 600 + 2700)]
+        session_status = pd.DataFrame({
+            "Time": split_times + [pd.Timedelta(seconds=600 + 3600)],
+            "Status": ["Started", "Started", "Started", "Finished"]
+        })
+
+    rows = []
+    for position, (driver, number, team) in enumerate(grid):
+        segment_starts = [t.total_seconds() for t in split_times] if split_times else None
+        rows += generate_driver_laps(driver, number, team, session_type, n_laps, BASE_LAP_TIME, rng,
+                                     driver_offset=position * 0.08, split_times=segment_starts)
+
+    laps = pd.DataFrame(rows)
+    for column in ["Time", "LapTime", "PitOutTime", "PitInTime", "Sector1Time", "Sector2Time", "Sector3Time", "LapStartTime"]:
+        laps[column] = pd.to_timedelta(laps[column], unit="s")
+    laps["LapStartDate"] = date + laps["LapStartTime"]
+    laps = add_personal_best(laps)
+
+    duration = laps["Time"].max().total_seconds() if len(laps) else 3600.0
+    weather = generate_weather(duration, rng)
+
+    car_data, pos_data = {}, {}
+    if telemetry:
+        for number, driver_laps in laps.groupby("DriverNumber"):
+            car_data[number], pos_data[number] = generate_driver_telemetry(driver_laps, circuit, date)
+
+    circuit_info = CircuitInfo(corners=get_corners(circuit), marshal_lights=pd.DataFrame(),
+                               marshal_sectors=pd.DataFrame(), rotation=0.0)
+    return SyntheticSession(year, event, session_type, date, laps, weather, car_data, pos_data, circuit_info,
+                            session_status, split_times)
+
+def generate_weekend(year, event, sessions=("FP1", "FP2", "FP3", "Qualifying", "Race"), n_drivers=20, telemetry=True, lap_scale=1.0):
+    return [
+        generate_session(year, event, session_type, n_drivers, max(3, round(SESSION_LAPS[session_type] * lap_scale)), telemetry)
+        for session_type in sessions
+    ]
+
+@contextmanager
+def use_synthetic_sessions(sessions):
+    """Serve `sessions` from `fastf1.get_session` (and the visualizer's session cache) inside the block, bypassing snapshots"""
+    import fastf1
+    from data_engine import snapshots
+    from data_engine.vis_data import load_session
+
+    by_key = {(session.year, session.event["EventName"], session.name): session for session in sessions}
+
+    def get_session(year, gp, identifier=None, **kwargs):
+        try:
+            return by_key[(year, gp, identifier)]
+        except KeyError:
+            raise ValueError(f"No synthetic session for {year} {gp} {identifier}")
+
+    original, use_snapshots = fastf1.get_session, snapshots.USE_SNAPSHOTS
+    fastf1.get_session = get_session
+    snapshots.USE_SNAPSHOTS = False  # never serve or save a real session's snapshot here
+    load_session.cache_clear()
+    try:
+        yield by_key
+    finally:
+        fastf1.get_session = original
+        snapshots.USE_SNAPSHOTS = use_snapshots
+        load_session.cache_clear()
@@ -0,0 +1,141 @@
+"""
+Circuit Geometry
+================
+
+Track geometry built once per circuit and reused by every session and season there, instead of
+each chart re-deriving it from lap telemetry or refetching FastF1's circuit info:
+    - the reference lap's X/Y resampled onto a distance grid, for distance <-> X/Y lookups
+    - a decimated, closed outline for track maps and replays
+    - corners with their distance along the reference lap, and the map rotation
+
+    geometry = get_circuit_geometry(session_obj)
+    distance_to_xy(geometry, [0, 1200, 3400])
+    project_to_track(geometry, x, y)
+
+The reference is the fastest accurate lap of the first session that asks for a circuit. Circuits
+are keyed by the event's location, so pass `refresh=True` after a layout change to rebuild.
+
+"""
+
+import os
+import re
+
+import numpy as np
+
+from utils.lazy import lazy_import
+from utils.instrumentation import span, get_logger
+from data_engine.decimation import douglas_peucker
+
+pd = lazy_import("pandas")
+
+logger = get_logger(__name__)
+
+CACHE_DIR = os.path.join(os.environ.get("F1_CACHE_DIR", ".f1_cache"), "circuits")
+GEOMETRY_VERSION = 1
+
+STEP = 5.0  # metres between samples
+OUTLINE_TOLERANCE = 5.0  # X/Y units (1/10 m), well under the outline's line width
+
+CORNER_COLUMNS = ["Number", "Letter", "Angle", "Distance", "X", "Y"]
+
+# Geometry already loaded in this process, by cache path
+_geometries = {}
+
+def get_circuit_key(session_obj):
+    """File-safe name of the session's circuit, shared by every year and session held there"""
+    return re.sub(r"[^a-z0-9]+", "_", session_obj.event["Location"].lower()).strip("_")
+
+def get_cache_path(circuit, step=STEP, cache_dir=CACHE_DIR):
+    return os.path.join(cache_dir, f"{circuit}_v{GEOMETRY_VERSION}_{step:g}m.pkl")
+
+def get_reference_lap(session_obj):
+    return session_obj.laps.pick_accurate().pick_fastest()
+
+def build_geometry(session_obj, step=STEP):
+    """Geometry of the session's circuit from its fastest accurate lap and circuit info"""
+    from data_engine.race_data import get_lap_channels
+
+    lap = get_reference_lap(session_obj)
+    if lap is None or lap.empty:
+        raise ValueError(f"No accurate lap to build {get_circuit_key(session_obj)} geometry from")
+
+    channels = get_lap_channels(lap)
+    channels = channels[channels["X"].notna() & channels["Y"].notna()]
+    lap_distance = channels["Distance"].to_numpy()
+    length = float(lap_distance[-1])
+    distance = np.arange(0, length, step)
+    x = np.interp(distance, lap_distance, channels["X"].to_numpy())
+    y = np.interp(distance, lap_distance, channels["Y"].to_numpy())
+
+    # Closed outline, decimated once here rather than per chart
+    closed_x, closed_y = np.append(x, x[0]), np.append(y, y[0])
+    keep = douglas_peucker(closed_x, closed_y, OUTLINE_TOLERANCE)
+
+    geometry = {
+        "circuit": get_circuit_key(session_obj),
+        "source": f"{session_obj.event['EventName']} {session_obj.name} {session_obj.date.year} - {lap['Driver']} lap {int(lap['LapNumber'])}",
+        "step": step,
+        "length": length,
+        "distance": distance,
+        "x": x,
+        "y": y,
+        "outline": (closed_x[keep], closed_y[keep]),
+        "rotation": 0.0,
+        "corners": pd.DataFrame(columns=CORNER_COLUMNS),
+    }
+
+    circuit_info = session_obj.get_circuit_info()
+    if circuit_info is not None:
+        corners = circuit_info.corners[CORNER_COLUMNS].copy()
+        # Corner distances along this reference lap, so they line up with `distance_to_xy`
+        corners["Distance"] = project_to_track(geometry, corners["X"], corners["Y"])
+        geometry["corners"] = corners.reset_index(drop=True)
+        geometry["rotation"] = float(circuit_info.rotation)
+    return geometry
+
+def get_circuit_geometry(session_obj, step=STEP, refresh=False, cache_dir=CACHE_DIR):
+    """Geometry of the session's circuit, from this process or the disk cache, building it from this session only when neither has it (or `refresh`)"""
+    circuit = get_circuit_key(session_obj)
+    path = get_cache_path(circuit, step, cache_dir)
+    if refresh:
+        _geometries.pop(path, None)
+        if os.path.exists(path):
+            os.remove(path)
+
+    if path in _geometries:
+        return _geometries[path]
+    if os.path.exists(path):
+        geometry = pd.read_pickle(path)
+    else:
+        with span("circuit_geometry", circuit=circuit):
+            geometry = build_geometry(session_obj, step)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp{os.getpid()}"
+        pd.to_pickle(geometry, tmp_path)
+        os.replace(tmp_path, path)
+        logger.info(f"Built {circuit} geometry from {geometry['source']}")
+    _geometries[path] = geometry
+    return geometry
+
+def distance_to_xy(geometry, distance):
+    """Track X/Y at each distance along the reference lap, wrapping past the line"""
+    distance = np.asarray(distance, dtype=float)
+    x = np.interp(distance, geometry["distance"], geometry["x"], period=geometry["length"])
+    y = np.interp(distance, geometry["distance"], geometry["y"], period=geometry["length"])
+    return x, y
+
+def project_to_track(geometry, x, y):
+    """Distance along the reference lap of the track point nearest each X/Y"""
+    from scipy.spatial import cKDTree
+
+    track = np.column_stack([geometry["x"], geometry["y"]])
+    points = np.column_stack([np.asarray(x, dtype=float), np.asarray(y, dtype=float)])
+    n = len(track)
+    nearest = cKDTree(track).query(points)[1]
+
+    # Refine along the chord through the samples either side of the nearest one
+    before, after = track[(nearest - 1) % n], track[(nearest + 1) % n]
+    chord = after - before
+    t = np.clip(np.einsum("ij,ij->i", points - before, chord) / np.einsum("ij,ij->i", chord, chord), 0, 1)
+    distance = geometry["distance"][nearest] + (2 * t - 1) * geometry["step"]
+    return np.mod(distance, geometry["length"])
@@ -0,0 +1,146 @@
+"""
+Cleaned Data Cache
+==================
+
+Disk cache for the cleaned lap frames built by `race_data.get_cleaned_weekend_data` and
+`get_cleaned_session_data`. Entries are addressed by a hash of everything the frame depends on:
+the driver, event, year and session, the cleaning parameters, and the ingest stamps of the
+sessions involved. Ingesting a driver's session (`store_session_stints`) renews that session's
+stamp, so frames built before the ingest are never returned again; they age out of the cache
+like any other entry. The cache is bounded in size and evicts the least recently used frames.
+
+    frame = get_cached_frame(driver_data, "Australia", 2025, "Race", params, build)
+
+Stamps only see ingests made from this machine (or sharing F1_CACHE_DIR). Set
+F1_CLEANED_CACHE=0 to bypass the cache.
+
+"""
+
+import os
+import json
+import time
+import hashlib
+
+from utils.lazy import lazy_import
+from utils.instrumentation import incr, get_logger
+
+pd = lazy_import("pandas")
+
+logger = get_logger(__name__)
+
+CACHE_DIR = os.path.join(os.environ.get("F1_CACHE_DIR", ".f1_cache"), "cleaned")
+MAX_CACHE_BYTES = int(float(os.environ.get("F1_CLEANED_CACHE_MB", "512")) * 2 ** 20)
+USE_CLEANED_CACHE = os.environ.get("F1_CLEANED_CACHE", "1") != "0"
+CACHE_VERSION = 1
+WEEKEND = "weekend"
+
+## Ingest stamps
+
+def get_stamp_dir(driver_name, event, year, cache_dir=CACHE_DIR):
+    return os.path.join(cache_dir, "stamps", str(year), event.replace(" ", "_"), driver_name)
+
+def stamp_session(driver_name, event, year, session, cache_dir=CACHE_DIR):
+    """Record that a driver's session was (re)ingested, invalidating its cached frames"""
+    stamp_dir = get_stamp_dir(driver_name, event, year, cache_dir)
+    os.makedirs(stamp_dir, exist_ok=True)
+    path = os.path.join(stamp_dir, session.replace(" ", "_"))
+    with open(f"{path}.tmp{os.getpid()}", "w") as f:
+        f.write(f"{time.time_ns()}-{os.getpid()}")
+    os.replace(f"{path}.tmp{os.getpid()}", path)
+
+def get_stamps(driver_name, event, year, session=None, cache_dir=CACHE_DIR):
+    """{session: stamp} for the session, or for every stamped session of the weekend"""
+    stamp_dir = get_stamp_dir(driver_name, event, year, cache_dir)
+    if not os.path.isdir(stamp_dir):
+        return {}
+    names = [session.replace(" ", "_")] if session else sorted(os.listdir(stamp_dir))
+    stamps = {}
+    for name in names:
+        path = os.path.join(stamp_dir, name)
+        if ".tmp" not in name and os.path.exists(path):
+            with open(path) as f:
+                stamps[name] = f.read()
+    return stamps
+
+## Entries
+
+def get_cache_key(driver_data, event, year, session, params, cache_dir=CACHE_DIR):
+    key = {
+        "version": CACHE_VERSION,
+        "driver": [driver_data["driver_name"], str(driver_data["driver_number"]), driver_data["team"]],
+        "event": event,
+        "year": int(year),
+        "session": session or WEEKEND,
+        "params": params,
+        "stamps": get_stamps(driver_data["driver_name"], event, year, session, cache_dir)
+    }
+    return hashlib.sha256(json.dumps(key, sort_keys=True, default=str).encode()).hexdigest()
+
+def get_entry_path(key, cache_dir=CACHE_DIR):
+    return os.path.join(cache_dir, "frames", key[:2], f"{key}.pkl")
+
+def load_frame(key, cache_dir=CACHE_DIR):
+    path = get_entry_path(key, cache_dir)
+    try:
+        frame = pd.read_pickle(path)
+    except (FileNotFoundError, EOFError):
+        return None
+    os.utime(path)  # mtime is the LRU clock
+    return frame
+
+def save_frame(key, frame, cache_dir=CACHE_DIR, max_bytes=MAX_CACHE_BYTES):
+    path = get_entry_path(key, cache_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    pd.to_pickle(frame, tmp_path)
+    os.replace(tmp_path, path)
+    evict(max_bytes, cache_dir)
+
+def evict(max_bytes=MAX_CACHE_BYTES, cache_dir=CACHE_DIR):
+    """Delete least recently used frames until the cache fits in `max_bytes`; returns how many were deleted"""
+    entries = []
+    for root, _, files in os.walk(os.path.join(cache_dir, "frames")):
+        for name in files:
+            path = os.path.join(root, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:  # evicted by another process
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+    deleted = 0
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            deleted += 1
+        except FileNotFoundError:
+            pass
+        total -= size
+    if deleted:
+        incr("cleaned_cache.evictions", deleted)
+    return deleted
+
+def clear(cache_dir=CACHE_DIR):
+    """Drop every cached frame (stamps are kept)"""
+    return evict(0, cache_dir)
+
+def get_cached_frame(driver_data, event, year, session, params, build, cache_dir=CACHE_DIR, refresh=False):
+    """Cached frame for this key, or `build()`'s result, cached; `session` None means the whole weekend"""
+    if not USE_CLEANED_CACHE:
+        return build()
+    key = get_cache_key(driver_data, event, year, session, params, cache_dir)
+    if not refresh:
+        frame = load_frame(key, cache_dir)
+        if frame is not None:
+            incr("cleaned_cache.hits")
+            return frame
+    incr("cleaned_cache.misses")
+    frame = build()
+    try:
+        save_frame(key, frame, cache_dir)
+    except OSError as e:
+        logger.warning(f"Could not cache cleaned data for {driver_data['driver_name']} {event} {year}: {e}")
+    return frame
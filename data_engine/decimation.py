@@ -0,0 +1,141 @@
+"""
+Level-of-detail decimation
+==========================
+
+Shape-preserving downsampling between the telemetry in `vis_data` and the plots in `base_plots`.
+Traces use Largest-Triangle-Three-Buckets (LTTB), track maps use Douglas-Peucker on X/Y while also
+keeping every point where the plotted metric moves into a new colour band, so braking zones on
+straights survive even though the track there is a straight line.
+
+"""
+
+import numpy as np
+
+# Points per horizontal pixel of output, two keeps min/max detail within each pixel column
+POINTS_PER_PIXEL = 2
+# Points per lap on a track map: a segment every ~13 m of a 5 km lap, finer than its 5 px line shows,
+# and below the 700-900 samples of a lap so single-lap maps are decimated too
+TRACK_MAP_POINTS = 400
+# Times the metric bands may be doubled to fit the budget, past 32 any finite range is a single band
+MAX_BAND_WIDENINGS = 32
+
+def get_point_budget(figsize=(12, 6.75), dpi=100, points_per_pixel=POINTS_PER_PIXEL):
+    """Number of points worth drawing for a figure of this size"""
+    return int(figsize[0] * dpi * points_per_pixel)
+
+def lttb(x, y, n_out):
+    """Return indices of the `n_out` points that best preserve the shape of y(x)"""
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    # Buckets between the fixed first and last points
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    indices = np.empty(n_out, dtype=int)
+    indices[0] = 0
+    indices[-1] = n - 1
+
+    prev = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        # Average of the next bucket is the third point of the triangle
+        next_start, next_end = edges[i + 1], edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+
+        area = np.abs((x[prev] - avg_x) * (y[start:end] - y[prev]) - (x[prev] - x[start:end]) * (avg_y - y[prev]))
+        prev = start + int(np.argmax(area))
+        indices[i + 1] = prev
+    return indices
+
+def decimate_trace(x, y, max_points):
+    """LTTB-decimate a trace, returning the reduced x and y arrays"""
+    idx = lttb(x, y, max_points)
+    return np.asarray(x)[idx], np.asarray(y)[idx]
+
+def douglas_peucker(x, y, epsilon):
+    """Boolean mask of points kept by Douglas-Peucker with tolerance `epsilon` (same units as x/y)"""
+    points = np.column_stack([np.asarray(x, dtype=float), np.asarray(y, dtype=float)])
+    n = len(points)
+    keep = np.zeros(n, dtype=bool)
+    if n == 0:
+        return keep
+    keep[0] = keep[-1] = True
+
+    stack = [(0, n - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        a, b = points[start], points[end]
+        segment = points[start + 1:end]
+        ab = b - a
+        length = np.hypot(*ab)
+        if length == 0:
+            dist = np.hypot(*(segment - a).T)
+        else:
+            dist = np.abs(ab[0] * (segment[:, 1] - a[1]) - ab[1] * (segment[:, 0] - a[0])) / length
+        idx = int(np.argmax(dist))
+        if dist[idx] > epsilon:
+            split = start + 1 + idx
+            keep[split] = True
+            stack.append((start, split))
+            stack.append((split, end))
+    return keep
+
+def get_metric_breaks(colour, tolerance):
+    """Mask of points where the metric crosses into a new band of width `tolerance`, ignoring gaps (NaN)"""
+    colour = np.asarray(colour, dtype=float)
+    bands = np.floor((colour - np.nanmin(colour)) / tolerance)
+    finite = np.isfinite(bands)
+    breaks = np.zeros(len(colour), dtype=bool)
+    breaks[1:] = (np.diff(bands) != 0) & finite[1:] & finite[:-1]
+    return breaks
+
+def simplify_track(x, y, colour, max_points, metric_tolerance=None):
+    """
+    Reduce a coloured track line to roughly `max_points` points.
+
+    Segments between kept points are merged, and each merged segment takes the mean metric of the
+    samples it replaces. `metric_tolerance` defaults to 1/64th of the metric range (the colour map
+    cannot show finer steps at track-map line widths); when the metric's band changes alone would
+    exceed the budget the bands are widened until they fit.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    colour = np.asarray(colour, dtype=float)
+    n = len(x)
+    if n <= max_points:
+        return x, y, colour
+
+    if metric_tolerance is None:
+        metric_range = np.nanmax(colour) - np.nanmin(colour)
+        metric_tolerance = metric_range / 64 if metric_range > 0 else 1.0
+    breaks = get_metric_breaks(colour, metric_tolerance)
+    # Track ends plus the band changes must leave room in the budget
+    for _ in range(MAX_BAND_WIDENINGS):
+        if breaks.sum() + 2 <= max_points or not breaks.any():
+            break
+        metric_tolerance *= 2
+        breaks = get_metric_breaks(colour, metric_tolerance)
+
+    # Bisect the DP tolerance until the kept point count fits the budget
+    low, high = 0.0, np.hypot(np.ptp(x), np.ptp(y))  # no point is further than this from any chord
+    keep = douglas_peucker(x, y, high) | breaks
+    for _ in range(20):
+        mid = (low + high) / 2
+        candidate = douglas_peucker(x, y, mid) | breaks
+        if candidate.sum() <= max_points:
+            keep, high = candidate, mid
+        else:
+            low = mid
+
+    kept = np.flatnonzero(keep)
+    merged_colour = np.add.reduceat(colour, kept) / np.diff(np.append(kept, n))
+    return x[kept], y[kept], merged_colour
+
+def get_segments(x, y):
+    points = np.array([x, y]).T.reshape(-1, 1, 2)
+    return np.concatenate([points[:-1], points[1:]], axis=1)
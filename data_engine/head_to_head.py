@@ -0,0 +1,188 @@
+"""
+Teammate Head-to-Head Engine
+============================
+
+For every team at every event in a season compare the two drivers on:
+    - qualifying gap (fastest qualifying laps)
+    - race pace gap on laps matched by compound and tyre age
+    - tyre degradation (fuel-corrected lap time vs tyre age slope, averaged over stints)
+    - corner-level time deltas between their fastest qualifying laps
+
+Each event's result is cached to disk, so the season table only computes events that have
+finished since the last build. Events are computed in parallel.
+
+"""
+
+import os
+import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from utils.lazy import lazy_import
+from utils.instrumentation import timed, get_logger
+from data_engine.vis_data import load_session, get_laps
+from data_engine.circuit_geometry import get_circuit_geometry
+from models.degradation import fit_session_degradation
+
+f1 = lazy_import("fastf1")
+pd = lazy_import("pandas")
+
+logger = get_logger(__name__)
+
+CACHE_DIR = os.path.join(os.environ.get("F1_CACHE_DIR", ".f1_cache"), "head_to_head")
+MIN_STINT_LAPS = 5
+
+def get_team_pairs(laps):
+    """Sorted (team, driver_1, driver_2) for every team with two drivers in the session"""
+    pairs = []
+    for team, drivers in laps.groupby("Team")["Driver"].unique().items():
+        drivers = sorted(drivers)
+        if len(drivers) == 2:
+            pairs.append((team, drivers[0], drivers[1]))
+    return pairs
+
+def get_qualifying_gap(quali_laps, d1, d2):
+    d1_lap = quali_laps.pick_drivers(d1).pick_fastest()
+    d2_lap = quali_laps.pick_drivers(d2).pick_fastest()
+    if d1_lap is None or d2_lap is None or pd.isna(d1_lap["LapTime"]) or pd.isna(d2_lap["LapTime"]):
+        return None, None, None
+    gap = (d1_lap["LapTime"] - d2_lap["LapTime"]).total_seconds()
+    return gap, d1_lap, d2_lap
+
+def get_race_pace_gap(race_laps, d1, d2):
+    """Median lap time difference over the compound and tyre ages both drivers ran, and how many were matched"""
+    def get_pace(driver):
+        laps = get_laps(driver, race_laps)
+        # One median per compound and tyre age, so a tyre age run in two stints matches once, not many-to-many
+        lap_times = laps["LapTime"].dt.total_seconds()
+        return lap_times.groupby([laps["Compound"], laps["TyreLife"]]).median().dropna()
+
+    matched = pd.concat([get_pace(d1), get_pace(d2)], axis=1, join="inner", keys=["d1", "d2"])
+    if matched.empty:
+        return None, 0
+    diffs = matched["d1"] - matched["d2"]
+    return float(diffs.median()), len(matched)
+
+def get_degradation_rates(race_laps):
+    """Lap-weighted mean fuel-corrected lap time vs tyre age slope (s/lap) per driver, fitted over all stints at once"""
+    fits = fit_session_degradation(race_laps.pick_wo_box().pick_not_deleted().pick_accurate(), min_laps=MIN_STINT_LAPS)
+    fits = fits.dropna(subset=["slope"])
+    weighted = (fits["slope"] * fits["n_laps"]).groupby(fits["Driver"]).sum() / fits.groupby("Driver")["n_laps"].sum()
+    return weighted.to_dict()
+
+def get_corner_deltas(d1_lap, d2_lap, corners):
+    """Time gained (negative) or lost by driver 1 from the previous corner to each corner"""
+    d1_tel = d1_lap.get_car_data().add_distance()
+    d2_tel = d2_lap.get_car_data().add_distance()
+    corner_distance = corners["Distance"].to_numpy()
+
+    d1_times = np.interp(corner_distance, d1_tel["Distance"], d1_tel["Time"].dt.total_seconds())
+    d2_times = np.interp(corner_distance, d2_tel["Distance"], d2_tel["Time"].dt.total_seconds())
+    gap_at_corner = d1_times - d2_times
+
+    return pd.DataFrame({
+        "corner": [f"{number}{letter}" for number, letter in zip(corners["Number"], corners["Letter"])],
+        "distance": corner_distance,
+        "gap": gap_at_corner,
+        "delta": np.diff(gap_at_corner, prepend=0.0)
+    })
+
+@timed("head_to_head.event")
+def analyse_event(year, event):
+    """Head-to-head summary and corner deltas for every team at one event"""
+    quali = load_session(year, event, "Qualifying")
+    race = load_session(year, event, "Race")
+    corners = get_circuit_geometry(quali)["corners"]
+
+    deg_rates = get_degradation_rates(race.laps)
+
+    summary_rows = []
+    corner_frames = []
+    for team, d1, d2 in get_team_pairs(race.laps):
+        quali_result = get_qualifying_gap(quali.laps, d1, d2)
+        quali_gap = quali_result[0]
+        race_gap, matched_laps = get_race_pace_gap(race.laps, d1, d2)
+        d1_deg = deg_rates.get(d1)
+        d2_deg = deg_rates.get(d2)
+
+        summary_rows.append({
+            "year": year, "event": event, "team": team, "driver_1": d1, "driver_2": d2,
+            "quali_gap": quali_gap,
+            "race_pace_gap": race_gap,
+            "matched_laps": matched_laps,
+            "deg_rate_1": d1_deg,
+            "deg_rate_2": d2_deg,
+            "deg_diff": d1_deg - d2_deg if d1_deg is not None and d2_deg is not None else None
+        })
+
+        if quali_gap is not None:
+            corner_deltas = get_corner_deltas(quali_result[1], quali_result[2], corners)
+            corner_deltas.insert(0, "driver_2", d2)
+            corner_deltas.insert(0, "driver_1", d1)
+            corner_deltas.insert(0, "team", team)
+            corner_deltas.insert(0, "event", event)
+            corner_deltas.insert(0, "year", year)
+            corner_frames.append(corner_deltas)
+
+    return {
+        "summary": pd.DataFrame(summary_rows),
+        "corners": pd.concat(corner_frames, ignore_index=True) if corner_frames else pd.DataFrame()
+    }
+
+def get_cache_path(year, event, cache_dir=CACHE_DIR):
+    return os.path.join(cache_dir, str(year), f"{event.replace(' ', '_')}.pkl")
+
+def analyse_and_cache_event(year, event, cache_dir=CACHE_DIR):
+    result = analyse_event(year, event)
+    path = get_cache_path(year, event, cache_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Per-process tmp name, so a reader never sees a partly written event
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    pd.to_pickle(result, tmp_path)
+    os.replace(tmp_path, path)
+    return result
+
+def get_completed_events(year):
+    schedule = f1.get_event_schedule(year, include_testing=False)
+    today = pd.Timestamp(datetime.date.today())
+    return list(schedule.loc[schedule["EventDate"] < today, "EventName"])
+
+def build_season_table(year, events=None, workers=None, cache_dir=CACHE_DIR, refresh=False):
+    """
+    Season head-to-head tables, computing only events missing from the cache.
+    Returns (summary, corners) DataFrames covering every event that could be analysed.
+    """
+    if events is None:
+        events = get_completed_events(year)
+
+    results = {}
+    missing = []
+    for event in events:
+        path = get_cache_path(year, event, cache_dir)
+        if os.path.exists(path) and not refresh:
+            results[event] = pd.read_pickle(path)
+        else:
+            missing.append(event)
+
+    if missing:
+        logger.info(f"Analysing {len(missing)} event(s) for {year}: {', '.join(missing)}")
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(analyse_and_cache_event, year, event, cache_dir): event for event in missing}
+            for future in as_completed(futures):
+                event = futures[future]
+                try:
+                    results[event] = future.result()
+                except Exception as e:
+                    logger.error(f"Error analysing {event} {year}: {e}")
+
+    ordered = [results[event] for event in events if event in results]
+    summary = pd.concat([result["summary"] for result in ordered], ignore_index=True) if ordered else pd.DataFrame()
+    corners = pd.concat([result["corners"] for result in ordered], ignore_index=True) if ordered else pd.DataFrame()
+    return summary, corners
+
+
+if __name__ == "__main__":
+    year = 2025
+    summary, corners = build_season_table(year)
+    print(summary)
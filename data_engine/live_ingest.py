@@ -0,0 +1,333 @@
+"""
+Streaming Ingest
+================
+
+Ingests a session while it runs, from its timing feed, instead of from the finished
+`session.laps`. The feed is a JSON-lines file of session, lap and weather messages ordered by
+session time; `record_feed` writes one from any session FastF1 (or a snapshot) can load, so a
+session can be replayed fully offline, optionally paced at real time or faster.
+
+    record_feed(2025, "Australia", "Race", "feeds/australia_race.jsonl")
+    stream_feed("feeds/australia_race.jsonl", speed=10)
+
+Each completed lap goes through the `filter_laps` rules as it arrives. Stint state is kept per
+driver: a new stint starts on a compound change or a pit exit, and its row is written with its
+first clean lap and its lap count updated as laps follow. Laps are written in micro-batches, up to
+`max_batch` laps, so a lap waits at most `max_delay` seconds plus its batch's writes: new weather
+samples, one stint insert, one stint update and one lap insert. Each batch stamps its drivers'
+sessions, so cleaned data served by `race_data` is rebuilt with the new laps.
+
+Unlike batch ingest, a lap is matched to the closest weather sample received so far, since later
+samples are not known yet; FastF1 samples weather every minute, so that is the latest one.
+
+"""
+
+import json
+import time
+from collections import deque
+
+from utils.lazy import lazy_import
+from utils.instrumentation import span, incr, fields, get_logger
+from db_utils.supa_db import create_driver_data, create_session_data, create_stint_data, create_lap_data, create_weather_data
+from db_utils.database_service import F1Database as db
+from data_engine.snapshots import get_session, load_and_snapshot
+from data_engine.clean_cache import stamp_session
+from data_engine.race_data import is_clean_lap
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+logger = get_logger(__name__)
+
+MAX_BATCH = 20  # about one lap of the full grid
+MAX_DELAY = 1.0  # seconds a completed lap may wait for its batch
+WEATHER_WINDOW = 60.0  # seconds, as in `race_data.match_and_store_weather`
+WEATHER_HISTORY = 5
+LATENCY_WINDOW = 10000
+
+LAP_FIELDS = [
+    "Driver", "DriverNumber", "Team", "LapNumber", "Stint", "Compound", "TyreLife", "LapTime",
+    "Sector1Time", "Sector2Time", "Sector3Time", "PitOutTime", "PitInTime", "Time", "TrackStatus", "Deleted"
+]
+WEATHER_FIELDS = ["Time", "AirTemp", "TrackTemp", "Pressure", "Rainfall", "Humidity", "WindDirection", "WindSpeed"]
+TIME_FIELDS = ["LapTime", "Sector1Time", "Sector2Time", "Sector3Time", "PitOutTime", "PitInTime", "Time"]
+
+## Recorded feeds
+
+def get_records(frame):
+    """Rows as dicts of plain values, NaN as None"""
+    return frame.astype(object).where(frame.notna(), None).to_dict("records")
+
+def record_feed(year: int, gp: str, ses: str, path: str, drivers: list = None) -> int:
+    """Write a session's laps and weather as a timing feed; returns the number of messages"""
+    session = get_session(year, gp, ses)
+    with span("session_load", event=gp, session=ses, year=year):
+        load_and_snapshot(session)
+
+    laps = session.laps if drivers is None else session.laps.pick_drivers(drivers)
+    # Laps arrive when they are completed; a lap without a timing line time completes at start + lap time
+    completed = laps["Time"].fillna(laps["LapStartTime"] + laps["LapTime"])
+    laps = pd.DataFrame(laps[LAP_FIELDS]).assign(Time=completed).dropna(subset=["Time"])
+    weather = pd.DataFrame(session.weather_data[WEATHER_FIELDS])
+    for frame in (laps, weather):
+        for column in frame.columns.intersection(TIME_FIELDS):
+            frame[column] = frame[column].dt.total_seconds()
+
+    # Weather first at equal times, so a lap can match the sample taken as it completed
+    messages = [{"t": row["Time"], "type": "weather", "data": row} for row in get_records(weather)]
+    messages += [{"t": row["Time"], "type": "lap", "data": row} for row in get_records(laps)]
+    messages.sort(key=lambda message: message["t"])
+    header = {"t": 0.0, "type": "session", "data": {"event": gp, "year": year, "session_type": ses, "date": session.date.isoformat()}}
+
+    with open(path, "w") as f:
+        for message in [header] + messages:
+            f.write(json.dumps(message, default=str) + "\n")
+    logger.info(f"Recorded {len(laps)} laps and {len(weather)} weather samples of {gp} {year} {ses} to {path}")
+    return len(messages) + 1
+
+def read_feed(path):
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+def decode_lap(data):
+    """Lap message as the lap row `filter_laps` and `create_lap_data` expect"""
+    lap = dict(data)
+    for field in TIME_FIELDS:
+        lap[field] = pd.Timedelta(seconds=lap[field]) if lap[field] is not None else pd.NaT
+    return lap
+
+## Incremental ingest
+
+class StreamingIngest:
+    """One session's laps, stints and weather, written as its feed arrives"""
+    def __init__(self, event, year, session_type, date, drivers=None, max_batch=MAX_BATCH, max_delay=MAX_DELAY, on_flush=None):
+        self.event = event
+        self.year = int(year)
+        self.session_type = session_type
+        self.date = pd.Timestamp(date)
+        self.drivers = set(drivers) if drivers else None
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.on_flush = on_flush  # called with the drivers of every written batch
+        self.session_id = None
+        self._wet = False
+        self._driver_ids = {}
+        self._stints = {}  # driver: their current stint
+        self._weather = deque(maxlen=WEATHER_HISTORY)
+        self._weather_ids = {}  # sample time: weather row id
+        self._pending = []  # (stint, lap, weather sample, arrival)
+        self._deadline = None
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self._counts = {"received": 0, "filtered": 0, "stored": 0, "failed": 0, "stints": 0, "batches": 0}
+
+    def start(self):
+        session_data = create_session_data(self.event, self.date.to_pydatetime(), self.session_type, "dry", self.year)
+        session_response = db.store_session(session_data)
+        self.session_id = session_response["data"][0]["id"] if session_response and session_response["data"] else None
+        if not self.session_id:
+            raise RuntimeError(f"Failed to store session {self.event} {self.year} {self.session_type}")
+        return self
+
+    def close(self):
+        self.flush()
+        return self.get_stats()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # Messages
+
+    def handle(self, message):
+        if message["type"] == "lap":
+            self.on_lap(message["data"])
+        elif message["type"] == "weather":
+            self.on_weather(message["data"])
+        self.poll()
+
+    def on_weather(self, sample):
+        self._weather.append(sample)
+        if sample["Rainfall"] and not self._wet:
+            self._wet = True
+            db.update_session(self.session_id, {"weather_type": True})
+
+    def on_lap(self, data):
+        if self.drivers and data["Driver"] not in self.drivers:
+            return
+        self._counts["received"] += 1
+        incr("stream.laps_received")
+        lap = decode_lap(data)
+        stint = self._stints.get(lap["Driver"])
+        if stint is not None and pd.notna(lap["PitOutTime"]):
+            stint["closed"] = True  # pit exit, the next clean lap starts a new stint
+        if not is_clean_lap(lap):
+            self._counts["filtered"] += 1
+            return
+
+        # FastF1's stint number changes on every pit exit too, in case the out lap never came through
+        new_feed_stint = stint is not None and pd.notna(lap["Stint"]) and lap["Stint"] != stint["feed_stint"]
+        if stint is None or stint["closed"] or lap["Compound"] != stint["compound"] or new_feed_stint:
+            stint = self._open_stint(lap, stint)
+        stint["num_laps"] += 1
+        self._pending.append((stint, lap, self._match_weather(data["Time"]), time.perf_counter()))
+        if self._deadline is None:
+            self._deadline = time.perf_counter() + self.max_delay
+        if len(self._pending) >= self.max_batch:
+            self.flush()
+
+    def _open_stint(self, lap, previous):
+        number = int(lap["Stint"]) if pd.notna(lap["Stint"]) else 0
+        if previous is not None and number <= previous["number"]:
+            number = previous["number"] + 1
+        stint = {
+            "driver": lap["Driver"], "number": max(number, 1), "compound": lap["Compound"], "feed_stint": lap["Stint"],
+            "first_lap": lap, "id": None, "row": None, "num_laps": 0, "closed": False
+        }
+        self._stints[lap["Driver"]] = stint
+        return stint
+
+    def _match_weather(self, lap_time):
+        if lap_time is None:
+            return None
+        diffs = [abs(sample["Time"] - lap_time) for sample in self._weather]
+        if not diffs or min(diffs) > WEATHER_WINDOW:
+            return None
+        return self._weather[int(np.argmin(diffs))]
+
+    # Writes
+
+    def poll(self):
+        """Flush if the oldest waiting lap has waited `max_delay`"""
+        if self._deadline is not None and time.perf_counter() >= self._deadline:
+            self.flush()
+
+    def wait_until(self, until):
+        """Sleep until `until` (time.perf_counter()), flushing on the way when a batch is due"""
+        while (remaining := until - time.perf_counter()) > 0:
+            if self._deadline is not None:
+                remaining = min(remaining, self._deadline - time.perf_counter())
+            time.sleep(max(remaining, 0))
+            self.poll()
+
+    def flush(self):
+        """Write every waiting lap, with new weather samples and new or grown stints"""
+        if not self._pending:
+            return
+        pending, self._pending, self._deadline = self._pending, [], None
+        with span("stream_flush", laps=len(pending)):
+            self._store_stints({id(stint): stint for stint, _, _, _ in pending}.values())
+            weather_ids = self._store_weather([sample for _, _, sample, _ in pending if sample is not None])
+
+            rows, drivers = [], set()
+            for stint, lap, sample, _ in pending:
+                if stint["id"] is None:
+                    continue
+                rows.append(create_lap_data(stint["id"], weather_ids.get(sample["Time"]) if sample else None, lap))
+                drivers.add(stint["driver"])
+            lap_response = db.store_laps(rows) if rows else None
+            stored = len(rows) if lap_response and lap_response["data"] is not None else 0
+            for driver in drivers:
+                stamp_session(driver, self.event, self.year, self.session_type)
+
+        done = time.perf_counter()
+        self._latencies.extend(done - arrival for _, _, _, arrival in pending)
+        self._counts["stored"] += stored
+        self._counts["failed"] += len(pending) - stored
+        self._counts["batches"] += 1
+        incr("stream.laps_stored", stored)
+        incr("stream.batches")
+        if stored < len(pending):
+            logger.error(f"Failed to store {len(pending) - stored} of {len(pending)} streamed laps")
+        if self.on_flush is not None and drivers:
+            self.on_flush(sorted(drivers))
+
+    def _store_stints(self, stints):
+        """New stints in one insert, and the lap counts of grown ones in one update"""
+        new, grown = [], []
+        for stint in stints:
+            if stint["id"] is not None:
+                if stint["num_laps"] != stint["row"]["num_laps"]:
+                    grown.append(stint)
+                continue
+            driver_id = self._get_driver_id(stint["first_lap"])
+            if driver_id is not None:
+                stint["row"] = create_stint_data(self.session_id, driver_id, dict(stint["first_lap"], Stint=stint["number"]), stint["num_laps"])
+                new.append(stint)
+
+        if new:
+            stint_response = db.store_stints([stint["row"] for stint in new])
+            if stint_response and stint_response["data"]:
+                for stint, row in zip(new, stint_response["data"]):
+                    stint["id"] = row["id"]
+                self._counts["stints"] += len(new)
+            else:
+                logger.error(f"Failed to store {len(new)} stint(s), skipping their laps")
+        if grown:
+            rows = [dict(stint["row"], id=stint["id"], num_laps=stint["num_laps"]) for stint in grown]
+            if db.update_stints(rows)["data"] is not None:
+                for stint in grown:
+                    stint["row"]["num_laps"] = stint["num_laps"]
+
+    def _store_weather(self, samples):
+        for sample in samples:
+            if sample["Time"] in self._weather_ids:
+                continue
+            weather_data = create_weather_data(self.session_id, sample, self.date + pd.Timedelta(seconds=sample["Time"]))
+            weather_response = db.store_weather(weather_data)
+            self._weather_ids[sample["Time"]] = weather_response["data"][0]["id"] if weather_response and weather_response["data"] else None
+        return self._weather_ids
+
+    def _get_driver_id(self, lap):
+        """Drivers are created by their FP1, as in `race_data.store_session_stints`"""
+        driver = lap["Driver"]
+        if driver not in self._driver_ids:
+            driver_data = create_driver_data(driver, lap["DriverNumber"], lap["Team"])
+            if self.session_type == "FP1":
+                driver_response = db.store_driver(driver_data)
+                driver_id = driver_response["data"][0]["id"] if driver_response and driver_response.get("data") else None
+            else:
+                driver_id = db.get_driver_id(driver_data)
+            if driver_id is None:
+                logger.warning(f"Driver {driver} not found, their laps of {self.event} {self.year} {self.session_type} are skipped")
+            self._driver_ids[driver] = driver_id
+        return self._driver_ids[driver]
+
+    def get_stats(self) -> dict:
+        latencies = np.array(self._latencies) * 1000
+        return {
+            "laps": self._counts["received"],
+            "filtered": self._counts["filtered"],
+            "stored": self._counts["stored"],
+            "failed": self._counts["failed"],
+            "stints": self._counts["stints"],
+            "batches": self._counts["batches"],
+            "mean_batch_size": (self._counts["stored"] + self._counts["failed"]) / self._counts["batches"] if self._counts["batches"] else 0,
+            "p50_ms": float(np.percentile(latencies, 50)) if len(latencies) else None,
+            "p99_ms": float(np.percentile(latencies, 99)) if len(latencies) else None,
+            "max_ms": float(latencies.max()) if len(latencies) else None
+        }
+
+def stream_feed(path, speed=None, drivers=None, max_batch=MAX_BATCH, max_delay=MAX_DELAY, on_flush=None) -> dict:
+    """
+    Replay a recorded feed through `StreamingIngest`, as fast as possible or paced at `speed` times
+    real time; returns the ingest stats
+    """
+    messages = read_feed(path)
+    header = next(messages, None)
+    if header is None or header["type"] != "session":
+        raise ValueError(f"{path} does not start with a session message")
+
+    ingest = StreamingIngest(**header["data"], drivers=drivers, max_batch=max_batch, max_delay=max_delay, on_flush=on_flush)
+    start = time.perf_counter()
+    with span("stream_feed", **header["data"]), ingest:
+        for message in messages:
+            if speed:
+                ingest.wait_until(start + (message["t"] - header["t"]) / speed)
+            ingest.handle(message)
+    stats = ingest.get_stats()
+    logger.info("Feed streamed", extra=fields(stored=stats["stored"], laps=stats["laps"], batches=stats["batches"], p99_ms=round(stats["p99_ms"] or 0, 1)))
+    return stats
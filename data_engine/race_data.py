@@ -1,29 +1,27 @@
 "Use data for Fernando Alonso's fastest lap, FP3, Bahrain GP, 2025"
 
-import fastf1 as f1
-import fastf1.plotting
-import seaborn as sns
-import matplotlib as mpl
-from matplotlib import pyplot as plt
-from matplotlib.collections import LineCollection
-import numpy as np
-import pandas as pd
-from scipy.signal import savgol_filter
-import warnings
-import datetime
-
-from db_utils.supa_db import DriverData, SessionData, StintData, LapData, WeatherData, create_driver_data, create_session_data, create_stint_data, create_lap_data, create_weather_data
+from utils.lazy import lazy_import
+from utils.instrumentation import span, incr, fields, get_logger
+
+from db_utils.supa_db import DriverData, SessionData, StintData, LapData, WeatherData, create_driver_data, create_session_data, create_stint_data, create_lap_data, create_weather_data, create_lap_telemetry_data
 from db_utils.database_service import F1Database as db
+from data_engine.snapshots import get_session, load_and_snapshot
+from data_engine.clean_cache import get_cached_frame, stamp_session
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+logger = get_logger(__name__)
 
-pd.set_option('display.max_columns', None)
-pd.set_option('display.width', None)
-pd.set_option('display.max_colwidth', None)
+# Cleaning keeps laps within LAP_TIME_THRESHOLD seconds of their stint's median, from stints of at least MIN_STINT_LAPS laps
+LAP_TIME_THRESHOLD = 3.0
+MIN_STINT_LAPS = 5
 
 ## Fun example code for visualization
 
 def get_lap(year, gp, ses, driver):
-    session = f1.get_session(year, gp, ses)
-    session.load()
+    session = get_session(year, gp, ses)
+    load_and_snapshot(session)
     lap = session.laps.pick_drivers(driver).pick_fastest()
     return lap
 
@@ -44,14 +42,19 @@ def get_fastest_lap_telemetry(year, gp, ses, driver):
 
 ## Data code in use
 
-def store_session_stints(year: int, gp: str, driver: str, ses: str):
-    """Store session data, stints, and laps directly in database"""
+def store_session_stints(year: int, gp: str, driver: str, ses: str, telemetry: bool = False) -> bool:
+    """
+    Store session data, stints, and laps directly in database, with each lap's telemetry if `telemetry`.
+    Returns False when nothing of the driver's session could be stored (so it is safe to retry);
+    a stint that fails after others were written is logged and the rest are still stored.
+    """
     try:
-        session = f1.get_session(year, gp, ses)
+        session = get_session(year, gp, ses)
     except Exception as e:
-        print(f"Exception in retrieving session: {e}")
-        return 
-    session.load()
+        logger.error(f"Exception in retrieving session: {e}")
+        return False
+    with span("session_load", event=gp, session=ses, year=year):
+        load_and_snapshot(session)
     weather_data = session.weather_data
     date = session.date.to_pydatetime()
     event_weather = "wet" if weather_data["Rainfall"].any() else "dry"
@@ -62,15 +65,15 @@ def store_session_stints(year: int, gp: str, driver: str, ses: str):
     session_id = session_response["data"][0]["id"] if session_response and session_response["data"] else None
     
     if not session_id:
-        print("Failed to store session, aborting...")
-        return
+        logger.error("Failed to store session, aborting...")
+        return False
 
     laps = session.laps.pick_drivers(driver)
     laps = filter_laps(laps)
     # Store driver if first session
     if len(laps) == 0:
-        print(f"Driver did not take part in {gp, ses, year}")
-        return
+        logger.warning(f"Driver did not take part in {gp, ses, year}")
+        return True
     driver_number = laps.iloc[0]["DriverNumber"]
     team = laps.iloc[0]["Team"]
     driver_data: DriverData = {
@@ -81,30 +84,43 @@ def store_session_stints(year: int, gp: str, driver: str, ses: str):
         driver_id = driver_response["data"][0]["id"] if driver_response and driver_response.get("data") else None
     else:
         driver_id = db.get_driver_id(driver_data)
-    
-    laps_by_stint = laps.groupby('Stint')
-    for stint_number, stint_laps in laps_by_stint:
-        print(f"Processing Stint {stint_number}")
-        store_stint(stint_laps, session_id, driver_id, session)
+    if driver_id is None:
+        logger.error(f"No driver id for {driver}, aborting...")
+        return False
 
-def store_stint(laps, session_id, driver_id, session):
+    laps_by_stint = laps.groupby('Stint')
+    try:
+        for stint_number, stint_laps in laps_by_stint:
+            logger.debug(f"Processing Stint {stint_number}")
+            with span("store_stint", stint=stint_number, laps=len(stint_laps)):
+                store_stint(stint_laps, session_id, driver_id, session, telemetry)
+    finally:
+        # Even a partial write changes what cleaning would return
+        stamp_session(driver, gp, year, ses)
+    return True
+
+def store_stint(laps, session_id, driver_id, session, telemetry=False):
     first_lap = laps.iloc[0]
     stint_data = create_stint_data(session_id, driver_id, first_lap, len(laps))
 
-    print(f"Stint Number: {laps.iloc[0]["Stint"]}")
+    logger.debug(f"Stint Number: {laps.iloc[0]['Stint']}")
 
     stint_response = db.store_stint(stint_data)
+    if not stint_response or not stint_response["data"]:
+        logger.error(f"Failed to store stint {stint_data['stint_number']}, skipping its laps")
+        return
     stint_id = stint_response["data"][0]["id"]
 
-    store_laps(laps, session_id, stint_id, session)
+    store_laps(laps, session_id, stint_id, session, telemetry)
 
 def match_and_store_weather(time_of_lap, session_id, session):
     """Match weather and store, return weather_id"""
     if pd.isna(time_of_lap):
         return None
     weather_data = session.weather_data
-    time_diffs = abs(weather_data['Time'] - time_of_lap)
-    within_minute = time_diffs <= pd.Timedelta(minutes=1)
+    with span("weather_match"):
+        time_diffs = abs(weather_data['Time'] - time_of_lap)
+        within_minute = time_diffs <= pd.Timedelta(minutes=1)
     if within_minute.any():
         closest_idx = time_diffs[within_minute].idxmin()
         weather_row = weather_data.loc[closest_idx]
@@ -117,7 +133,8 @@ def match_and_store_weather(time_of_lap, session_id, session):
         return weather_response["data"][0]["id"] if weather_response and weather_response["data"] else None
     return None
 
-def store_laps(laps, session_id, stint_id, session):
+def store_laps(laps, session_id, stint_id, session, telemetry=False):
+    telemetry_rows = []
     # Process and store each lap directly
     for _, lap_row in laps.iterrows():
     # Get weather_id for this lap
@@ -125,7 +142,24 @@ def store_laps(laps, session_id, stint_id, session):
 
         lap_data = create_lap_data(stint_id, weather_id, lap_row)
         
-        db.store_lap(lap_data)
+        lap_response = db.store_lap(lap_data)
+        incr("laps_stored")
+        if telemetry and lap_response and lap_response["data"]:
+            try:
+                with span("encode_telemetry"):
+                    telemetry_rows.append(create_lap_telemetry_data(lap_response["data"][0]["id"], get_lap_channels(lap_row)))
+            except Exception as e:
+                # The lap row is already stored, so losing its telemetry must not abort the stint
+                logger.warning(f"No telemetry stored for lap {lap_row['LapNumber']}: {e}")
+
+    # One bulk write for the stint's telemetry
+    if telemetry_rows:
+        db.store_lap_telemetries(telemetry_rows)
+        incr("lap_telemetry_stored", len(telemetry_rows))
+
+def get_lap_channels(lap):
+    """Car and position data of a lap on one timeline, without the costly driver-ahead channels of `lap.telemetry`"""
+    return lap.get_car_data().merge_channels(lap.get_pos_data()).add_distance()
     
 def filter_laps(laps):
     return laps.loc[(laps['Deleted'] == False) &
@@ -134,6 +168,14 @@ def filter_laps(laps):
                          (laps['PitInTime'].isna()) &
                          (laps['TrackStatus'] == '1')].copy()
 
+def is_clean_lap(lap):
+    """`filter_laps` for a single lap (a row or dict), for laps arriving one at a time"""
+    return (lap['Deleted'] == False and
+            pd.notna(lap['LapTime']) and
+            pd.isna(lap['PitOutTime']) and
+            pd.isna(lap['PitInTime']) and
+            lap['TrackStatus'] == '1')
+
 def store_weekend_data(year: int, gp: str, driver: str):
     """Store complete weekend data"""
     store_session_stints(year, gp, driver, "FP1")
@@ -141,17 +183,16 @@ def store_weekend_data(year: int, gp: str, driver: str):
     store_session_stints(year, gp, driver, "FP3")
     store_session_stints(year, gp, driver, "Qualifying")
     store_session_stints(year, gp, driver, "Race")
-    print(f"Stored complete weekend data for {driver} at {gp} {year}")
+    logger.info("Weekend stored", extra=fields(driver=driver, event=gp, year=year))
 
-def get_cleaned_stint_data(driver_data, stint):
+def get_cleaned_stint_data(driver_data, stint, threshold=LAP_TIME_THRESHOLD):
     cleaned_stint_laps = []
-    if stint['num_laps'] < 5:
-            return
+    if stint['num_laps'] < MIN_STINT_LAPS:
+            return cleaned_stint_laps
     laps = db.get_stint_laps(stint['id'])
     lap_times = [lap['lap_time'] for lap in laps]
     
     median_time = np.median(lap_times)
-    threshold = 3.0
 
     for lap in laps:
         lap = add_weather_to_lap(lap)
@@ -165,7 +206,7 @@ def get_cleaned_stint_data(driver_data, stint):
     selected_laps = [lap for lap in laps if lap['lap_time'] <= median_time + threshold]
 
     if len(selected_laps) < 2:
-        return
+        return cleaned_stint_laps
     
     for lap in selected_laps:
         lap['stint_number'] = stint['stint_number']
@@ -175,19 +216,42 @@ def get_cleaned_stint_data(driver_data, stint):
         cleaned_stint_laps.append(lap)
     return cleaned_stint_laps
 
-def get_cleaned_weekend_data(driver_data, event, year):
-    all_stints = db.get_driver_stints(driver_data, event, year)
-    cleaned_laps = []
-    for stint in all_stints:
-        cleaned_laps += get_cleaned_stint_data(driver_data, stint)
-    return pd.DataFrame(cleaned_laps)
+def get_cleaning_params(threshold):
+    return {"threshold": threshold, "min_stint_laps": MIN_STINT_LAPS}
+
+def get_cleaned_weekend_data(driver_data, event, year, threshold=LAP_TIME_THRESHOLD, refresh=False):
+    """Cleaned laps of every session of the weekend, served from the cleaned data cache when nothing was ingested since"""
+    def build():
+        all_stints = db.get_driver_stints(driver_data, event, year)
+        cleaned_laps = []
+        for stint in all_stints:
+            cleaned_laps += get_cleaned_stint_data(driver_data, stint, threshold)
+        return pd.DataFrame(cleaned_laps)
+
+    with span("cleaning", driver=driver_data['driver_name'], event=event, year=year):
+        return get_cached_frame(driver_data, event, year, None, get_cleaning_params(threshold), build, refresh=refresh)
+
+def get_cleaned_session_data(driver_data, event, session, year, threshold=LAP_TIME_THRESHOLD, refresh=False):
+    def build():
+        all_stints = db.get_driver_stints_by_session(driver_data, event, year, session)
+        cleaned_laps = []
+        for stint in all_stints:
+            cleaned_laps += get_cleaned_stint_data(driver_data, stint, threshold)
+        return pd.DataFrame(cleaned_laps)
 
-def get_cleaned_session_data(driver_data, event, session, year):
-    all_stints = db.get_driver_stints_by_session(driver_data, event, year, session)
-    cleaned_laps = []
-    for stint in all_stints:
-        cleaned_laps += get_cleaned_stint_data(driver_data, stint)
-    return pd.DataFrame(cleaned_laps)
+    with span("cleaning", driver=driver_data['driver_name'], event=event, year=year, session=session):
+        return get_cached_frame(driver_data, event, year, session, get_cleaning_params(threshold), build, refresh=refresh)
+
+def get_stint_summary_data(driver_data, event, year, session=None):
+    """Per-stint aggregates computed in the database, without pulling any laps"""
+    return pd.DataFrame(db.get_stint_summaries(driver_data, event, year, session))
+
+def get_session_summary_data(event, year):
+    return pd.DataFrame(db.get_session_summaries(event, year))
+
+def get_fastest_lap_telemetry_data(year, session=None, event=None):
+    """Each driver's fastest lap per session from stored telemetry, channels decoded into a "telemetry" column"""
+    return pd.DataFrame(db.get_fastest_lap_telemetry(year, session, event))
 
 def add_lap_time_delta(lap, prev_lap_time):
     lap['lap_time_delta'] = lap['lap_time'] - prev_lap_time
@@ -233,7 +297,10 @@ def get_all_weekend_laps(event, year):
     return all_weekend_laps
 
 if __name__ == "__main__":
-    
+    pd.set_option('display.max_columns', None)
+    pd.set_option('display.width', None)
+    pd.set_option('display.max_colwidth', None)
+
     event = "Australia"
     year = 2025
     driver = create_driver_data("HAM", 44, "Ferrari")
@@ -0,0 +1,295 @@
+"""
+Session Snapshots
+=================
+
+A loaded FastF1 session saved as Arrow IPC files (laps, weather, results, status data, circuit
+info and car/position telemetry) plus a small metadata file. Snapshots are read through memory
+maps, so opening one costs milliseconds and telemetry is only materialised for the drivers that
+are actually used.
+
+    session = get_session(2025, "Australia", "Race")   # snapshot if there is one
+    load_and_snapshot(session)                         # FastF1 load, then snapshot if historical
+
+Sessions are snapshotted once they are a day old, so live weekends are always reloaded. Set
+F1_SNAPSHOTS=0 to bypass snapshots entirely.
+
+"""
+
+import os
+import json
+import shutil
+import datetime
+from collections.abc import Mapping
+
+from utils.lazy import lazy_import
+from utils.instrumentation import span, get_logger
+
+f1 = lazy_import("fastf1")
+pa = lazy_import("pyarrow")
+pd = lazy_import("pandas")
+
+logger = get_logger(__name__)
+
+SNAPSHOT_DIR = os.path.join(os.environ.get("F1_CACHE_DIR", ".f1_cache"), "snapshots")
+SNAPSHOT_VERSION = 1
+USE_SNAPSHOTS = os.environ.get("F1_SNAPSHOTS", "1") != "0"
+HISTORICAL_AFTER = datetime.timedelta(days=1)
+
+FRAMES = ["laps", "weather_data", "results", "session_status", "track_status", "race_control_messages"]
+TELEMETRY = ["car_data", "pos_data"]
+CIRCUIT_FRAMES = ["corners", "marshal_lights", "marshal_sectors"]
+
+## Arrow files
+
+def to_table(df):
+    try:
+        return pa.Table.from_pandas(df, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # Mixed-type object columns (e.g. race control messages), store them as text
+        df = df.copy()
+        for column in df.columns[df.dtypes == object]:
+            df[column] = df[column].astype("string")
+        return pa.Table.from_pandas(df, preserve_index=False)
+
+def write_table(df, path):
+    with pa.OSFile(path, "wb") as sink:
+        table = to_table(df)
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+
+def read_table(path):
+    """Memory-mapped read, the table's buffers point straight into the file"""
+    return pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+
+def to_frame(table):
+    return table.to_pandas(split_blocks=True)
+
+## Snapshot session
+
+class SnapshotTelemetry(Mapping):
+    """Per-driver telemetry sliced out of one memory-mapped table on first access"""
+    def __init__(self, table, offsets, session):
+        self._table = table
+        self._offsets = offsets
+        self._session = session
+        self._cache = {}
+
+    def __getitem__(self, driver):
+        from fastf1.core import Telemetry
+
+        if driver not in self._cache:
+            start, length = self._offsets[driver]
+            data = to_frame(self._table.slice(start, length))
+            self._cache[driver] = Telemetry(data, session=self._session, driver=driver)
+        return self._cache[driver]
+
+    def __iter__(self):
+        return iter(self._offsets)
+
+    def __len__(self):
+        return len(self._offsets)
+
+class SnapshotSession:
+    """The parts of `fastf1.core.Session` the pipeline uses, restored from a snapshot; `load()` is a no-op"""
+    def __init__(self, path, meta):
+        from fastf1.core import Laps, SessionResults
+        from fastf1.mvapi import CircuitInfo
+
+        self.path = path
+        self.name = meta["name"]
+        self.date = pd.Timestamp(meta["date"]) if meta["date"] else None
+        self.t0_date = pd.Timestamp(meta["t0_date"]) if meta["t0_date"] else None
+        self.session_start_time = pd.Timedelta(meta["session_start_time"]) if meta["session_start_time"] is not None else None
+        self.api_path = meta["api_path"]
+        self.drivers = meta["drivers"]
+        self.total_laps = meta["total_laps"]
+        self._QUALI_LIKE_SESSIONS = tuple(meta["quali_like_sessions"])
+        self._RACE_LIKE_SESSIONS = tuple(meta["race_like_sessions"])
+        self._session_split_times = [pd.Timedelta(t) for t in meta["split_times"]] if meta["split_times"] is not None else None
+
+        event = self._read("event")
+        self.event = event.iloc[0] if event is not None else None
+
+        for name in FRAMES:
+            setattr(self, name, self._read(name))
+        if self.laps is not None:
+            self.laps = Laps(self.laps, session=self)
+        if self.results is not None:
+            self.results = SessionResults(self.results)
+
+        for name in TELEMETRY:
+            offsets = meta[name]
+            telemetry = SnapshotTelemetry(read_table(self._get_file(name)), offsets, self) if offsets is not None else None
+            setattr(self, name, telemetry)
+
+        self._circuit_info = None
+        if meta["circuit_rotation"] is not None:
+            frames = {name: self._read(f"circuit_{name}") for name in CIRCUIT_FRAMES}
+            self._circuit_info = CircuitInfo(rotation=meta["circuit_rotation"], **frames)
+
+    def _get_file(self, name):
+        return os.path.join(self.path, f"{name}.arrow")
+
+    def _read(self, name):
+        path = self._get_file(name)
+        return to_frame(read_table(path)) if os.path.exists(path) else None
+
+    def load(self, **kwargs):
+        pass
+
+    def get_circuit_info(self):
+        return self._circuit_info
+
+    def get_driver(self, identifier):
+        results = self.results
+        match = results[(results["Abbreviation"] == identifier) | (results["DriverNumber"] == str(identifier))]
+        return match.iloc[0]
+
+    def __repr__(self):
+        return f"SnapshotSession({self.path})"
+
+## Save and load
+
+def get_snapshot_path(year, event, session, snapshot_dir=SNAPSHOT_DIR):
+    return os.path.join(snapshot_dir, str(year), event.replace(" ", "_"), session.replace(" ", "_"))
+
+def get_timedelta_ns(value):
+    return None if value is None or pd.isna(value) else int(pd.Timedelta(value).value)
+
+def get_timestamp_iso(value):
+    return None if value is None or pd.isna(value) else pd.Timestamp(value).isoformat()
+
+def save_snapshot(session_obj, year, event, session, snapshot_dir=SNAPSHOT_DIR):
+    """Write a loaded session to disk, replacing any existing snapshot; returns the snapshot path"""
+    path = get_snapshot_path(year, event, session, snapshot_dir)
+    # Per-process tmp dir, render workers may snapshot the same session at once
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    def get(name):
+        try:
+            return getattr(session_obj, name)
+        except Exception:  # FastF1 raises if that part of the session was not loaded
+            return None
+
+    event_info = get("event")
+    if event_info is not None:
+        write_table(pd.DataFrame([event_info]), os.path.join(tmp_path, "event.arrow"))
+
+    for name in FRAMES:
+        df = get(name)
+        if df is not None:
+            write_table(pd.DataFrame(df), os.path.join(tmp_path, f"{name}.arrow"))
+
+    telemetry_offsets = {}
+    for name in TELEMETRY:
+        by_driver = get(name)
+        if not by_driver:
+            telemetry_offsets[name] = None
+            continue
+        offsets, start = {}, 0
+        for driver, data in by_driver.items():
+            offsets[driver] = (start, len(data))
+            start += len(data)
+        frames = [pd.DataFrame(data) for data in by_driver.values()]
+        write_table(pd.concat(frames, ignore_index=True), os.path.join(tmp_path, f"{name}.arrow"))
+        telemetry_offsets[name] = offsets
+
+    circuit_info = None
+    try:
+        circuit_info = session_obj.get_circuit_info()
+    except Exception as e:
+        logger.debug(f"No circuit info for {year} {event} {session}: {e}")
+    if circuit_info is not None:
+        for name in CIRCUIT_FRAMES:
+            write_table(getattr(circuit_info, name), os.path.join(tmp_path, f"circuit_{name}.arrow"))
+
+    split_times = get("_session_split_times")
+    meta = {
+        "version": SNAPSHOT_VERSION,
+        "name": session_obj.name,
+        "date": get_timestamp_iso(get("date")),
+        "t0_date": get_timestamp_iso(get("t0_date")),
+        "session_start_time": get_timedelta_ns(get("session_start_time")),
+        "api_path": get("api_path"),
+        "drivers": list(get("drivers") or []),
+        "total_laps": get("total_laps"),
+        "quali_like_sessions": list(get("_QUALI_LIKE_SESSIONS") or ("Qualifying", "Sprint Qualifying")),
+        "race_like_sessions": list(get("_RACE_LIKE_SESSIONS") or ("Race", "Sprint")),
+        "split_times": [get_timedelta_ns(t) for t in split_times] if split_times else None,
+        "circuit_rotation": float(circuit_info.rotation) if circuit_info is not None else None,
+        **telemetry_offsets
+    }
+    with open(os.path.join(tmp_path, "meta.json"), "w") as f:
+        json.dump(meta, f, indent=2)
+
+    shutil.rmtree(path, ignore_errors=True)
+    try:
+        os.replace(tmp_path, path)
+    except OSError:
+        if not os.path.isdir(path):
+            raise
+        # Another process saved the same session between the rmtree and here, keep its snapshot
+        shutil.rmtree(tmp_path, ignore_errors=True)
+    return path
+
+def load_snapshot(year, event, session, snapshot_dir=SNAPSHOT_DIR):
+    """The session's snapshot, or None if there is no usable one"""
+    path = get_snapshot_path(year, event, session, snapshot_dir)
+    meta_path = os.path.join(path, "meta.json")
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path) as f:
+        meta = json.load(f)
+    if meta.get("version") != SNAPSHOT_VERSION:
+        return None
+    return SnapshotSession(path, meta)
+
+def is_historical(session_obj, now=None):
+    date = getattr(session_obj, "date", None)
+    if date is None or pd.isna(date):
+        return False
+    now = now or datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+    return pd.Timestamp(date).tz_localize(None) + HISTORICAL_AFTER < now
+
+## Drop-in replacements for f1.get_session(...).load()
+
+def get_session(year, event, session, snapshot_dir=SNAPSHOT_DIR):
+    """Snapshot of the session if one exists (already loaded), otherwise FastF1's session object"""
+    if USE_SNAPSHOTS:
+        with span("snapshot_load", event=event, session=session, year=year):
+            snapshot = load_snapshot(year, event, session, snapshot_dir)
+        if snapshot is not None:
+            return snapshot
+    session_obj = f1.get_session(year, event, session)
+    session_obj.snapshot_key = (year, event, session, snapshot_dir)
+    return session_obj
+
+def load_and_snapshot(session_obj):
+    """Load a session from `get_session` and snapshot it if it is historical"""
+    session_obj.load()
+    key = getattr(session_obj, "snapshot_key", None)
+    if not USE_SNAPSHOTS or key is None or isinstance(session_obj, SnapshotSession) or not is_historical(session_obj):
+        return session_obj
+    try:
+        with span("snapshot_save", event=key[1], session=key[2], year=key[0]):
+            save_snapshot(session_obj, *key)
+    except Exception as e:
+        logger.warning(f"Could not snapshot {key[0]} {key[1]} {key[2]}: {e}")
+    return session_obj
+
+
+if __name__ == "__main__":
+    import time
+
+    year, event, session = 2025, "Australia", "Race"
+    start = time.perf_counter()
+    session_obj = get_session(year, event, session)
+    load_and_snapshot(session_obj)
+    print(f"First load: {time.perf_counter() - start:.2f}s ({type(session_obj).__name__})")
+
+    start = time.perf_counter()
+    snapshot = load_snapshot(year, event, session)
+    laps = snapshot.laps
+    print(f"Snapshot load: {time.perf_counter() - start:.3f}s, {len(laps)} laps")
@@ -0,0 +1,360 @@
+"""
+Session Telemetry Processing
+============================
+
+Smooths and derives channels for every lap of a session at once. Each driver's car and position
+data is cut into laps and resampled onto one distance grid, giving (laps, samples) arrays
+with NaN past the end of each lap. Everything after that is vectorised over the stack:
+    - Savitzky-Golay smoothing of speed and track position
+    - longitudinal acceleration (v dv/ds) and lateral acceleration (v^2 x curvature), in g
+    - braking zones, lift-and-coast segments and gear shifts as tables of events
+    - per-lap features: full-throttle %, braking and coasting distance, peak g, shift counts
+
+    processed = get_session_telemetry(2025, "Australia", "Qualifying")
+    processed["features"]              # one row per lap, joinable to cleaned laps
+    get_processed_lap_channels(processed, "VER", 14)
+
+Results are cached to disk per session, so every chart of a session shares one pass.
+`add_lap_features` joins the per-lap features onto cleaned laps; training does not use them yet.
+
+"""
+
+import os
+from functools import lru_cache
+
+import numpy as np
+
+from utils.lazy import lazy_import
+from utils.instrumentation import span, get_logger
+
+pd = lazy_import("pandas")
+
+logger = get_logger(__name__)
+
+CACHE_DIR = os.path.join(os.environ.get("F1_CACHE_DIR", ".f1_cache"), "telemetry_features")
+PROCESSING_VERSION = 2
+
+STEP = 5.0  # metres between samples
+SMOOTH_WINDOW = 9  # samples, 45 m at the default step
+POLYORDER = 2
+# Position comes at ~4 Hz and curvature is a second derivative, so it needs a wider window
+POSITION_WINDOW = 21
+POSITION_POLYORDER = 3
+G = 9.81
+FULL_THROTTLE = 98  # %
+LIFT_THROTTLE = 10  # %, below this with the brake off the car is coasting
+COAST_MIN_SPEED = 100  # km/h, slower coasting is a hairpin not a lift
+MIN_BRAKING_SAMPLES = 2
+MIN_COAST_SAMPLES = 4
+LAP_OFFSET = 1e6  # metres between laps on the combined interpolation axis, longer than any lap
+
+CONTINUOUS = ["Speed", "RPM", "Throttle", "X", "Y"]
+DISCRETE = ["nGear", "Brake", "DRS"]
+LAP_COLUMNS = ["Driver", "DriverNumber", "LapNumber", "LapTime", "Stint", "Compound", "TyreLife"]
+
+## Stacking
+
+def to_seconds(values):
+    values = np.asarray(values)
+    if np.issubdtype(values.dtype, np.timedelta64):
+        return values.astype("timedelta64[ns]").astype(np.int64) / 1e9
+    return values.astype(float)
+
+def cut_laps(t, speed, starts, ends):
+    """Lap index and in-lap distance for every sample, -1 for samples outside the laps"""
+    lap = np.searchsorted(starts, t, side="right") - 1
+    inside = (lap >= 0) & (t <= ends[np.clip(lap, 0, None)])
+    lap = np.where(inside, lap, -1)
+
+    step = np.zeros_like(t)
+    step[1:] = speed[1:] / 3.6 * np.diff(t)
+    # Each lap's first sample is measured from the lap start, as FastF1's add_distance does
+    first = np.flatnonzero(np.r_[True, lap[1:] != lap[:-1]])
+    step[first] = speed[first] / 3.6 * (t[first] - starts[np.clip(lap[first], 0, None)])
+    step[~inside] = 0
+    distance = np.cumsum(step)
+    distance -= np.repeat(distance[first] - step[first], np.diff(np.r_[first, len(t)]))
+    return lap, distance
+
+def stack_driver(car, pos, laps, grid):
+    """Resample all of one driver's laps onto `grid` with one interpolation per channel"""
+    t = to_seconds(car["SessionTime"])
+    speed = car["Speed"].to_numpy(dtype=float)
+    starts, ends = to_seconds(laps["LapStartTime"]), to_seconds(laps["Time"])
+    lap, distance = cut_laps(t, speed, starts, ends)
+
+    # Each lap also takes the sample just before it, at negative distance, so the lap's first
+    # metres interpolate towards the car's actual position instead of blending with the previous lap
+    samples = np.flatnonzero(lap >= 0)
+    firsts = samples[np.r_[True, lap[samples[1:]] != lap[samples[:-1]]]] if len(samples) else samples
+    leads = firsts[firsts > 0]
+    lead_distance = distance[leads] - speed[leads] / 3.6 * (t[leads] - t[leads - 1])
+    order = np.argsort(np.r_[samples, leads - 0.5], kind="stable")
+    source = np.r_[samples, leads - 1][order]
+    sample_lap = np.r_[lap[samples], lap[leads]][order]
+    sample_distance = np.r_[distance[samples], lead_distance][order]
+
+    # Laps laid end to end on one increasing axis
+    key = sample_lap * LAP_OFFSET + sample_distance
+    lap_start = np.full(len(laps), np.inf)
+    np.minimum.at(lap_start, sample_lap, sample_distance)
+    lap_length = np.zeros(len(laps))
+    np.maximum.at(lap_length, sample_lap, sample_distance)
+    grid_key = (np.arange(len(laps))[:, None] * LAP_OFFSET + np.maximum(grid[None, :], lap_start[:, None])).ravel()
+    outside = (grid[None, :] > lap_length[:, None]) | ~np.isfinite(lap_start)[:, None]
+
+    channels = {}
+    pos_t = to_seconds(pos["SessionTime"]) if pos is not None and len(pos) else None
+    for name in CONTINUOUS + DISCRETE + ["Time"]:
+        if name == "Time":
+            values = t[source] - starts[sample_lap]
+        elif name in ("X", "Y"):
+            if pos_t is None:
+                continue
+            values = np.interp(t[source], pos_t, pos[name].to_numpy(dtype=float))
+        elif name in car:
+            values = car[name].to_numpy(dtype=float)[source]
+        else:
+            continue
+        if not len(values):
+            stacked = np.full(grid_key.shape, np.nan)
+        elif name in DISCRETE:
+            stacked = values[np.clip(np.searchsorted(key, grid_key, side="right") - 1, 0, len(values) - 1)]
+        else:
+            stacked = np.interp(grid_key, key, values)
+        stacked = stacked.reshape(len(laps), len(grid))
+        stacked[outside] = np.nan
+        channels[name] = stacked
+    return channels
+
+def get_session_laps(session_obj):
+    laps = session_obj.laps
+    laps = laps[laps["LapTime"].notna() & laps["LapStartTime"].notna() & laps["Time"].notna()]
+    return laps.sort_values(["DriverNumber", "LapStartTime"])
+
+def stack_session(session_obj, step=STEP):
+    """(laps table, distance grid, {channel: (laps, samples) array}) for every timed lap of the session"""
+    laps = get_session_laps(session_obj)
+    # Grid long enough for the longest lap, measured on the fastest one plus margin
+    fastest = to_seconds(laps["LapTime"]).min() if len(laps) else 0
+    max_speed = max((session_obj.car_data[number]["Speed"].max() for number in laps["DriverNumber"].unique()), default=0)
+    grid = np.arange(0, fastest * max_speed / 3.6 * 1.5 + step, step)
+
+    driver_channels = []
+    for number, driver_laps in laps.groupby("DriverNumber", sort=False):
+        car = session_obj.car_data[number]
+        pos = session_obj.pos_data[number] if session_obj.pos_data is not None and number in session_obj.pos_data else None
+        driver_channels.append(stack_driver(car, pos, driver_laps, grid))
+
+    names = set.intersection(*(set(channels) for channels in driver_channels)) if driver_channels else set()
+    channels = {name: np.concatenate([c[name] for c in driver_channels]) for name in names}
+    # Trim the grid to the longest lap actually seen
+    valid = np.isfinite(channels["Speed"]).any(axis=0) if "Speed" in channels else np.zeros(len(grid), dtype=bool)
+    n = int(np.flatnonzero(valid)[-1]) + 1 if valid.any() else 0
+    channels = {name: values[:, :n] for name, values in channels.items()}
+
+    table = pd.DataFrame({column: laps[column].to_numpy() for column in LAP_COLUMNS if column in laps})
+    table["LapTime"] = to_seconds(table["LapTime"])
+    return table, grid[:n], channels
+
+## Derived channels
+
+def fill_tail(values):
+    """Repeat each row's last valid value over its NaN tail, so filters do not smear NaN into the lap"""
+    valid = np.isfinite(values)
+    last = np.where(valid.any(axis=1), valid.shape[1] - 1 - np.argmax(valid[:, ::-1], axis=1), 0)
+    edge = values[np.arange(len(values)), last]
+    return np.where(valid, values, np.nan_to_num(edge)[:, None]), valid
+
+def smooth(values, step, deriv=0, window=SMOOTH_WINDOW, polyorder=POLYORDER):
+    from scipy import signal
+
+    filled, valid = fill_tail(values)
+    if filled.shape[1] < window:
+        return np.where(valid, filled if deriv == 0 else 0.0, np.nan)
+    result = signal.savgol_filter(filled, window, polyorder, deriv=deriv, delta=step, axis=1)
+    return np.where(valid, result, np.nan)
+
+def find_runs(mask, min_length=1):
+    """(lap, start, end) index arrays of every run of True along each row, end exclusive"""
+    padded = np.zeros((mask.shape[0], mask.shape[1] + 2), dtype=np.int8)
+    padded[:, 1:-1] = mask
+    change = np.diff(padded, axis=1)
+    lap, start = np.nonzero(change == 1)
+    _, end = np.nonzero(change == -1)
+    keep = end - start >= min_length
+    return lap[keep], start[keep], end[keep]
+
+def reduce_runs(ufunc, values, lap, start, end):
+    """`ufunc` (e.g. np.fmin) of `values` over each run"""
+    if not len(lap):
+        return np.empty(0)
+    n = values.shape[1]
+    bounds = np.column_stack([lap * n + start, lap * n + end]).ravel()
+    flat = np.append(values.ravel(), np.nan)  # reduceat needs a valid index for the last run's end
+    return ufunc.reduceat(flat, bounds)[::2]
+
+def derive_channels(channels, step=STEP):
+    """Smoothed speed and accelerations, plus braking / coasting / full-throttle masks"""
+    speed = smooth(channels["Speed"], step)
+    v = speed / 3.6
+    derived = {
+        "SmoothSpeed": speed,
+        "LongAccel": v * smooth(channels["Speed"], step, deriv=1) / 3.6 / G
+    }
+    if "X" in channels and "Y" in channels:
+        # FastF1 positions are in 1/10 m
+        dx, dy, ddx, ddy = (
+            smooth(channels[axis] / 10, step, deriv, POSITION_WINDOW, POSITION_POLYORDER)
+            for deriv in (1, 2) for axis in ("X", "Y")
+        )
+        with np.errstate(invalid="ignore", divide="ignore"):
+            curvature = (dx * ddy - dy * ddx) / (dx ** 2 + dy ** 2) ** 1.5
+        derived["LatAccel"] = v ** 2 * curvature / G
+
+    valid = np.isfinite(channels["Speed"])
+    throttle = np.nan_to_num(channels["Throttle"], nan=0)
+    braking = np.nan_to_num(channels["Brake"], nan=0) > 0 if "Brake" in channels else derived["LongAccel"] < -1.0
+    derived["Braking"] = braking & valid
+    derived["LiftCoast"] = (throttle < LIFT_THROTTLE) & ~braking & (np.nan_to_num(speed) > COAST_MIN_SPEED) & valid
+    derived["FullThrottle"] = (throttle >= FULL_THROTTLE) & valid
+    return derived
+
+def get_braking_zones(derived, grid, laps):
+    lap, start, end = find_runs(derived["Braking"], MIN_BRAKING_SAMPLES)
+    speed = derived["SmoothSpeed"]
+    return pd.DataFrame({
+        "Driver": laps["Driver"].to_numpy()[lap],
+        "LapNumber": laps["LapNumber"].to_numpy()[lap],
+        "StartDistance": grid[start],
+        "EndDistance": grid[end - 1],
+        "EntrySpeed": speed[lap, start],
+        "MinSpeed": reduce_runs(np.fmin, speed, lap, start, end),
+        "PeakDecel": -reduce_runs(np.fmin, derived["LongAccel"], lap, start, end)
+    })
+
+def get_lift_and_coast(derived, grid, laps, step=STEP):
+    lap, start, end = find_runs(derived["LiftCoast"], MIN_COAST_SAMPLES)
+    return pd.DataFrame({
+        "Driver": laps["Driver"].to_numpy()[lap],
+        "LapNumber": laps["LapNumber"].to_numpy()[lap],
+        "StartDistance": grid[start],
+        "EndDistance": grid[end - 1],
+        "Length": (end - start) * step,
+        "EntrySpeed": derived["SmoothSpeed"][lap, start]
+    })
+
+def get_gear_shifts(channels, grid, laps):
+    gear = channels["nGear"]
+    change = np.diff(gear, axis=1)
+    lap, index = np.nonzero(np.nan_to_num(change) != 0)
+    return pd.DataFrame({
+        "Driver": laps["Driver"].to_numpy()[lap],
+        "LapNumber": laps["LapNumber"].to_numpy()[lap],
+        "Distance": grid[index + 1],
+        "FromGear": gear[lap, index].astype(int),
+        "ToGear": gear[lap, index + 1].astype(int),
+        "Speed": channels["Speed"][lap, index + 1],
+        "RPM": channels["RPM"][lap, index] if "RPM" in channels else np.nan
+    })
+
+def get_lap_features(channels, derived, laps, step=STEP):
+    valid = np.isfinite(channels["Speed"])
+    samples = np.maximum(valid.sum(axis=1), 1)
+    shifts = np.diff(np.nan_to_num(channels["nGear"]), axis=1) * (valid[:, 1:] & valid[:, :-1])
+    features = laps[["Driver", "DriverNumber", "LapNumber"]].copy()
+    features["FullThrottlePct"] = derived["FullThrottle"].sum(axis=1) / samples * 100
+    braking_lap, braking_start, braking_end = find_runs(derived["Braking"], MIN_BRAKING_SAMPLES)
+    coast_lap, coast_start, coast_end = find_runs(derived["LiftCoast"], MIN_COAST_SAMPLES)
+    features["BrakingDistance"] = np.bincount(braking_lap, (braking_end - braking_start) * step, minlength=len(laps))
+    features["BrakingZones"] = np.bincount(braking_lap, minlength=len(laps))
+    features["LiftCoastDistance"] = np.bincount(coast_lap, (coast_end - coast_start) * step, minlength=len(laps))
+    features["MaxDecelG"] = -np.nanmin(derived["LongAccel"], axis=1, initial=0, where=valid)
+    features["MaxAccelG"] = np.nanmax(derived["LongAccel"], axis=1, initial=0, where=valid)
+    if "LatAccel" in derived:
+        features["MaxLatG"] = np.nanmax(np.abs(derived["LatAccel"]), axis=1, initial=0, where=valid)
+    features["MeanSpeed"] = np.nanmean(np.where(valid, derived["SmoothSpeed"], np.nan), axis=1)
+    features["Upshifts"] = (shifts > 0).sum(axis=1)
+    features["Downshifts"] = (shifts < 0).sum(axis=1)
+    return features
+
+def process_session(session_obj, step=STEP):
+    """Stacked channels, derived channels, event tables and per-lap features for a loaded session"""
+    with span("telemetry_stack", session=session_obj.name):
+        laps, grid, channels = stack_session(session_obj, step)
+    with span("telemetry_derive", laps=len(laps), samples=len(grid)):
+        derived = derive_channels(channels, step)
+        return {
+            "laps": laps,
+            "distance": grid,
+            "channels": channels,
+            "derived": derived,
+            "braking_zones": get_braking_zones(derived, grid, laps),
+            "lift_and_coast": get_lift_and_coast(derived, grid, laps, step),
+            "gear_shifts": get_gear_shifts(channels, grid, laps),
+            "features": get_lap_features(channels, derived, laps, step)
+        }
+
+## Cache and lookups
+
+def get_cache_path(year, event, session, step=STEP, cache_dir=CACHE_DIR):
+    name = f"{session.replace(' ', '_')}_v{PROCESSING_VERSION}_{step:g}m.pkl"
+    return os.path.join(cache_dir, str(year), event.replace(" ", "_"), name)
+
+def to_float32(arrays):
+    """Float arrays as float32, which halves a session's cached channels; masks are left as they are"""
+    return {name: values.astype(np.float32) if values.dtype.kind == "f" else values for name, values in arrays.items()}
+
+# A race's stacks run to hundreds of MB, so only the sessions being charted stay in memory
+@lru_cache(maxsize=2)
+def load_session_telemetry(year, event, session, step=STEP, cache_dir=CACHE_DIR):
+    path = get_cache_path(year, event, session, step, cache_dir)
+    if os.path.exists(path):
+        return pd.read_pickle(path)
+
+    from data_engine.vis_data import load_session
+    processed = process_session(load_session(year, event, session), step)
+    processed["channels"] = to_float32(processed["channels"])
+    processed["derived"] = to_float32(processed["derived"])
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Per-process tmp name, render workers may process the same session at once
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    pd.to_pickle(processed, tmp_path)
+    os.replace(tmp_path, path)
+    return processed
+
+def get_session_telemetry(year, event, session, step=STEP, refresh=False):
+    """Processed telemetry of a session, from the disk cache unless `refresh`"""
+    if refresh:
+        load_session_telemetry.cache_clear()
+        path = get_cache_path(year, event, session, step)
+        if os.path.exists(path):
+            os.remove(path)
+    return load_session_telemetry(year, event, session, step)
+
+def get_lap_index(processed, driver, lap_number):
+    laps = processed["laps"]
+    match = np.flatnonzero(((laps["Driver"] == driver) | (laps["DriverNumber"] == str(driver))).to_numpy() & (laps["LapNumber"] == lap_number).to_numpy())
+    if not len(match):
+        raise KeyError(f"No processed telemetry for {driver} lap {lap_number}")
+    return match[0]
+
+def get_processed_lap_channels(processed, driver, lap_number):
+    """One lap's raw and derived channels on the distance grid, as a DataFrame"""
+    row = get_lap_index(processed, driver, lap_number)
+    data = {"Distance": processed["distance"]}
+    data.update({name: values[row] for name, values in processed["channels"].items()})
+    data.update({name: values[row] for name, values in processed["derived"].items()})
+    frame = pd.DataFrame(data)
+    return frame[np.isfinite(frame["Speed"])]
+
+def add_lap_features(cleaned_laps, driver, event, year):
+    """Join per-lap telemetry features onto cleaned laps (from `race_data`) by session and lap number"""
+    frames = []
+    for session in cleaned_laps["session_type"].unique():
+        features = get_session_telemetry(year, event, session)["features"]
+        features = features[features["Driver"] == driver].drop(columns=["Driver", "DriverNumber"])
+        frames.append(features.assign(session_type=session).rename(columns={"LapNumber": "lap_number"}))
+    if not frames:
+        return cleaned_laps
+    return cleaned_laps.merge(pd.concat(frames, ignore_index=True), on=["session_type", "lap_number"], how="left")
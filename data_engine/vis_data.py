@@ -1,4 +1,18 @@
 import numpy as np
+from functools import lru_cache
+
+from utils.instrumentation import span
+from data_engine.decimation import TRACK_MAP_POINTS, simplify_track, get_segments
+from data_engine.circuit_geometry import distance_to_xy
+from data_engine.snapshots import get_session, load_and_snapshot
+
+@lru_cache(maxsize=8)
+def load_session(year, event, session):
+    """Load a session (from its snapshot when there is one) once per process and reuse it for every later chart"""
+    session_obj = get_session(year, event, session)
+    with span("session_load", event=event, session=session, year=year):
+        load_and_snapshot(session_obj)
+    return session_obj
 
 def get_fastest_lap(driver, session_obj):
     laps = session_obj.laps.pick_drivers(driver)
@@ -25,11 +39,78 @@ def get_median_lap(driver, session_obj):
     median_idx = (len(sorted_laps)-1)//2
     return sorted_laps.iloc[median_idx]
 
-def prepare_track_data(lap, metric='Speed'):
-    telemetry = lap.telemetry
-    x, y, colour = telemetry['X'], telemetry['Y'], telemetry[metric]
-    
-    points = np.array([x, y]).T.reshape(-1, 1, 2)
-    segments = np.concatenate([points[:-1], points[1:]], axis=1)
+def get_session_stints(laps):
+    """
+    Every driver's stints in one groupby over the session's laps: compound, first and last lap
+    and lap count, drivers ordered by laps completed and then by when they finished them
+    """
+    stints = (
+        laps[["Driver", "Stint", "Compound", "LapNumber", "Time"]]
+        .dropna(subset=["Stint", "LapNumber"])
+        .groupby(["Driver", "Stint"], sort=False)
+        .agg(Compound=("Compound", "first"), FirstLap=("LapNumber", "min"), LastLap=("LapNumber", "max"),
+             StintLength=("LapNumber", "count"), EndTime=("Time", "max"))
+        .reset_index()
+    )
+    finish = stints.groupby("Driver").agg(Laps=("LastLap", "max"), EndTime=("EndTime", "max"))
+    order = finish.sort_values(["Laps", "EndTime"], ascending=[False, True]).index
+    rank = stints["Driver"].map({driver: i for i, driver in enumerate(order)})
+    return stints.iloc[np.lexsort((stints["Stint"], rank))].reset_index(drop=True)
+
+def prepare_track_data(lap, metric='Speed', max_points=None, geometry=None):
+    """
+    Track X/Y and metric for a lap, decimated to `max_points` (defaults to the track map's point budget).
+    With a circuit `geometry` the car data is placed on the cached track by distance, skipping `lap.telemetry`
+    """
+    if geometry is not None:
+        telemetry = lap.get_car_data().add_distance()
+        distance = telemetry['Distance'] * geometry['length'] / telemetry['Distance'].iloc[-1]
+        x, y = distance_to_xy(geometry, distance)
+        colour = telemetry[metric]
+    else:
+        telemetry = lap.telemetry
+        x, y, colour = telemetry['X'], telemetry['Y'], telemetry[metric]
+
+    if max_points is None:
+        max_points = TRACK_MAP_POINTS
+    tolerance = 0.5 if metric == 'nGear' else None  # keep every gear change
+    x, y, colour = simplify_track(x, y, colour, max_points, metric_tolerance=tolerance)
+
+    segments = get_segments(x, y)
     
-    return x, y, colour, segments
\ No newline at end of file
+    return x, y, colour, segments
+
+def prepare_derived_track_data(channels, metric, max_points=None):
+    """Like `prepare_track_data`, for a lap's processed channels (see `telemetry_processing.get_processed_lap_channels`)"""
+    channels = channels[channels[metric].notna()]
+    if max_points is None:
+        max_points = TRACK_MAP_POINTS
+    x, y, colour = simplify_track(channels['X'], channels['Y'], channels[metric].astype(float), max_points)
+    return x, y, colour, get_segments(x, y)
+
+def prepare_ghost_data(laps, fps=30):
+    """
+    Time-align laps for a replay: positions of every car sampled at `fps` frames per second from the
+    start of the lap, plus each car's gap to the first lap at the same distance. Cars that finish
+    early stay on the line.
+    """
+    lap_data = []
+    for lap in laps:
+        telemetry = lap.telemetry
+        t = telemetry['Time'].dt.total_seconds().to_numpy()
+        lap_data.append((t, telemetry['X'].to_numpy(), telemetry['Y'].to_numpy(), telemetry['Distance'].to_numpy()))
+
+    duration = max(t[-1] for t, _, _, _ in lap_data)
+    frame_times = np.arange(0, duration + 1 / fps, 1 / fps)
+
+    x = np.array([np.interp(frame_times, t, lap_x) for t, lap_x, _, _ in lap_data])
+    y = np.array([np.interp(frame_times, t, lap_y) for t, _, lap_y, _ in lap_data])
+    distance = np.array([np.interp(frame_times, t, lap_d) for t, _, _, lap_d in lap_data])
+
+    # Gap = time now minus when the reference car was at the same distance
+    ref_t, _, _, ref_distance = lap_data[0]
+    ref_times = np.interp(distance, ref_distance, ref_t)
+    finish = np.array([t[-1] for t, _, _, _ in lap_data])[:, None]
+    delta = np.minimum(frame_times, finish) - ref_times
+
+    return {"times": frame_times, "x": x, "y": y, "distance": distance, "delta": delta}
@@ -0,0 +1,397 @@
+"""
+Async Database Layer
+====================
+
+asyncio counterpart of F1Database. All requests share one pooled HTTP client and go through a
+RequestScheduler that:
+    - bounds the number of requests in flight
+    - spaces requests to a maximum rate, pausing everything when the server asks us to back off
+    - retries transient failures with exponential backoff and full jitter, honouring Retry-After
+    - merges identical concurrent reads into a single request
+
+postgrest's APIError keeps neither the status code nor the headers of a failed response, so a
+response hook records each request's response for the scheduler to classify, and postgrest's own
+retry of 503/520 reads is turned off so the scheduler is the only retry layer.
+
+Unlike F1Database, failures raise DatabaseError instead of returning {"data": None}.
+
+"""
+
+import os
+import copy
+import random
+import asyncio
+from contextvars import ContextVar
+from typing import AsyncIterator
+
+import httpx
+from dotenv import load_dotenv
+from postgrest.exceptions import APIError
+from supabase import acreate_client, AsyncClient
+from supabase.lib.client_options import AsyncClientOptions
+
+from db_utils.supa_db import DriverData, SessionData, StintData, LapData, WeatherData, get_db_event_hooks
+from db_utils.database_service import MAX_ROWS, is_last_page
+from utils.instrumentation import incr, get_logger
+
+logger = get_logger(__name__)
+
+PAGE_SIZE = 1000
+RETRY_STATUS = {408, 425, 429, 500, 502, 503, 504, 520}
+
+# Response of the request most recently sent by this task, set by `remember_response`
+_last_response: ContextVar = ContextVar("last_db_response", default=None)
+
+class DatabaseError(Exception):
+    pass
+
+async def remember_response(response):
+    """Response hook; httpx runs it in the task awaiting the request, so `_execute` can read it back"""
+    _last_response.set(response)
+
+def get_status(error: Exception):
+    """HTTP status behind an error, from the remembered response when postgrest raised it"""
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code
+    if isinstance(error, APIError):
+        response = getattr(error, "response", None)
+        if response is not None:
+            return response.status_code
+        return int(error.code) if str(error.code).isdigit() else None
+    return None
+
+def is_transient(error: Exception) -> bool:
+    if isinstance(error, (httpx.TransportError, httpx.TimeoutException)):
+        return True
+    return get_status(error) in RETRY_STATUS
+
+def get_retry_after(error: Exception) -> float:
+    """Seconds the server asked us to wait, 0 if it did not say"""
+    response = getattr(error, "response", None)
+    if response is None:
+        return 0.0
+    try:
+        return float(response.headers.get("Retry-After", 0))
+    except ValueError:
+        return 0.0
+
+class RequestScheduler:
+    def __init__(self, max_in_flight: int = 16, rate_limit: float = 50.0, max_retries: int = 5,
+                 base_delay: float = 0.25, max_delay: float = 8.0):
+        self.max_in_flight = max_in_flight
+        self.rate_limit = rate_limit
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+        self._semaphore = asyncio.Semaphore(max_in_flight)
+        self._rate_lock = asyncio.Lock()
+        self._next_slot = 0.0
+        self._paused_until = 0.0
+        self._pending_reads: dict = {}
+
+    async def _wait_for_slot(self):
+        """Token spacing: at most `rate_limit` request starts per second, none while paused"""
+        loop = asyncio.get_running_loop()
+        async with self._rate_lock:
+            now = loop.time()
+            start = max(now, self._next_slot, self._paused_until)
+            self._next_slot = start + 1 / self.rate_limit
+        if start > now:
+            await asyncio.sleep(start - now)
+
+    async def _run_with_retries(self, make_request):
+        loop = asyncio.get_running_loop()
+        for attempt in range(self.max_retries + 1):
+            await self._wait_for_slot()
+            try:
+                async with self._semaphore:
+                    return await make_request()
+            except Exception as e:
+                if not is_transient(e) or attempt == self.max_retries:
+                    raise DatabaseError(str(e)) from e
+                retry_after = get_retry_after(e)
+                if retry_after:
+                    self._paused_until = max(self._paused_until, loop.time() + retry_after)
+                delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+                incr("db.retries")
+                logger.warning(f"Transient database error, retrying in {max(delay, retry_after):.2f}s: {e}")
+                await asyncio.sleep(max(delay, retry_after))
+
+    async def run(self, make_request, read_key=None):
+        """
+        Run `make_request` (a zero-argument coroutine function) under the scheduler.
+        Concurrent calls with the same `read_key` share one request, each getting its own copy of the result.
+        """
+        if read_key is None:
+            return await self._run_with_retries(make_request)
+
+        def on_done(task):
+            self._pending_reads.pop(read_key, None)
+            # Retrieve the error so it is not logged as never retrieved when every waiter was cancelled
+            if not task.cancelled():
+                task.exception()
+
+        pending = self._pending_reads.get(read_key)
+        if pending is None:
+            pending = asyncio.ensure_future(self._run_with_retries(make_request))
+            self._pending_reads[read_key] = pending
+            pending.add_done_callback(on_done)
+        else:
+            incr("db.merged_reads")
+        return copy.deepcopy(await asyncio.shield(pending))
+
+class AsyncF1Database:
+    def __init__(self, client: AsyncClient, http_client: httpx.AsyncClient, scheduler: RequestScheduler):
+        self.client = client
+        self.http_client = http_client
+        self.scheduler = scheduler
+
+    @classmethod
+    async def create(cls, max_in_flight: int = 16, rate_limit: float = 50.0, url: str = None, key: str = None) -> "AsyncF1Database":
+        load_dotenv()
+        url = url or os.environ.get("SUPABASE_URL")
+        key = key or os.environ.get("SUPABASE_KEY")
+
+        limits = httpx.Limits(max_connections=max_in_flight, max_keepalive_connections=max_in_flight)
+        event_hooks = get_db_event_hooks(is_async=True)
+        event_hooks["response"].append(remember_response)
+        http_client = httpx.AsyncClient(limits=limits, timeout=30.0, event_hooks=event_hooks)
+        client = await acreate_client(url, key, options=AsyncClientOptions(httpx_client=http_client))
+        return cls(client, http_client, RequestScheduler(max_in_flight, rate_limit))
+
+    async def close(self):
+        await self.http_client.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def _execute(self, build_query, read_key=None) -> list:
+        async def make_request():
+            _last_response.set(None)
+            try:
+                response = await build_query().retry(False).execute()
+            except APIError as e:
+                e.response = _last_response.get()
+                raise
+            return response.data or []
+        return await self.scheduler.run(make_request, read_key)
+
+    async def paginate(self, build_query, read_key, page_size: int = PAGE_SIZE, key: str = "id", max_rows: int = MAX_ROWS) -> AsyncIterator[dict]:
+        """Keyset pagination with the next page requested while the current one is consumed, stopping at a short page"""
+        def fetch_page(after):
+            def build_page():
+                query = build_query()
+                if after is not None:
+                    query = query.gt(key, after)
+                return query.order(key).limit(page_size)
+            return asyncio.ensure_future(self._execute(build_page, read_key + (page_size, after)))
+
+        next_page = fetch_page(None)
+        while next_page is not None:
+            rows = await next_page
+            if is_last_page(rows, page_size, max_rows):
+                next_page = None
+            else:
+                next_page = fetch_page(rows[-1][key])
+            for row in rows:
+                yield row
+
+    # Existence checks and stores
+
+    async def driver_exists(self, driver_data: DriverData) -> dict:
+        data = await self._execute(
+            lambda: (
+                self.client.table("drivers").select("id, driver_name, driver_number, team")
+                .eq("driver_name", driver_data['driver_name'])
+                .eq("driver_number", driver_data['driver_number'])
+                .eq("team", driver_data['team'])
+            ),
+            read_key=("drivers", driver_data['driver_name'], driver_data['driver_number'], driver_data['team'])
+        )
+        return {"exists": bool(data), "data": data or None}
+
+    async def session_exists(self, session_data: SessionData) -> dict:
+        data = await self._execute(
+            lambda: (
+                self.client.table("sessions").select("id, event, session_type")
+                .eq("event", session_data["event"])
+                .eq("session_type", session_data["session_type"])
+                .eq("year", session_data["year"])
+            ),
+            read_key=("sessions", session_data["event"], session_data["session_type"], session_data["year"])
+        )
+        return {"exists": bool(data), "data": data or None}
+
+    async def weather_exists(self, weather_data: WeatherData) -> dict:
+        data = await self._execute(
+            lambda: self.client.table("weather_table").select("id, time").eq("time", weather_data['time']),
+            read_key=("weather_time", weather_data['time'])
+        )
+        return {"exists": bool(data), "data": data or None}
+
+    async def _insert(self, table: str, rows) -> list:
+        data = await self._execute(lambda: self.client.table(table).insert(rows))
+        if not data:
+            raise DatabaseError(f"Insert into {table} returned no rows")
+        return data
+
+    async def store_driver(self, driver_data: DriverData) -> dict:
+        existing_driver = await self.driver_exists(driver_data)
+        if existing_driver["exists"]:
+            return existing_driver
+        return {"exists": False, "data": await self._insert("drivers", driver_data)}
+
+    async def store_session(self, session_data: SessionData) -> dict:
+        processed_data = session_data.copy()
+        if isinstance(processed_data["weather_type"], str):
+            processed_data["weather_type"] = processed_data["weather_type"].lower() == "wet"
+
+        existing_session = await self.session_exists(processed_data)
+        if existing_session["exists"]:
+            return existing_session
+        return {"exists": False, "data": await self._insert("sessions", processed_data)}
+
+    async def store_stint(self, stint_data: StintData) -> dict:
+        return {"exists": False, "data": await self._insert("stints", stint_data)}
+
+    async def store_lap(self, lap_data: LapData) -> dict:
+        return {"exists": False, "data": await self._insert("lap", lap_data)}
+
+    async def store_laps(self, laps: list, batch_size: int = 500) -> list:
+        """Bulk insert laps, with the batches sent concurrently"""
+        batches = [laps[i:i + batch_size] for i in range(0, len(laps), batch_size)]
+        results = await asyncio.gather(*(self._insert("lap", batch) for batch in batches))
+        return [row for batch in results for row in batch]
+
+    async def store_lap_telemetries(self, rows: list, batch_size: int = 100) -> list:
+        """Bulk upsert encoded lap telemetry, with the batches sent concurrently"""
+        async def upsert(batch):
+            await self._execute(lambda: self.client.table("lap_telemetry").upsert(batch, on_conflict="lap_id", returning="minimal"))
+            return [{"lap_id": row["lap_id"]} for row in batch]
+
+        batches = [rows[i:i + batch_size] for i in range(0, len(rows), batch_size)]
+        results = await asyncio.gather(*(upsert(batch) for batch in batches))
+        return [row for batch in results for row in batch]
+
+    async def store_weather(self, weather_data: WeatherData) -> dict:
+        existing_weather = await self.weather_exists(weather_data)
+        if existing_weather["exists"]:
+            return existing_weather
+        return {"exists": False, "data": await self._insert("weather_table", weather_data)}
+
+    # Reads
+
+    async def get_driver_id(self, driver_data: DriverData) -> int:
+        existing_driver = await self.driver_exists(driver_data)
+        return existing_driver["data"][0]["id"] if existing_driver["exists"] else None
+
+    async def get_all_drivers(self, page_size: int = PAGE_SIZE) -> list:
+        return [driver async for driver in self.paginate(lambda: self.client.table("drivers").select("*"), ("all_drivers",), page_size)]
+
+    async def get_session_stints(self, driver_id: int, session_id: int, page_size: int = PAGE_SIZE) -> list:
+        return [
+            stint async for stint in self.paginate(
+                lambda: (
+                    self.client.table("stints")
+                    .select("id, stint_number, tyre_compound, initial_tyre_age, num_laps")
+                    .eq("driver_id", driver_id)
+                    .eq("session_id", session_id)
+                ),
+                ("stints", driver_id, session_id), page_size, key="stint_number"
+            )
+        ]
+
+    async def get_driver_stints(self, driver_data: DriverData, event: str, year: int) -> list:
+        """All stints for a driver across a race weekend, with sessions queried concurrently"""
+        driver_id = await self.get_driver_id(driver_data)
+        if not driver_id:
+            return []
+        sessions = await self._execute(
+            lambda: self.client.table("sessions").select("id, session_type, weather_type, date").eq("event", event).eq("year", year),
+            read_key=("event_sessions", event, year)
+        )
+        session_stints = await asyncio.gather(*(self.get_session_stints(driver_id, session["id"]) for session in sessions))
+
+        all_stints = []
+        for session, stints in zip(sessions, session_stints):
+            for stint in stints:
+                stint["session_type"] = session["session_type"]
+                stint["session_id"] = session["id"]
+                stint["session_date"] = session["date"]
+                all_stints.append(stint)
+        return all_stints
+
+    async def get_driver_stints_by_session(self, driver_data: DriverData, event: str, year: int, session_type: str) -> list:
+        driver_id, sessions = await asyncio.gather(
+            self.get_driver_id(driver_data),
+            self._execute(
+                lambda: (
+                    self.client.table("sessions").select("id, weather_type, date")
+                    .eq("event", event).eq("year", year).eq("session_type", session_type)
+                ),
+                read_key=("session", event, year, session_type)
+            )
+        )
+        if not driver_id or not sessions:
+            return []
+
+        session = sessions[0]
+        stints = await self.get_session_stints(driver_id, session["id"])
+        for stint in stints:
+            stint["session_type"] = session_type
+            stint["session_id"] = session["id"]
+            stint["session_weather"] = session["weather_type"]
+        return stints
+
+    async def get_stint_laps(self, stint_id: int, page_size: int = PAGE_SIZE) -> list:
+        return [
+            lap async for lap in self.paginate(
+                lambda: (
+                    self.client.table("lap")
+                    .select("id, lap_number, lap_time, tyre_age, sector1_time, sector2_time, sector3_time, weather")
+                    .eq("stint_id", stint_id)
+                ),
+                ("stint_laps", stint_id), page_size, key="lap_number"
+            )
+        ]
+
+    async def get_many_stint_laps(self, stint_ids: list) -> dict:
+        """Laps for many stints at once, keyed by stint id"""
+        results = await asyncio.gather(*(self.get_stint_laps(stint_id) for stint_id in stint_ids))
+        return dict(zip(stint_ids, results))
+
+    async def get_lap_weather(self, weather_id: int) -> dict:
+        if not weather_id:
+            return None
+        data = await self._execute(
+            lambda: (
+                self.client.table("weather_table")
+                .select("id, time, air_temp, track_temp, pressure, rainfall, humidity, wind_direction, wind_speed")
+                .eq("id", weather_id)
+            ),
+            read_key=("weather", weather_id)
+        )
+        return data[0] if data else None
+
+    async def get_many_lap_weather(self, weather_ids: list) -> dict:
+        """Weather rows keyed by id; repeated ids are only requested once"""
+        unique_ids = [weather_id for weather_id in set(weather_ids) if weather_id]
+        results = await asyncio.gather(*(self.get_lap_weather(weather_id) for weather_id in unique_ids))
+        return dict(zip(unique_ids, results))
+
+
+if __name__ == "__main__":
+    from db_utils.supa_db import create_driver_data
+
+    async def main():
+        async with await AsyncF1Database.create() as adb:
+            driver = create_driver_data("HAM", 44, "Ferrari")
+            stints = await adb.get_driver_stints(driver, "Australia", 2025)
+            laps = await adb.get_many_stint_laps([stint["id"] for stint in stints])
+            print(f"Retrieved {sum(len(stint_laps) for stint_laps in laps.values())} laps over {len(stints)} stints")
+
+    asyncio.run(main())
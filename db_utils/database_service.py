@@ -1,4 +1,55 @@
-from db_utils.supa_db import f1_db, DriverData, SessionData, StintData, LapData, WeatherData
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator
+
+from db_utils.supa_db import get_client, DriverData, SessionData, StintData, LapData, LapTelemetryData, WeatherData
+from db_utils.telemetry_codec import decode_telemetry, from_bytea
+from utils.instrumentation import get_logger
+
+logger = get_logger(__name__)
+
+PAGE_SIZE = 1000
+# Most rows the server returns for one request (PostgREST max-rows, 1000 on Supabase by default)
+MAX_ROWS = int(os.environ.get("F1_DB_MAX_ROWS", 1000))
+LAP_BATCH_SIZE = 500
+# Telemetry rows are ~10 KB each, so they move in smaller pages than the lap-level tables
+TELEMETRY_BATCH_SIZE = 100
+
+def is_last_page(rows, page_size: int, max_rows: int = MAX_ROWS) -> bool:
+    """A page shorter than both the page size and the server's row limit can't have more after it"""
+    return len(rows) < min(page_size, max_rows)
+
+def paginate(build_query, page_size: int = PAGE_SIZE, key: str = None, max_rows: int = MAX_ROWS) -> Iterator[dict]:
+    """
+    Yield every row of a query, one page at a time.
+
+    With `key` (a column unique within the query) pages are read by keyset (`key > last seen`),
+    otherwise by row range. The next page is fetched in the background while the current page is
+    consumed. Reading stops at a page shorter than `page_size` and the server's `max_rows`, so a
+    result that fits in one page costs one round trip and a server limit below `page_size` still
+    cannot truncate it.
+    """
+    def fetch_page(after, offset):
+        query = build_query()
+        if key is None:
+            return query.range(offset, offset + page_size - 1).execute().data or []
+        if after is not None:
+            query = query.gt(key, after)
+        return query.order(key).limit(page_size).execute().data or []
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        offset = 0
+        future = executor.submit(fetch_page, None, offset)
+        while future is not None:
+            rows = future.result()
+            offset += len(rows)
+            if is_last_page(rows, page_size, max_rows):
+                future = None
+            else:
+                after = rows[-1][key] if key is not None else None
+                future = executor.submit(fetch_page, after, offset)
+            yield from rows
+
 
 class F1Database:
     @staticmethod
@@ -6,7 +57,7 @@ class F1Database:
         """Check if driver exists in database, return with consistent format"""
         try:
             response = ( 
-                f1_db.table("drivers").select("id, driver_name, driver_number, team")
+                get_client().table("drivers").select("id, driver_name, driver_number, team")
                 .eq("driver_name", driver_data['driver_name'])
                 .eq("driver_number", driver_data['driver_number'])
                 .eq("team", driver_data['team'])
@@ -17,7 +68,7 @@ class F1Database:
             else:
                 return {"exists": False, "data": None}
         except Exception as e:
-            print(f"Error checking if driver {driver_data['driver_name']} exists : {e}")
+            logger.error(f"Error checking if driver {driver_data['driver_name']} exists : {e}")
             return {"exists": False, "data": None}
     
     @staticmethod
@@ -25,7 +76,7 @@ class F1Database:
         """Check if session exists, return with consistent format"""
         try:
             response = (
-                f1_db.table("sessions")
+                get_client().table("sessions")
                 .select("id, event, session_type")
                 .eq("event", session_data["event"])
                 .eq("session_type", session_data["session_type"])
@@ -37,7 +88,7 @@ class F1Database:
             else:
                 return {"exists": False, "data": None}
         except Exception as e:
-            print(f"Error checking if session exists: {e}")
+            logger.error(f"Error checking if session exists: {e}")
             return {"exists": False, "data": None}
     
     @staticmethod
@@ -45,7 +96,7 @@ class F1Database:
         """Check if weather snippet exists, return ID if found"""
         try:
             response = (
-                f1_db.table("weather_table").select("id, time")
+                get_client().table("weather_table").select("id, time")
                 .eq("time", weather_data['time'])
                 .execute()
             )
@@ -54,7 +105,7 @@ class F1Database:
             else:
                 return {"exists": False, "data": None}
         except Exception as e:
-            print(f"Error checking if weather at {weather_data['time']} exists: {e}")
+            logger.error(f"Error checking if weather at {weather_data['time']} exists: {e}")
             return {"exists": False, "data": None}
 
     @staticmethod
@@ -63,15 +114,15 @@ class F1Database:
         existing_driver = F1Database.driver_exists(driver_data)
         
         if existing_driver["exists"]:
-            print(f"Driver {driver_data['driver_name']} already exists, returning existing ID")
+            logger.debug(f"Driver {driver_data['driver_name']} already exists, returning existing ID")
             return existing_driver  # Returns {"exists": True, "data": [...]}
         
         try:
-            response = f1_db.table("drivers").insert(driver_data).execute()
-            print(f"Successfully added driver: {driver_data['driver_name']}")
+            response = get_client().table("drivers").insert(driver_data).execute()
+            logger.debug(f"Successfully added driver: {driver_data['driver_name']}")
             return {"exists": False, "data": response.data}
         except Exception as e:
-            print(f"Error adding driver {driver_data['driver_name']}: {e}")
+            logger.error(f"Error adding driver {driver_data['driver_name']}: {e}")
             return {"exists": False, "data": None}
     
     @staticmethod
@@ -85,53 +136,95 @@ class F1Database:
         existing_session = F1Database.session_exists(processed_data)
         
         if existing_session["exists"]:
-            print(f"Session {session_data['event']} {session_data['session_type']} already exists")
+            logger.debug(f"Session {session_data['event']} {session_data['session_type']} already exists")
             return existing_session  # Returns {"exists": True, "data": [...]}
         
         try:
-            response = f1_db.table("sessions").insert(processed_data).execute()
-            print(f"Successfully added session: {session_data['event']} {session_data['session_type']}")
+            response = get_client().table("sessions").insert(processed_data).execute()
+            logger.debug(f"Successfully added session: {session_data['event']} {session_data['session_type']}")
             return {"exists": False, "data": response.data}
         except Exception as e:
-            print(f"Error adding session {session_data['event']}: {e}")
+            logger.error(f"Error adding session {session_data['event']}: {e}")
             return {"exists": False, "data": None}
     
     @staticmethod
     def store_stint(stint_data: StintData) -> dict:
         """Store stint data in database"""
         try:
-            response = f1_db.table("stints").insert(stint_data).execute()
-            print(f"Successfully added stint: {stint_data['stint_number']}")
+            response = get_client().table("stints").insert(stint_data).execute()
+            logger.debug(f"Successfully added stint: {stint_data['stint_number']}")
             return {"exists": False, "data": response.data}
         except Exception as e:
-            print(f"Error adding stint: {e}")
+            logger.error(f"Error adding stint: {e}")
             return {"exists": False, "data": None}
     
     @staticmethod
     def store_lap(lap_data: LapData) -> dict:
         """Store lap data in database"""
         try:
-            response = f1_db.table("lap").insert(lap_data).execute()
+            response = get_client().table("lap").insert(lap_data).execute()
             return {"exists": False, "data": response.data}
         except Exception as e:
-            print(f"Error storing lap data: {e}")
+            logger.error(f"Error storing lap data: {e}")
             return {"exists": False, "data": None}
-    
+
+    @staticmethod
+    def store_laps(laps: list, batch_size: int = LAP_BATCH_SIZE) -> dict:
+        """Bulk insert laps, `batch_size` per request"""
+        stored = []
+        try:
+            for i in range(0, len(laps), batch_size):
+                stored += get_client().table("lap").insert(laps[i:i + batch_size]).execute().data
+            return {"exists": False, "data": stored}
+        except Exception as e:
+            logger.error(f"Error storing laps ({len(stored)} of {len(laps)} stored): {e}")
+            return {"exists": False, "data": None}
+
+    @staticmethod
+    def store_stints(stints: list) -> dict:
+        """Bulk insert stints, rows returned in the order given"""
+        try:
+            response = get_client().table("stints").insert(stints).execute()
+            return {"exists": False, "data": response.data}
+        except Exception as e:
+            logger.error(f"Error adding {len(stints)} stints: {e}")
+            return {"exists": False, "data": None}
+
+    @staticmethod
+    def update_stints(stints: list) -> dict:
+        """Update stored stints in one request, e.g. their lap counts as laps stream in; rows are full stints with their id"""
+        try:
+            get_client().table("stints").upsert(stints, on_conflict="id", returning="minimal").execute()
+            return {"exists": True, "data": [{"id": stint["id"]} for stint in stints]}
+        except Exception as e:
+            logger.error(f"Error updating {len(stints)} stints: {e}")
+            return {"exists": False, "data": None}
+
+    @staticmethod
+    def update_session(session_id: int, values: dict) -> dict:
+        """Update columns of a stored session"""
+        try:
+            response = get_client().table("sessions").update(values).eq("id", session_id).execute()
+            return {"exists": True, "data": response.data}
+        except Exception as e:
+            logger.error(f"Error updating session {session_id}: {e}")
+            return {"exists": False, "data": None}
+
     @staticmethod
     def store_weather(weather_data: WeatherData) -> dict:
         """Store weather data in database or return existing ID"""
         existing_weather = F1Database.weather_exists(weather_data)
         
         if existing_weather["exists"]:
-            print(f"Weather data at {weather_data['time']} already exists, returning existing ID")
+            logger.debug(f"Weather data at {weather_data['time']} already exists, returning existing ID")
             return existing_weather  # Returns {"exists": True, "data": [...]}
         
         try:
-            response = f1_db.table("weather_table").insert(weather_data).execute()
-            print(f"Successfully added weather data at {weather_data['time']}")
+            response = get_client().table("weather_table").insert(weather_data).execute()
+            logger.debug(f"Successfully added weather data at {weather_data['time']}")
             return {"exists": False, "data": response.data}  # Consistent format
         except Exception as e:
-            print(f"Error storing weather data: {e}")
+            logger.error(f"Error storing weather data: {e}")
             return {"exists": False, "data": None}
     
     @staticmethod
@@ -139,7 +232,7 @@ class F1Database:
         """Get driver ID from database, return None if not found"""
         try:
             response = (
-                f1_db.table("drivers").select("id")
+                get_client().table("drivers").select("id")
                 .eq("driver_name", driver_data['driver_name'])
                 .eq("driver_number", driver_data['driver_number'])
                 .eq("team", driver_data['team'])
@@ -148,141 +241,146 @@ class F1Database:
             if len(response.data) > 0:
                 return response.data[0]["id"]
             else:
-                print(f"Driver {driver_data['driver_name']} not found")
+                logger.warning(f"Driver {driver_data['driver_name']} not found")
                 return None
         except Exception as e:
-            print(f"Error getting driver ID for {driver_data['driver_name']}: {e}")
+            logger.error(f"Error getting driver ID for {driver_data['driver_name']}: {e}")
             return None
     @staticmethod
-    def get_all_drivers() -> list:
+    def iter_all_drivers(page_size: int = PAGE_SIZE) -> Iterator[dict]:
+        return paginate(lambda: get_client().table("drivers").select("*"), page_size, key="id")
+
+    @staticmethod
+    def get_all_drivers(page_size: int = PAGE_SIZE) -> list:
         """Retrieve all drivers from the database"""
         try:
-            response = (
-                f1_db.table("drivers")
-                .select("*")
-                .execute()
-            )
+            drivers = list(F1Database.iter_all_drivers(page_size))
 
-            if not response.data:
-                print(f"No drivers found")
+            if not drivers:
+                logger.warning(f"No drivers found")
                 return None
-            return response.data
+            return drivers
         except Exception as e:
-            print(f"Error in extracting all drivers: {e}")
+            logger.error(f"Error in extracting all drivers: {e}")
             return None
-    
+
     @staticmethod
-    def get_driver_stints(driver_data: DriverData, event: str, year: int) -> list:
-        """Get all stints for a driver across a race weekend"""
-        try:
-            driver_id = F1Database.get_driver_id(driver_data)
-            if not driver_id:
-                print(f"Driver {driver_data['driver_name']} not found")
-                return []
-            
-            # Get all sessions for this event and year
-            print(f"Comparison event: {event} and year: {year}")
-            sessions_response = (
-                f1_db.table("sessions")
+    def iter_session_stints(driver_id: int, session_id: int, page_size: int = PAGE_SIZE) -> Iterator[dict]:
+        """Stream a driver's stints in one session, ordered by stint number"""
+        return paginate(
+            lambda: (
+                get_client().table("stints")
+                .select("id, stint_number, tyre_compound, initial_tyre_age, num_laps")
+                .eq("driver_id", driver_id)
+                .eq("session_id", session_id)
+            ),
+            page_size, key="stint_number"
+        )
+
+    @staticmethod
+    def iter_driver_stints(driver_data: DriverData, event: str, year: int, page_size: int = PAGE_SIZE) -> Iterator[dict]:
+        """Stream all stints for a driver across a race weekend"""
+        driver_id = F1Database.get_driver_id(driver_data)
+        if not driver_id:
+            logger.warning(f"Driver {driver_data['driver_name']} not found")
+            return
+
+        # Get all sessions for this event and year
+        logger.debug(f"Comparison event: {event} and year: {year}")
+        sessions = paginate(
+            lambda: (
+                get_client().table("sessions")
                 .select("id, session_type, weather_type, date")
                 .eq("event", event)
                 .eq("year", year)  # Direct year comparison
-                .execute()
-            )
-            
-            if not sessions_response.data:
-                print(f"No sessions found for event: {event} in {year}")
-                return []
-            
-            all_stints = []
-            for session in sessions_response.data:
-                # Get stints for this driver in this session
-                stints_response = (
-                    f1_db.table("stints")
-                    .select("id, stint_number, tyre_compound, initial_tyre_age, num_laps")
-                    .eq("driver_id", driver_id)
-                    .eq("session_id", session["id"])
-                    .order("stint_number")
-                    .execute()
-                )
-                
-                for stint in stints_response.data:
-                    stint["session_type"] = session["session_type"]
-                    stint["session_id"] = session["id"]
-                    stint["session_date"] = session["date"]
-                    all_stints.append(stint)
-            
-            print(f"Found {len(all_stints)} stints for {driver_data['driver_name']} at {event} {year}")
+            ),
+            page_size, key="id"
+        )
+
+        found = False
+        for session in sessions:
+            found = True
+            for stint in F1Database.iter_session_stints(driver_id, session["id"], page_size):
+                stint["session_type"] = session["session_type"]
+                stint["session_id"] = session["id"]
+                stint["session_date"] = session["date"]
+                yield stint
+        if not found:
+            logger.warning(f"No sessions found for event: {event} in {year}")
+
+    @staticmethod
+    def get_driver_stints(driver_data: DriverData, event: str, year: int, page_size: int = PAGE_SIZE) -> list:
+        """Get all stints for a driver across a race weekend"""
+        try:
+            all_stints = list(F1Database.iter_driver_stints(driver_data, event, year, page_size))
+            logger.info(f"Found {len(all_stints)} stints for {driver_data['driver_name']} at {event} {year}")
             return all_stints
         except Exception as e:
-            print(f"Error getting driver stints: {e}")
+            logger.error(f"Error getting driver stints: {e}")
             return []
-    
+
     @staticmethod
-    def get_driver_stints_by_session(driver_data: DriverData, event: str, year: int, session_type: str) -> list:
+    def iter_driver_stints_by_session(driver_data: DriverData, event: str, year: int, session_type: str, page_size: int = PAGE_SIZE) -> Iterator[dict]:
+        """Stream all stints for a driver in a specific session"""
+        driver_id = F1Database.get_driver_id(driver_data)
+        if not driver_id:
+            logger.warning(f"Driver {driver_data['driver_name']} not found")
+            return
+
+        # Get specific session
+        session_response = (
+            get_client().table("sessions")
+            .select("id, weather_type, date")
+            .eq("event", event)
+            .eq("year", year)
+            .eq("session_type", session_type)
+            .execute()
+        )
+
+        if not session_response.data:
+            logger.warning(f"No session found for {event} {year} {session_type}")
+            return
+
+        session = session_response.data[0]
+
+        for stint in F1Database.iter_session_stints(driver_id, session["id"], page_size):
+            stint["session_type"] = session_type
+            stint["session_id"] = session["id"]
+            stint["session_weather"] = session["weather_type"]
+            yield stint
+
+    @staticmethod
+    def get_driver_stints_by_session(driver_data: DriverData, event: str, year: int, session_type: str, page_size: int = PAGE_SIZE) -> list:
         """Get all stints for a driver in a specific session"""
         try:
-            driver_id = F1Database.get_driver_id(driver_data)
-            if not driver_id:
-                print(f"Driver {driver_data['driver_name']} not found")
-                return []
-            
-            # Get specific session
-            session_response = (
-                f1_db.table("sessions")
-                .select("id, weather_type, date")
-                .eq("event", event)
-                .eq("year", year)
-                .eq("session_type", session_type)
-                .execute()
-            )
-            
-            if not session_response.data:
-                print(f"No session found for {event} {year} {session_type}")
-                return []
-            
-            session = session_response.data[0]
-            
-            # Get stints for this driver in this session
-            stints_response = (
-                f1_db.table("stints")
-                .select("id, stint_number, tyre_compound, initial_tyre_age, num_laps")
-                .eq("driver_id", driver_id)
-                .eq("session_id", session["id"])
-                .order("stint_number")
-                .execute()
-            )
-            
-            stints = []
-            for stint in stints_response.data:
-                stint["session_type"] = session_type
-                stint["session_id"] = session["id"]
-                stint["session_weather"] = session["weather_type"]
-                stints.append(stint)
-            
-            print(f"Found {len(stints)} stints for {driver_data['driver_name']} in {event} {year} {session_type}")
+            stints = list(F1Database.iter_driver_stints_by_session(driver_data, event, year, session_type, page_size))
+            logger.info(f"Found {len(stints)} stints for {driver_data['driver_name']} in {event} {year} {session_type}")
             return stints
         except Exception as e:
-            print(f"Error getting driver stints by session: {e}")
+            logger.error(f"Error getting driver stints by session: {e}")
             return []
-    
+
     @staticmethod
-    def get_stint_laps(stint_id: int) -> list:
-        """Get all laps for a specific stint with tire degradation data"""
-        try:
-            response = (
-                f1_db.table("lap")
+    def iter_stint_laps(stint_id: int, page_size: int = PAGE_SIZE) -> Iterator[dict]:
+        """Stream the laps of a stint in lap order"""
+        return paginate(
+            lambda: (
+                get_client().table("lap")
                 .select("id, lap_number, lap_time, tyre_age, sector1_time, sector2_time, sector3_time, weather")
                 .eq("stint_id", stint_id)
-                .order("lap_number")
-                .execute()
-            )
-            
-            laps = response.data if response.data else []
-            print(f"Retrieved {len(laps)} laps for stint {stint_id}")
+            ),
+            page_size, key="lap_number"
+        )
+
+    @staticmethod
+    def get_stint_laps(stint_id: int, page_size: int = PAGE_SIZE) -> list:
+        """Get all laps for a specific stint with tire degradation data"""
+        try:
+            laps = list(F1Database.iter_stint_laps(stint_id, page_size))
+            logger.debug(f"Retrieved {len(laps)} laps for stint {stint_id}")
             return laps
         except Exception as e:
-            print(f"Error getting stint laps for stint {stint_id}: {e}")
+            logger.error(f"Error getting stint laps for stint {stint_id}: {e}")
             return []
     
     @staticmethod
@@ -292,14 +390,128 @@ class F1Database:
             return None
         try:
             response = (
-                f1_db.table("weather_table")
+                get_client().table("weather_table")
                 .select("id, time, air_temp, track_temp, pressure, rainfall, humidity, wind_direction, wind_speed")
                 .eq("id", weather_id)
                 .execute()
             )
             return response.data[0] if response.data else None
         except Exception as e:
-            print(f"Error getting weather data for weather_id {weather_id}: {e}")
+            logger.error(f"Error getting weather data for weather_id {weather_id}: {e}")
             return None
 
 
+
+    @staticmethod
+    def iter_stint_summaries(driver_data: DriverData, event: str, year: int, session_type: str = None, page_size: int = PAGE_SIZE) -> Iterator[dict]:
+        """Stream per-stint aggregates from the stint_summary view"""
+        driver_id = F1Database.get_driver_id(driver_data)
+        if not driver_id:
+            logger.warning(f"Driver {driver_data['driver_name']} not found")
+            return iter(())
+
+        def build_query():
+            query = (
+                get_client().table("stint_summary")
+                .select("*")
+                .eq("driver_id", driver_id)
+                .eq("event", event)
+                .eq("year", year)
+            )
+            return query.eq("session_type", session_type) if session_type else query
+
+        return paginate(build_query, page_size, key="stint_id")
+
+    @staticmethod
+    def get_stint_summaries(driver_data: DriverData, event: str, year: int, session_type: str = None, page_size: int = PAGE_SIZE) -> list:
+        """Per-stint aggregates (lap count, median/min lap, degradation rate, temps, sector medians) from the stint_summary view"""
+        try:
+            return list(F1Database.iter_stint_summaries(driver_data, event, year, session_type, page_size))
+        except Exception as e:
+            logger.error(f"Error getting stint summaries for {driver_data['driver_name']}: {e}")
+            return []
+
+    @staticmethod
+    def iter_session_summaries(event: str, year: int, page_size: int = PAGE_SIZE) -> Iterator[dict]:
+        return paginate(
+            lambda: get_client().table("session_summary").select("*").eq("event", event).eq("year", year),
+            page_size, key="session_id"
+        )
+
+    @staticmethod
+    def get_session_summaries(event: str, year: int, page_size: int = PAGE_SIZE) -> list:
+        """Per-session aggregates for an event from the session_summary view"""
+        try:
+            return list(F1Database.iter_session_summaries(event, year, page_size))
+        except Exception as e:
+            logger.error(f"Error getting session summaries for {event} {year}: {e}")
+            return []
+
+    @staticmethod
+    def store_lap_telemetry(lap_telemetry_data: LapTelemetryData) -> dict:
+        """Store one lap's encoded telemetry, replacing any already stored for the lap"""
+        try:
+            response = get_client().table("lap_telemetry").upsert(lap_telemetry_data, on_conflict="lap_id").execute()
+            return {"exists": False, "data": response.data}
+        except Exception as e:
+            logger.error(f"Error storing telemetry for lap {lap_telemetry_data['lap_id']}: {e}")
+            return {"exists": False, "data": None}
+
+    @staticmethod
+    def store_lap_telemetries(rows: list, batch_size: int = TELEMETRY_BATCH_SIZE) -> dict:
+        """Bulk store encoded lap telemetry, `batch_size` laps per request"""
+        stored = []
+        try:
+            for i in range(0, len(rows), batch_size):
+                batch = rows[i:i + batch_size]
+                # Skip echoing the blobs back, the lap ids are all the caller needs
+                get_client().table("lap_telemetry").upsert(batch, on_conflict="lap_id", returning="minimal").execute()
+                stored += [{"lap_id": row["lap_id"]} for row in batch]
+            return {"exists": False, "data": stored}
+        except Exception as e:
+            logger.error(f"Error storing lap telemetry ({len(rows)} laps): {e}")
+            return {"exists": False, "data": None}
+
+    @staticmethod
+    def iter_lap_telemetry(lap_ids: list, batch_size: int = TELEMETRY_BATCH_SIZE) -> Iterator[dict]:
+        """Stream stored telemetry rows for the given laps, `batch_size` laps per request"""
+        lap_ids = list(lap_ids)
+        for i in range(0, len(lap_ids), batch_size):
+            batch = lap_ids[i:i + batch_size]
+            yield from paginate(
+                lambda: get_client().table("lap_telemetry").select("lap_id, codec_version, data").in_("lap_id", batch),
+                batch_size, key="lap_id"
+            )
+
+    @staticmethod
+    def get_lap_telemetry(lap_ids: list, batch_size: int = TELEMETRY_BATCH_SIZE) -> dict:
+        """Decoded telemetry channels keyed by lap id; laps without stored telemetry are left out"""
+        try:
+            return {row["lap_id"]: decode_telemetry(from_bytea(row["data"])) for row in F1Database.iter_lap_telemetry(lap_ids, batch_size)}
+        except Exception as e:
+            logger.error(f"Error getting telemetry for {len(lap_ids)} laps: {e}")
+            return {}
+
+    @staticmethod
+    def iter_fastest_lap_telemetry(year: int, session_type: str = None, event: str = None, page_size: int = TELEMETRY_BATCH_SIZE) -> Iterator[dict]:
+        """Stream the fastest_lap_telemetry view, one row per driver per session"""
+        def build_query():
+            query = get_client().table("fastest_lap_telemetry").select("*").eq("year", year)
+            if session_type:
+                query = query.eq("session_type", session_type)
+            return query.eq("event", event) if event else query
+
+        return paginate(build_query, page_size, key="lap_id")
+
+    @staticmethod
+    def get_fastest_lap_telemetry(year: int, session_type: str = None, event: str = None, page_size: int = TELEMETRY_BATCH_SIZE) -> list:
+        """Each driver's fastest lap per session with its telemetry decoded under "telemetry" (replacing "data")"""
+        try:
+            rows = []
+            for row in F1Database.iter_fastest_lap_telemetry(year, session_type, event, page_size):
+                row["telemetry"] = decode_telemetry(from_bytea(row.pop("data")))
+                rows.append(row)
+            return rows
+        except Exception as e:
+            logger.error(f"Error getting fastest lap telemetry for {year}: {e}")
+            return []
@@ -0,0 +1,37 @@
+-- Per-lap telemetry stored next to the lap table as blobs from db_utils.telemetry_codec
+-- (distance-resampled, quantised, delta-encoded and compressed, ~5-10 KB a lap).
+-- Written by F1Database.store_lap_telemetries and read back, decoded, through
+-- F1Database.get_lap_telemetry / get_fastest_lap_telemetry.
+
+create table if not exists lap_telemetry (
+    id bigint generated by default as identity primary key,
+    lap_id bigint not null unique references lap (id) on delete cascade,
+    codec_version smallint not null,
+    n_samples integer not null,
+    step real not null,
+    data bytea not null
+);
+
+-- Each driver's fastest lap with stored telemetry, per session
+create or replace view fastest_lap_telemetry as
+select distinct on (st.session_id, st.driver_id)
+    lt.lap_id,
+    st.session_id,
+    st.driver_id,
+    d.driver_name,
+    d.team,
+    s.event,
+    s.year,
+    s.session_type,
+    st.tyre_compound,
+    l.lap_number,
+    l.lap_time,
+    lt.codec_version,
+    lt.step,
+    lt.data
+from lap_telemetry lt
+join lap l on l.id = lt.lap_id
+join stints st on st.id = l.stint_id
+join sessions s on s.id = st.session_id
+join drivers d on d.id = st.driver_id
+order by st.session_id, st.driver_id, l.lap_time;
@@ -0,0 +1,59 @@
+-- Per-stint and per-session aggregates computed in the database.
+-- Read through F1Database.get_stint_summaries / get_session_summaries so only
+-- one row per stint or session crosses the network instead of every lap.
+
+create or replace view stint_summary as
+select
+    st.id as stint_id,
+    st.session_id,
+    st.driver_id,
+    d.driver_name,
+    d.team,
+    s.event,
+    s.year,
+    s.session_type,
+    st.stint_number,
+    st.tyre_compound,
+    st.initial_tyre_age,
+    count(l.id) as lap_count,
+    percentile_cont(0.5) within group (order by l.lap_time) as median_lap_time,
+    min(l.lap_time) as min_lap_time,
+    regr_slope(l.lap_time, l.tyre_age) as degradation_rate,
+    avg(w.track_temp) as mean_track_temp,
+    avg(w.air_temp) as mean_air_temp,
+    percentile_cont(0.5) within group (order by l.sector1_time) as median_sector1_time,
+    percentile_cont(0.5) within group (order by l.sector2_time) as median_sector2_time,
+    percentile_cont(0.5) within group (order by l.sector3_time) as median_sector3_time
+from stints st
+join sessions s on s.id = st.session_id
+join drivers d on d.id = st.driver_id
+left join lap l on l.stint_id = st.id
+left join weather_table w on w.id = l.weather
+group by st.id, s.id, d.id;
+
+create or replace view session_summary as
+select
+    s.id as session_id,
+    s.event,
+    s.year,
+    s.session_type,
+    s.weather_type,
+    count(distinct st.driver_id) as driver_count,
+    count(distinct st.id) as stint_count,
+    count(l.id) as lap_count,
+    percentile_cont(0.5) within group (order by l.lap_time) as median_lap_time,
+    min(l.lap_time) as min_lap_time,
+    avg(w.track_temp) as mean_track_temp,
+    avg(w.air_temp) as mean_air_temp,
+    percentile_cont(0.5) within group (order by l.sector1_time) as median_sector1_time,
+    percentile_cont(0.5) within group (order by l.sector2_time) as median_sector2_time,
+    percentile_cont(0.5) within group (order by l.sector3_time) as median_sector3_time
+from sessions s
+left join stints st on st.session_id = s.id
+left join lap l on l.stint_id = st.id
+left join weather_table w on w.id = l.weather
+group by s.id;
+
+-- Lap filters on the stint view mostly hit these
+create index if not exists lap_stint_id_idx on lap (stint_id);
+create index if not exists stints_session_driver_idx on stints (session_id, driver_id);
@@ -1,16 +1,77 @@
 import os
-import supabase
-from supabase import create_client, Client
-from datetime import datetime
+import json
+import time
+from functools import lru_cache
 from typing import TypedDict
-from dotenv import load_dotenv
-import pandas as pd
 
-load_dotenv()
-
-url: str = os.environ.get("SUPABASE_URL")
-key: str = os.environ.get("SUPABASE_KEY")
-f1_db: Client = create_client(url, key)
+from utils.lazy import lazy_import
+from utils.instrumentation import incr, record_span, is_profiling, get_logger
+from db_utils.telemetry_codec import CODEC_VERSION, DEFAULT_STEP, HEADER, encode_telemetry, to_bytea
+
+logger = get_logger(__name__)
+
+pd = lazy_import("pandas")
+
+def get_rows_moved(request, response) -> int:
+    """
+    Rows read (from PostgREST's Content-Range, e.g. "0-24/*") or rows sent in an insert.
+
+    Insert bodies carry whole lap telemetry, so they are only parsed to count rows while profiling.
+    """
+    if request.method == "GET":
+        content_range = response.headers.get("content-range", "")
+        bounds = content_range.split("/")[0]
+        if "-" in bounds:
+            first, last = bounds.split("-")
+            return int(last) - int(first) + 1
+        return 0
+    if request.method == "POST" and request.content and is_profiling():
+        body = json.loads(request.content)
+        return len(body) if isinstance(body, list) else 1
+    return 0
+
+def on_db_request(request):
+    request.f1_start_ns = time.perf_counter_ns()
+
+def on_db_response(response):
+    """Count every database round trip and the rows it moved, and time it as a span"""
+    request = response.request
+    table = request.url.path.rstrip("/").split("/")[-1]
+    incr("db.round_trips")
+    incr(f"db.{request.method.lower()}")
+    incr("db.rows", get_rows_moved(request, response))
+    record_span("db_request", getattr(request, "f1_start_ns", time.perf_counter_ns()), time.perf_counter_ns(), table=table, method=request.method, status=response.status_code)
+
+async def on_db_request_async(request):
+    on_db_request(request)
+
+async def on_db_response_async(response):
+    on_db_response(response)
+
+def get_db_event_hooks(is_async=False):
+    if is_async:
+        return {"request": [on_db_request_async], "response": [on_db_response_async]}
+    return {"request": [on_db_request], "response": [on_db_response]}
+
+@lru_cache(maxsize=1)
+def get_client():
+    """Create the Supabase client on first use, so importing this module needs no credentials"""
+    import httpx
+    from dotenv import load_dotenv
+    from supabase import create_client
+    from supabase.lib.client_options import SyncClientOptions
+
+    load_dotenv()
+    url: str = os.environ.get("SUPABASE_URL")
+    key: str = os.environ.get("SUPABASE_KEY")
+    http_client = httpx.Client(event_hooks=get_db_event_hooks(), timeout=120)
+    return create_client(url, key, options=SyncClientOptions(httpx_client=http_client))
+
+def __getattr__(name):
+    # Keep `from db_utils.supa_db import f1_db` working for existing scripts
+    if name == "f1_db":
+        return get_client()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 class DriverData(TypedDict):
     driver_name: str
@@ -42,6 +103,13 @@ class LapData(TypedDict):
     sector2_time: float
     sector3_time: float
 
+class LapTelemetryData(TypedDict):
+    lap_id: int
+    codec_version: int
+    n_samples: int
+    step: float
+    data: str
+
 class WeatherData(TypedDict):
     session_id: int
     time: str
@@ -99,6 +167,17 @@ def create_lap_data(stint_id, weather_id, lap):
         }
     return lap_data
 
+def create_lap_telemetry_data(lap_id, telemetry, step=None):
+    blob = encode_telemetry(telemetry, step or DEFAULT_STEP)
+    lap_telemetry_data: LapTelemetryData = {
+        "lap_id": int(lap_id),
+        "codec_version": CODEC_VERSION,
+        "n_samples": HEADER.unpack_from(blob)[3],
+        "step": step or DEFAULT_STEP,
+        "data": to_bytea(blob)
+    }
+    return lap_telemetry_data
+
 def create_weather_data(session_id, weather, absolute_time):
     weather_data_dict: WeatherData = {
             "session_id": int(session_id),
@@ -116,60 +195,60 @@ def create_weather_data(session_id, weather, absolute_time):
 def add_driver(driver_data: DriverData):
     try:
         response = (
-            f1_db.table("drivers")
+            get_client().table("drivers")
             .insert(driver_data)
             .execute()
         )
         return response
     except Exception as e:
-        print(f"Error adding driver {driver_data['driver_name']}: {e}")
+        logger.error(f"Error adding driver {driver_data['driver_name']}: {e}")
         return None
 
 def add_session(session_data: SessionData):
     try:
         response = (
-            f1_db.table("sessions")
+            get_client().table("sessions")
             .insert(session_data)
             .execute()
         )
         return response
     except Exception as e:
-        print(f"Error adding session {session_data['event']}: {e}")
+        logger.error(f"Error adding session {session_data['event']}: {e}")
         return None
 
 def add_stint(stint_data: StintData):
     try:
         response = (
-            f1_db.table("sessions")
+            get_client().table("sessions")
             .insert(stint_data)
             .execute()
         )
         return response
     except Exception as e:
-        print(f"Error adding session {stint_data['session_id'], stint_data['driver_id'], stint_data['stint_num']}: {e}")
+        logger.error(f"Error adding session {stint_data['session_id'], stint_data['driver_id'], stint_data['stint_num']}: {e}")
         return None
 
 def add_lap(lap_data: LapData):
     try:
         response = (
-            f1_db.table("lap")
+            get_client().table("lap")
             .insert(lap_data)
             .execute()
         )
         return response
     except Exception as e:
-        print(f"Error adding lap {lap_data['stint_id'], lap_data['lap_number']}: {e}")
+        logger.error(f"Error adding lap {lap_data['stint_id'], lap_data['lap_number']}: {e}")
         return None
 
 def add_weather(weather_data: WeatherData):
     try:
         response = (
-            f1_db.table("weather_table")
+            get_client().table("weather_table")
             .insert(weather_data)
             .execute()
         )
         return response
     except Exception as e:
-        print(f"Error adding weather {weather_data['session_id'], weather_data['time']}")
+        logger.error(f"Error adding weather {weather_data['session_id'], weather_data['time']}")
         return None
 
@@ -0,0 +1,160 @@
+"""
+Telemetry codec
+===============
+
+Packs one lap of telemetry into a compact blob for the `lap_telemetry` table. Channels are
+resampled onto a fixed distance grid, quantised to integers at a fixed resolution and, for the
+smooth channels, delta-encoded so most steps fit in int16; the channel payloads are then
+zlib-compressed. Discrete channels (gear, brake, DRS) take the last value before each grid point
+instead of being interpolated.
+
+    blob = encode_telemetry(telemetry)        # DataFrame with Distance plus any CHANNELS
+    channels = decode_telemetry(blob)         # {"Distance": array, "Speed": array, ...}
+
+Decoding returns the channels as resampled on the grid, to the channel's resolution (e.g. 0.1 km/h
+for Speed); detail between grid points is not kept. Blobs carry the codec version, older versions
+stay decodable through DECODERS.
+
+"""
+
+import zlib
+import struct
+
+from utils.lazy import lazy_import
+
+np = lazy_import("numpy")
+
+CODEC_VERSION = 1
+MAGIC = b"F1TL"
+DEFAULT_STEP = 5.0  # metres between samples
+
+# name: (scale, storage dtype, delta encoded, discrete); stored value is round(value * scale)
+CHANNELS = {
+    "Time": (1000, "int16", True, False),  # ms
+    "Speed": (10, "int16", True, False),  # 0.1 km/h
+    "RPM": (1, "int16", True, False),
+    "Throttle": (1, "uint8", False, False),
+    "nGear": (1, "uint8", False, True),
+    "Brake": (1, "uint8", False, True),
+    "DRS": (1, "uint8", False, True),
+    "X": (1, "int16", True, False),  # FastF1 position units (1/10 m)
+    "Y": (1, "int16", True, False),
+    "Z": (1, "int16", True, False),
+}
+# Storage dtypes by code, with a wider type to fall back to when values do not fit
+DTYPES = ["uint8", "int16", "int32", "int64"]
+WIDER = {"uint8": "int16", "int16": "int32", "int32": "int64"}
+
+HEADER = struct.Struct("<4sBHIff")  # magic, version, channels, samples, step, start distance
+CHANNEL_HEADER = struct.Struct("<BBBfq")  # name length, dtype code, delta flag, scale, first value
+
+def to_seconds(values):
+    if np.issubdtype(values.dtype, np.timedelta64):
+        return values.astype("timedelta64[ns]").astype(np.int64) / 1e9
+    return values.astype(float)
+
+def resample(distance, values, grid, discrete):
+    if len(grid) == 0:
+        return np.zeros(0)
+    if discrete:
+        idx = np.clip(np.searchsorted(distance, grid, side="right") - 1, 0, len(values) - 1)
+        return values[idx]
+    return np.interp(grid, distance, values)
+
+def fit_dtype(values, dtype):
+    """Narrowest of `dtype` and its wider fallbacks that holds every value"""
+    while dtype in WIDER:
+        info = np.iinfo(dtype)
+        if len(values) == 0 or (values.min() >= info.min and values.max() <= info.max):
+            break
+        dtype = WIDER[dtype]
+    return dtype
+
+def encode_telemetry(telemetry, step=DEFAULT_STEP, channels=None) -> bytes:
+    """Encode a lap's telemetry (needs a Distance column) sampled every `step` metres; no samples gives an empty grid"""
+    channels = [name for name in (channels or CHANNELS) if name in telemetry]
+    distance = telemetry["Distance"].to_numpy(dtype=float)
+    keep = np.isfinite(distance)
+    # Interpolation needs increasing distance, FastF1's can stall when the car is stationary
+    keep[keep] &= np.concatenate([[True], np.diff(distance[keep]) > 0])
+    distance = distance[keep]
+    start = float(distance[0]) if len(distance) else 0.0
+    grid = start + np.arange(int((distance[-1] - start) // step) + 1 if len(distance) else 0) * step
+
+    header = HEADER.pack(MAGIC, CODEC_VERSION, len(channels), len(grid), step, start)
+    table, payloads = [], []
+    for name in channels:
+        scale, dtype, is_delta, discrete = CHANNELS[name]
+        values = to_seconds(telemetry[name].to_numpy()[keep])
+        values = np.nan_to_num(values, nan=0.0)
+        quantised = np.round(resample(distance, values, grid, discrete) * scale).astype(np.int64)
+        first = int(quantised[0]) if len(quantised) else 0
+        stored = np.diff(quantised) if is_delta else quantised
+        dtype = fit_dtype(stored, dtype)
+        encoded_name = name.encode()
+        table.append(CHANNEL_HEADER.pack(len(encoded_name), DTYPES.index(dtype), is_delta, scale, first) + encoded_name)
+        payloads.append(stored.astype(np.dtype(dtype).newbyteorder("<")).tobytes())
+    return header + b"".join(table) + zlib.compress(b"".join(payloads))
+
+def decode_v1(blob: bytes, header) -> dict:
+    _, _, n_channels, n_samples, step, start = header
+    offset = HEADER.size
+    specs = []
+    for _ in range(n_channels):
+        name_length, dtype_code, is_delta, scale, first = CHANNEL_HEADER.unpack_from(blob, offset)
+        offset += CHANNEL_HEADER.size
+        name = blob[offset:offset + name_length].decode()
+        offset += name_length
+        specs.append((name, DTYPES[dtype_code], is_delta, scale, first))
+
+    body = zlib.decompress(blob[offset:])
+    channels = {"Distance": start + np.arange(n_samples, dtype=np.float32) * np.float32(step)}
+    position = 0
+    for name, dtype, is_delta, scale, first in specs:
+        dtype = np.dtype(dtype).newbyteorder("<")
+        count = n_samples - 1 if is_delta and n_samples else n_samples
+        stored = np.frombuffer(body, dtype=dtype, count=count, offset=position)
+        position += count * dtype.itemsize
+        if is_delta and n_samples:
+            values = np.empty(n_samples, dtype=np.int64)
+            values[0] = first
+            np.cumsum(stored, out=values[1:])
+            values[1:] += first
+        else:
+            values = stored
+        channels[name] = values.astype(np.uint8) if CHANNELS.get(name, (0, 0, 0, False))[3] else (values / scale).astype(np.float32)
+    return channels
+
+DECODERS = {1: decode_v1}
+
+def decode_telemetry(blob: bytes) -> dict:
+    """Channel arrays (float32, or uint8 for discrete channels) on the lap's distance grid"""
+    header = HEADER.unpack_from(blob)
+    if header[0] != MAGIC:
+        raise ValueError("Not a telemetry blob")
+    if header[1] not in DECODERS:
+        raise ValueError(f"Unsupported telemetry codec version {header[1]}")
+    return DECODERS[header[1]](blob, header)
+
+def decode_many(blobs) -> list:
+    return [decode_telemetry(blob) for blob in blobs]
+
+def stack_channel(decoded, name) -> "np.ndarray":
+    """One channel of many laps as a (laps, samples) array, NaN-padded to the longest lap"""
+    length = max((len(channels["Distance"]) for channels in decoded), default=0)
+    stacked = np.full((len(decoded), length), np.nan, dtype=np.float32)
+    for row, channels in enumerate(decoded):
+        values = channels.get(name)
+        if values is not None:
+            stacked[row, :len(values)] = values
+    return stacked
+
+## Transport, PostgREST sends bytea as a "\x..." hex string
+
+def to_bytea(blob: bytes) -> str:
+    return "\\x" + blob.hex()
+
+def from_bytea(value) -> bytes:
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return bytes(value)
+    return bytes.fromhex(value[2:] if value.startswith("\\x") else value)
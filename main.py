@@ -0,0 +1,377 @@
+"""
+F1 Project command line
+=======================
+
+    python main.py ingest jobs/weekend.json --workers 4
+    python main.py clean  jobs/weekend.json --out exports
+    python main.py train  jobs/weekend.json
+    python main.py predict --event Australia --year 2025 --compound SOFT --input laps.csv --output predictions.csv
+    python main.py render jobs/weekend.json --out renders --workers 8
+    python main.py serve --port 8765
+    python main.py record --event Australia --year 2025 --session Race --out feeds/australia_race.jsonl
+    python main.py stream feeds/australia_race.jsonl --speed 10
+
+Job files are JSON:
+
+    {
+        "year": 2025,
+        "events": ["Australia", {"event": "Miami", "year": 2023}],
+        "drivers": ["LEC", {"name": "HAM", "number": 44, "team": "Ferrari"}],
+        "sessions": ["FP1", "FP2", "FP3", "Qualifying", "Race"],
+        "compounds": ["SOFT", "MEDIUM", "HARD"],
+        "telemetry": false
+    }
+
+"telemetry": true also stores each ingested lap's telemetry (see db_utils/sql/lap_telemetry.sql).
+record writes a session's timing feed and stream replays one into the database lap by lap, as
+during a live session (see data_engine/live_ingest.py); --speed paces the replay.
+clean and train need driver number and team; train with no drivers uses every driver's laps in the
+database. Completed tasks are checkpointed to a state file (<job>.state.json by default), so
+rerunning an interrupted command skips finished work. --restart ignores the state file.
+
+--log-level sets logging verbosity and --profile PATH writes the run's spans and counters
+(a Chrome trace for *.trace.json, a summary JSON otherwise). Spans from worker processes are
+not collected, use --workers 1 to profile a stage end to end.
+
+"""
+
+import os
+import sys
+import json
+import argparse
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+from utils.instrumentation import configure_logging, get_logger, fields, span, enable_profiling, export_profile, get_counters
+
+logger = get_logger("cli")
+
+SESSIONS = ["FP1", "FP2", "FP3", "Qualifying", "Race"]
+COMPOUNDS = ["SOFT", "MEDIUM", "HARD"]
+
+## Job files and checkpoints
+
+def load_job(path):
+    with open(path) as f:
+        job = json.load(f)
+
+    events = []
+    for event in job.get("events", []):
+        if isinstance(event, str):
+            events.append({"event": event, "year": job["year"]})
+        else:
+            events.append({"event": event["event"], "year": event.get("year", job.get("year"))})
+
+    drivers = []
+    for driver in job.get("drivers", []):
+        if isinstance(driver, str):
+            drivers.append({"name": driver, "number": None, "team": None})
+        else:
+            drivers.append({"name": driver["name"], "number": driver.get("number"), "team": driver.get("team")})
+
+    return {
+        "events": events,
+        "drivers": drivers,
+        "sessions": job.get("sessions", SESSIONS),
+        "compounds": job.get("compounds", COMPOUNDS),
+        "lap_type": job.get("lap_type", "Fastest"),
+        "fmt": job.get("fmt", "png"),
+        "telemetry": job.get("telemetry", False)
+    }
+
+class RunState:
+    """Set of completed task keys per stage, saved after every task"""
+    def __init__(self, path, restart=False):
+        self.path = path
+        self.done = {}
+        if os.path.exists(path) and not restart:
+            with open(path) as f:
+                self.done = {stage: set(keys) for stage, keys in json.load(f).items()}
+
+    def is_done(self, stage, key):
+        return key in self.done.get(stage, set())
+
+    def mark_done(self, stage, key):
+        self.done.setdefault(stage, set()).add(key)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({stage: sorted(keys) for stage, keys in self.done.items()}, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+def run_tasks(stage, tasks, func, state, workers, executor_cls=ProcessPoolExecutor):
+    """
+    Run func(*args) for every (key, args) task not yet done in `state`.
+    `func` returns the list of keys it completed, so a task covering several steps can
+    checkpoint the ones that finished before a failure. Returns the number of failed tasks.
+    """
+    pending = [(key, args) for key, args in tasks if not state.is_done(stage, key)]
+    skipped = len(tasks) - len(pending)
+    logger.info("Stage started", extra=fields(stage=stage, pending=len(pending), skipped=skipped))
+    failures = 0
+
+    def record(key, result):
+        nonlocal failures
+        done_keys, error = result
+        for done_key in done_keys:
+            state.mark_done(stage, done_key)
+        if error:
+            failures += 1
+            logger.error("Task failed", extra=fields(stage=stage, task=key, error=error))
+        else:
+            logger.info("Task done", extra=fields(stage=stage, task=key))
+
+    if workers == 1:
+        for key, args in pending:
+            record(key, func(*args))
+        return failures
+
+    with executor_cls(max_workers=workers) as executor:
+        futures = {executor.submit(func, *args): key for key, args in pending}
+        for future in as_completed(futures):
+            try:
+                record(futures[future], future.result())
+            except Exception as e:
+                record(futures[future], ([], str(e)))
+    return failures
+
+def get_driver_data(driver):
+    from db_utils.supa_db import create_driver_data
+    if driver["number"] is None or driver["team"] is None:
+        raise ValueError(f"Driver {driver['name']} needs a number and team in the job file")
+    return create_driver_data(driver["name"], driver["number"], driver["team"])
+
+## Stage tasks (module level so they can run in worker processes)
+
+def ingest_event(year, event, drivers, sessions, already_done, telemetry=False):
+    from data_engine.race_data import store_session_stints
+    done = []
+    for driver in drivers:
+        for session in sessions:
+            key = f"{year}|{event}|{driver}|{session}"
+            if key in already_done:
+                continue
+            try:
+                stored = store_session_stints(year, event, driver, session, telemetry)
+            except Exception as e:
+                return done, f"{driver} {session}: {e}"
+            if not stored:
+                return done, f"{driver} {session}: not stored, see the log"
+            done.append(key)
+    return done, None
+
+def clean_driver(year, event, driver, out_dir, key):
+    from data_engine.race_data import get_cleaned_weekend_data
+    try:
+        laps = get_cleaned_weekend_data(get_driver_data(driver), event, year)
+        path = os.path.join(out_dir, f"{year}_{event.replace(' ', '_')}_{driver['name']}.csv")
+        laps.to_csv(path, index=False)
+    except Exception as e:
+        return [], str(e)
+    return [key], None
+
+def train_event(year, event, drivers, compounds, registry_dir, key_prefix):
+    import pandas as pd
+    from data_engine.race_data import get_cleaned_weekend_data, get_all_weekend_laps
+    from models.per_model import abs_performance_model, preprocess_data
+    from models.registry import save_model
+
+    try:
+        if drivers:
+            laps = pd.concat([get_cleaned_weekend_data(get_driver_data(driver), event, year) for driver in drivers], ignore_index=True)
+        else:
+            laps = get_all_weekend_laps(event, year)
+    except Exception as e:
+        return [], f"loading laps: {e}"
+
+    done = []
+    for compound in compounds:
+        try:
+            if not (laps["tyre_compound"] == compound).any():
+                logger.warning(f"No {compound} laps at {event} {year}, skipping")
+            else:
+                model, metrics = abs_performance_model(laps, compound, return_metrics=True)
+                X, _ = preprocess_data(laps, compound)
+                save_model(model, event, year, compound, X.columns, metrics, registry_dir)
+        except Exception as e:
+            return done, f"{compound}: {e}"
+        done.append(f"{key_prefix}|{compound}")
+    return done, None
+
+## Commands
+
+def cmd_ingest(args, job, state):
+    # One task per event, checkpointed per driver session since stints are not safe to store twice
+    driver_names = [driver["name"] for driver in job["drivers"]]
+    tasks = []
+    for event in job["events"]:
+        event_key = f"{event['year']}|{event['event']}"
+        session_keys = [f"{event_key}|{d}|{s}" for d in driver_names for s in job["sessions"]]
+        already_done = [key for key in session_keys if state.is_done("ingest", key)]
+        if len(already_done) < len(session_keys):
+            tasks.append((event_key, (event["year"], event["event"], driver_names, job["sessions"], already_done, job["telemetry"])))
+
+    # Drivers are created on their first FP1, so run one event alone before going parallel
+    if tasks and args.workers != 1:
+        failures = run_tasks("ingest", tasks[:1], ingest_event, state, 1)
+        failures += run_tasks("ingest", tasks[1:], ingest_event, state, args.workers)
+        return failures
+    return run_tasks("ingest", tasks, ingest_event, state, args.workers)
+
+def cmd_clean(args, job, state):
+    os.makedirs(args.out, exist_ok=True)
+    tasks = []
+    for event in job["events"]:
+        for driver in job["drivers"]:
+            key = f"{event['year']}|{event['event']}|{driver['name']}"
+            tasks.append((key, (event["year"], event["event"], driver, args.out, key)))
+    return run_tasks("clean", tasks, clean_driver, state, args.workers, ThreadPoolExecutor)
+
+def cmd_train(args, job, state):
+    # Every job driver needs a number and team (checked by the task); no drivers trains on every driver in the database
+    drivers = job["drivers"]
+    if not drivers:
+        logger.warning("No drivers in the job, training on every driver's laps in the database")
+    tasks = []
+    for event in job["events"]:
+        key_prefix = f"{event['year']}|{event['event']}"
+        compounds = [c for c in job["compounds"] if not state.is_done("train", f"{key_prefix}|{c}")]
+        if compounds:
+            tasks.append((key_prefix, (event["year"], event["event"], drivers, compounds, args.registry, key_prefix)))
+    return run_tasks("train", tasks, train_event, state, args.workers)
+
+def cmd_predict(args):
+    import pandas as pd
+    from models.registry import load_model
+    from models.per_model import predict_lap_times
+
+    model, meta = load_model(args.event, args.year, args.compound, args.registry)
+    if model is None:
+        logger.error(f"No model registered for {args.event} {args.year} {args.compound}")
+        return 1
+    laps = pd.read_csv(args.input)
+    laps["predicted_lap_time"] = predict_lap_times(model, meta["features"], laps)
+    if args.output:
+        laps.to_csv(args.output, index=False)
+    else:
+        print(laps)
+    return 0
+
+def cmd_serve(args):
+    from models.serving import serve
+    serve(args.registry, args.host, args.port)
+    return 0
+
+def cmd_record(args):
+    from data_engine.live_ingest import record_feed
+    record_feed(args.year, args.event, args.session, args.out, args.drivers)
+    return 0
+
+def cmd_stream(args):
+    from data_engine.live_ingest import stream_feed
+    stats = stream_feed(args.feed, args.speed, args.drivers, args.batch_size, args.max_delay)
+    return 1 if stats["failed"] else 0
+
+def cmd_render(args, job, state):
+    from visualizer.batch_render import build_weekend_specs, render_batch, print_timing_summary, get_output_path
+
+    driver_names = [driver["name"] for driver in job["drivers"]]
+    specs = []
+    for event in job["events"]:
+        specs += build_weekend_specs(event["event"], event["year"], driver_names, job["sessions"], job["lap_type"], job["fmt"])
+
+    pending = [spec for spec in specs if not state.is_done("render", get_output_path(spec, args.out))]
+    logger.info("Stage started", extra=fields(stage="render", pending=len(pending), skipped=len(specs) - len(pending)))
+    results = render_batch(pending, args.out, workers=args.workers)
+    for result in results:
+        if not result["error"]:
+            state.mark_done("render", result["path"])
+    print_timing_summary(results)
+    return sum(1 for result in results if result["error"])
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="F1 data pipeline", formatter_class=argparse.RawDescriptionHelpFormatter, epilog=__doc__)
+    parser.add_argument("--log-level", default="INFO", choices=["DEBUG", "INFO", "WARNING", "ERROR"])
+    parser.add_argument("--profile", default=None, help="write a profile of the run to this path")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    def add_job_command(name, help_text):
+        sub = subparsers.add_parser(name, help=help_text)
+        sub.add_argument("job", help="JSON job file")
+        sub.add_argument("--workers", type=int, default=None, help="parallel workers (default: CPU count, 1 runs inline)")
+        sub.add_argument("--state", default=None, help="checkpoint file (default: <job>.state.json)")
+        sub.add_argument("--restart", action="store_true", help="ignore existing checkpoints")
+        return sub
+
+    add_job_command("ingest", "store sessions, stints, laps and weather in the database")
+    clean = add_job_command("clean", "export cleaned weekend laps to CSV")
+    clean.add_argument("--out", default="exports")
+    train = add_job_command("train", "train per-compound lap time models")
+    train.add_argument("--registry", default=None)
+    render = add_job_command("render", "render a weekend chart report")
+    render.add_argument("--out", default="renders")
+
+    predict = subparsers.add_parser("predict", help="predict lap times with a registered model")
+    predict.add_argument("--event", required=True)
+    predict.add_argument("--year", type=int, required=True)
+    predict.add_argument("--compound", required=True)
+    predict.add_argument("--input", required=True, help="CSV of cleaned laps")
+    predict.add_argument("--output", default=None)
+    predict.add_argument("--registry", default=None)
+
+    serve = subparsers.add_parser("serve", help="serve lap time predictions from the registry over HTTP")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8765)
+    serve.add_argument("--registry", default=None)
+
+    record = subparsers.add_parser("record", help="record a session's timing feed for streaming ingest")
+    record.add_argument("--event", required=True)
+    record.add_argument("--year", type=int, required=True)
+    record.add_argument("--session", required=True)
+    record.add_argument("--out", required=True, help="feed file (JSON lines)")
+    record.add_argument("--drivers", nargs="+", default=None)
+
+    stream = subparsers.add_parser("stream", help="ingest a recorded timing feed lap by lap")
+    stream.add_argument("feed")
+    stream.add_argument("--speed", type=float, default=None, help="replay at this multiple of real time (default: as fast as possible)")
+    stream.add_argument("--drivers", nargs="+", default=None)
+    stream.add_argument("--batch-size", type=int, default=20, help="laps per write")
+    stream.add_argument("--max-delay", type=float, default=1.0, help="seconds a lap may wait for its write")
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    configure_logging(args.log_level)
+    if args.profile:
+        enable_profiling()
+    try:
+        with span(f"cli.{args.command}"):
+            return run_command(args)
+    finally:
+        if args.profile:
+            export_profile(args.profile)
+            logger.info(f"Profile written to {args.profile}")
+        logger.debug(f"Counters: {get_counters()}")
+
+def run_command(args):
+
+    if getattr(args, "registry", None) is None and args.command in ("train", "predict", "serve"):
+        from models.registry import REGISTRY_DIR
+        args.registry = REGISTRY_DIR
+
+    if args.command == "predict":
+        return cmd_predict(args)
+    if args.command == "serve":
+        return cmd_serve(args)
+    if args.command == "record":
+        return cmd_record(args)
+    if args.command == "stream":
+        return cmd_stream(args)
+
+    job = load_job(args.job)
+    state = RunState(args.state or f"{args.job}.state.json", restart=args.restart)
+    commands = {"ingest": cmd_ingest, "clean": cmd_clean, "train": cmd_train, "render": cmd_render}
+    failures = commands[args.command](args, job, state)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,151 @@
+"""
+Stint Degradation Fitting
+=========================
+
+Fit linear and quadratic lap time vs tyre age curves to every stint at once. Stints are padded into
+(n_stints, max_stint_length) arrays with a validity mask so each fit is a handful of batched array
+operations instead of one np.polyfit per stint.
+
+Lap times are fuel corrected first: a car gets `fuel_effect` seconds per lap quicker as fuel burns,
+so the raw slope under-reports degradation by roughly that amount.
+
+"""
+
+import numpy as np
+
+from utils.lazy import lazy_import
+from utils.instrumentation import timed
+
+pd = lazy_import("pandas")
+
+FUEL_EFFECT = 0.03  # s per lap of fuel burnt
+CLIFF_THRESHOLD = 0.5  # s slower than the early-stint trend
+CLIFF_MIN_LAPS = 2
+
+def build_stint_arrays(laps, group_cols, time_col, age_col, lap_col):
+    """Pad ragged stints into 2D arrays. Returns the stint keys and (ages, times, lap_numbers, mask)"""
+    # Laps with a missing stint key (FastF1 often has NaN Stint) can't be placed in a stint
+    laps = laps.dropna(subset=group_cols + [time_col, age_col]).sort_values(group_cols + [age_col])
+    grouped = laps.groupby(group_cols, sort=True)
+    codes = grouped.ngroup().to_numpy()
+    positions = grouped.cumcount().to_numpy()
+    keys = grouped.size().reset_index(name="n_laps")
+
+    shape = (len(keys), int(keys["n_laps"].max()) if len(keys) else 0)
+    ages = np.zeros(shape)
+    times = np.zeros(shape)
+    lap_numbers = np.zeros(shape)
+    mask = np.zeros(shape, dtype=bool)
+
+    ages[codes, positions] = laps[age_col].to_numpy(dtype=float)
+    times[codes, positions] = laps[time_col].to_numpy(dtype=float)
+    lap_numbers[codes, positions] = laps[lap_col].to_numpy(dtype=float)
+    mask[codes, positions] = True
+    return keys, ages, times, lap_numbers, mask
+
+def fuel_correct(times, lap_numbers, mask, fuel_effect=FUEL_EFFECT, total_laps=None):
+    """Lap times as if run on an empty tank"""
+    if total_laps is None:
+        total_laps = lap_numbers[mask].max() if mask.any() else 0
+    return np.where(mask, times - fuel_effect * (total_laps - lap_numbers), 0.0)
+
+def fit_linear(x, y, mask):
+    """Batched least squares y = intercept + slope * x over masked rows"""
+    w = mask.astype(float)
+    n = w.sum(axis=1)
+    sx, sy = (w * x).sum(axis=1), (w * y).sum(axis=1)
+    sxx, sxy = (w * x * x).sum(axis=1), (w * x * y).sum(axis=1)
+
+    denom = n * sxx - sx ** 2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slope = np.where(denom != 0, (n * sxy - sx * sy) / denom, np.nan)
+        intercept = (sy - slope * sx) / n
+    return slope, intercept
+
+def fit_quadratic(x, y, mask):
+    """Batched least squares y = c0 + c1 * x + c2 * x^2, returns coefficients of shape (n_stints, 3)"""
+    w = mask.astype(float)
+    design = np.stack([w, w * x, w * x * x], axis=-1)
+    xtx = np.einsum('sli,slj->sij', design, design)
+    xty = np.einsum('sli,sl->si', design, w * y)
+    return np.einsum('sij,sj->si', np.linalg.pinv(xtx), xty)
+
+def get_fit_quality(y, y_pred, mask):
+    """R^2 and RMSE per stint"""
+    w = mask.astype(float)
+    n = w.sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = (w * y).sum(axis=1) / n
+        ss_res = (w * (y - y_pred) ** 2).sum(axis=1)
+        ss_tot = (w * (y - mean[:, None]) ** 2).sum(axis=1)
+        r2 = np.where(ss_tot > 0, 1 - ss_res / ss_tot, np.nan)
+        rmse = np.sqrt(ss_res / n)
+    return r2, rmse
+
+def detect_cliffs(ages, times, mask, early_fraction=0.6, threshold=CLIFF_THRESHOLD, min_laps=CLIFF_MIN_LAPS):
+    """
+    A cliff is a run of at least `min_laps` laps at the end of a stint that are all more than
+    `threshold` seconds slower than the trend fitted to the early part of the stint.
+    Returns (cliff, cliff_tyre_age) per stint.
+    """
+    n = mask.sum(axis=1)
+    positions = np.arange(mask.shape[1])[None, :]
+    early_mask = mask & (positions < np.maximum(np.ceil(n * early_fraction), 3)[:, None])
+    slope, intercept = fit_linear(ages, times, early_mask)
+
+    residuals = times - (intercept[:, None] + slope[:, None] * ages)
+    slow = (residuals > threshold) | ~mask
+    # True where this lap and every later lap in the stint is slow
+    slow_to_end = np.flip(np.logical_and.accumulate(np.flip(slow, axis=1), axis=1), axis=1) & mask
+
+    cliff = slow_to_end.sum(axis=1) >= min_laps
+    first_slow = np.argmax(slow_to_end, axis=1)
+    cliff_age = np.where(cliff, ages[np.arange(len(ages)), first_slow], np.nan)
+    return cliff, cliff_age
+
+@timed("fit.degradation")
+def fit_stint_degradation(laps, group_cols=('session_type', 'stint_number'), time_col='lap_time', age_col='tyre_age', lap_col='lap_number', fuel_effect=FUEL_EFFECT, total_laps=None, min_laps=3):
+    """
+    Degradation fits for every stint in `laps` (one row per lap, lap times in seconds).
+    Returns one row per stint: slope/intercept/r2/rmse of the linear fit, quadratic coefficients
+    and r2, and cliff detection.
+    """
+    keys, ages, times, lap_numbers, mask = build_stint_arrays(laps, list(group_cols), time_col, age_col, lap_col)
+    times = fuel_correct(times, lap_numbers, mask, fuel_effect, total_laps)
+
+    slope, intercept = fit_linear(ages, times, mask)
+    r2, rmse = get_fit_quality(times, intercept[:, None] + slope[:, None] * ages, mask)
+
+    coeffs = fit_quadratic(ages, times, mask)
+    quad_pred = coeffs[:, [0]] + coeffs[:, [1]] * ages + coeffs[:, [2]] * ages ** 2
+    quad_r2, _ = get_fit_quality(times, quad_pred, mask)
+
+    cliff, cliff_age = detect_cliffs(ages, times, mask)
+
+    results = keys.assign(
+        slope=slope, intercept=intercept, r2=r2, rmse=rmse,
+        quad_c0=coeffs[:, 0], quad_c1=coeffs[:, 1], quad_c2=coeffs[:, 2], quad_r2=quad_r2,
+        cliff=cliff, cliff_tyre_age=cliff_age
+    )
+    return results[results["n_laps"] >= min_laps].reset_index(drop=True)
+
+def fit_session_degradation(laps, fuel_effect=FUEL_EFFECT, min_laps=3):
+    """Degradation fits for FastF1 `session.laps` (any number of drivers), one row per driver stint"""
+    laps = pd.DataFrame({
+        "Driver": laps["Driver"],
+        "Stint": laps["Stint"],
+        "Compound": laps["Compound"],
+        "lap_time": laps["LapTime"].dt.total_seconds(),
+        "tyre_age": laps["TyreLife"],
+        "lap_number": laps["LapNumber"]
+    })
+    return fit_stint_degradation(laps, group_cols=["Driver", "Stint", "Compound"], fuel_effect=fuel_effect, min_laps=min_laps)
+
+
+if __name__ == "__main__":
+    from data_engine.race_data import get_cleaned_weekend_data
+    from db_utils.supa_db import create_driver_data
+
+    driver = create_driver_data("HAM", 44, "Ferrari")
+    wknd_laps = get_cleaned_weekend_data(driver, "Australia", 2025)
+    print(fit_stint_degradation(wknd_laps))
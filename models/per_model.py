@@ -1,11 +1,13 @@
-from matplotlib import pyplot as plt
 from data_engine.race_data import get_cleaned_weekend_data, get_all_weekend_laps
 from db_utils.supa_db import DriverData
+from utils.lazy import lazy_import
+from utils.instrumentation import span, get_logger
 import numpy as np
-import pandas as pd
-from xgboost import XGBRegressor
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import mean_squared_error
+
+pd = lazy_import("pandas")
+xgb = lazy_import("xgboost")
+
+logger = get_logger(__name__)
 
 """
                    
@@ -16,6 +18,25 @@ Create an XGBoost regression model per tyre compound per weekend (for now, adjus
 
 """
 
+SESSION_TYPES = ["FP1", "FP2", "FP3", "Qualifying", "Race"]
+RAINFALL_TYPES = ["dry", "wet"]
+
+def encode_features(X):
+    # Fixed categories so training and prediction agree on the codes
+    if 'session_type' in X.columns:
+        X['session_type'] = pd.Categorical(X['session_type'], categories=SESSION_TYPES).codes
+    if 'rainfall' in X.columns:
+        X['rainfall'] = pd.Categorical(X['rainfall'], categories=RAINFALL_TYPES).codes
+    return X.fillna(-1)
+
+def prepare_prediction_features(laps, feature_names):
+    """Model inputs for new laps, in the column order the model was trained on"""
+    X = laps.reindex(columns=feature_names).copy()
+    return encode_features(X)
+
+def predict_lap_times(model, feature_names, laps):
+    return model.predict(prepare_prediction_features(laps, feature_names))
+
 def preprocess_data(laps, compound):
     laps = laps.sort_values(by='weather_time') # do time-based sort for a time-based split
     laps = laps[laps["tyre_compound"]==compound]
@@ -23,19 +44,16 @@ def preprocess_data(laps, compound):
     X = laps.drop(['lap_time'], axis=1)
     y = laps['lap_time']
 
-    if 'session_type' in X.columns:
-        X['session_type'] = pd.Categorical(X['session_type']).codes
-    if 'rainfall' in X.columns:
-        X['rainfall'] = pd.Categorical(X['rainfall']).codes
-    
-    X = X.fillna(-1)
+    X = encode_features(X)
 
-    print(X)
+    logger.debug(f"Features:\n{X}")
 
     return X, y
 
 
-def abs_performance_model(laps, compound):
+def abs_performance_model(laps, compound, return_metrics=False):
+    from sklearn.metrics import mean_squared_error
+
     X, y = preprocess_data(laps, compound)
     
     # X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2) 
@@ -44,8 +62,9 @@ def abs_performance_model(laps, compound):
     X_train, X_test, y_train, y_test = time_based_split(X, y, test_size=0.2)
 
     
-    model = XGBRegressor(random_state=42)
-    model.fit(X_train, y_train)
+    model = xgb.XGBRegressor(random_state=42)
+    with span("fit", compound=compound, laps=len(X_train)):
+        model.fit(X_train, y_train)
     y_pred = model.predict(X_test)
     
     mse = mean_squared_error(y_test, y_pred)
@@ -54,18 +73,20 @@ def abs_performance_model(laps, compound):
     mean_lap_time = y_test.mean()
     rmse_percentage = (rmse / mean_lap_time) * 100
 
-    print(f"MSE: {mse:.4f}")
-    print(f"RMSE: {rmse:.4f}")
-    print(f"RMSE %: {rmse_percentage:.2f} %")
-    print(f"No. of laps: {len(y)}")
+    logger.info(f"MSE: {mse:.4f}")
+    logger.info(f"RMSE: {rmse:.4f}")
+    logger.info(f"RMSE %: {rmse_percentage:.2f} %")
+    logger.info(f"No. of laps: {len(y)}")
 
     feature_importance = pd.DataFrame({
         'feature': X.columns,
         'importance': model.feature_importances_
     }).sort_values('importance', ascending=False)
-    print("\nFeature Importance:")
-    print(feature_importance)
+    logger.info(f"Feature Importance:\n{feature_importance}")
 
+    if return_metrics:
+        metrics = {"mse": float(mse), "rmse": float(rmse), "rmse_percentage": float(rmse_percentage), "num_laps": len(y)}
+        return model, metrics
     return model
 
 def time_based_split(X, y, test_size):
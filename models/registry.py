@@ -0,0 +1,85 @@
+"""
+Model Registry
+==============
+
+Trained per-compound models saved as XGBoost JSON next to a metadata file holding the feature
+columns they were trained on. index.json lists every model and is rewritten on each save, so
+readers can watch its modification time to pick up new models. Saves hold a lock on the
+registry while they update the index, so training workers can save in parallel.
+
+"""
+
+import os
+import json
+import time
+import fcntl
+from contextlib import contextmanager
+
+from utils.lazy import lazy_import
+
+xgb = lazy_import("xgboost")
+
+REGISTRY_DIR = os.environ.get("F1_MODEL_DIR", "model_registry")
+
+def get_model_name(event, year, compound):
+    return f"{year}_{event.replace(' ', '_')}_{compound}"
+
+def get_index_path(registry_dir=REGISTRY_DIR):
+    return os.path.join(registry_dir, "index.json")
+
+def load_index(registry_dir=REGISTRY_DIR):
+    path = get_index_path(registry_dir)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+@contextmanager
+def lock_registry(registry_dir=REGISTRY_DIR):
+    """Exclusive lock on the registry across processes, held for the block"""
+    with open(os.path.join(registry_dir, ".lock"), "w") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+def write_json(path, data):
+    """Write through a temp file so readers never see a half-written file"""
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+def save_model(model, event, year, compound, feature_names, metrics=None, registry_dir=REGISTRY_DIR):
+    os.makedirs(registry_dir, exist_ok=True)
+    name = get_model_name(event, year, compound)
+    model_path = os.path.join(registry_dir, f"{name}.json")
+    model.save_model(model_path)
+
+    # Read-modify-write of the index, other workers may be saving too
+    with lock_registry(registry_dir):
+        index = load_index(registry_dir)
+        version = index.get(name, {}).get("version", 0) + 1
+        meta = {
+            "event": event,
+            "year": year,
+            "compound": compound,
+            "features": list(feature_names),
+            "metrics": metrics or {},
+            "version": version,
+            "saved_at": time.time(),
+            "path": f"{name}.json"
+        }
+        index[name] = meta
+        write_json(get_index_path(registry_dir), index)
+    return meta
+
+def load_model(event, year, compound, registry_dir=REGISTRY_DIR):
+    """Return (model, metadata) for a registered model, or (None, None) if it is not registered"""
+    meta = load_index(registry_dir).get(get_model_name(event, year, compound))
+    if meta is None:
+        return None, None
+    model = xgb.XGBRegressor()
+    model.load_model(os.path.join(registry_dir, meta["path"]))
+    return model, meta
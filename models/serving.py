@@ -0,0 +1,361 @@
+"""
+Prediction Service
+==================
+
+Serves lap time predictions from the registered per-compound models. Every model in the
+registry is loaded once and kept warm; single predictions submitted concurrently are merged into
+micro-batches, one `inplace_predict` per model per batch, and index.json is polled so retrained
+models are picked up without a restart.
+
+    service = PredictionService().start()
+    service.predict("Australia", 2025, "SOFT", {"tyre_age": 12, "session_type": "Race"})
+
+    python -m models.serving --port 8765
+    curl -d '{"event": "Australia", "year": 2025, "compound": "SOFT", "scenario": {"tyre_age": 12}}' localhost:8765/predict
+
+Scenarios are dicts of the model's features (a cleaned lap row); missing features are filled
+with -1 as in training. GET /stats reports p50/p99 latency and throughput.
+
+"""
+
+import os
+import json
+import time
+import queue
+import threading
+from collections import deque
+from concurrent.futures import Future
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from utils.lazy import lazy_import
+from utils.instrumentation import span, incr, get_logger
+from models.registry import REGISTRY_DIR, get_model_name, get_index_path, load_index
+from models.per_model import SESSION_TYPES, RAINFALL_TYPES
+
+np = lazy_import("numpy")
+xgb = lazy_import("xgboost")
+
+logger = get_logger(__name__)
+
+MAX_BATCH = 256
+# Seconds a batch stays open for more requests once the first arrives. With 0 a batch is whatever
+# queued up while the previous one ran, which batches well under load without delaying lone requests
+MAX_WAIT = 0.0
+RELOAD_INTERVAL = 1.0
+LATENCY_WINDOW = 10000
+HOST = "127.0.0.1"
+PORT = 8765
+
+CATEGORIES = {"session_type": SESSION_TYPES, "rainfall": RAINFALL_TYPES}
+
+class ModelNotFound(KeyError):
+    pass
+
+## Feature encoding, matching per_model.encode_features
+
+def encode_value(name, value):
+    if name in CATEGORIES:
+        return CATEGORIES[name].index(value) if value in CATEGORIES[name] else -1
+    if value is None or value != value:  # None or NaN
+        return -1
+    return float(value)
+
+def encode_scenario(scenario, feature_names):
+    return [encode_value(name, scenario.get(name)) for name in feature_names]
+
+def encode_scenarios(scenarios, feature_names):
+    rows = np.empty((len(scenarios), len(feature_names)), dtype=np.float32)
+    for i, scenario in enumerate(scenarios):
+        rows[i] = encode_scenario(scenario, feature_names)
+    return rows
+
+## Warm models
+
+class ModelStore:
+    """Boosters for every registered model, reloaded when index.json changes"""
+    def __init__(self, registry_dir=REGISTRY_DIR):
+        self.registry_dir = registry_dir
+        self.models = {}  # name: (booster, meta)
+        self._index_mtime = None
+
+    def refresh(self, force=False):
+        """Load new or re-saved models if the index changed; returns the names (re)loaded"""
+        try:
+            mtime = os.stat(get_index_path(self.registry_dir)).st_mtime_ns
+        except FileNotFoundError:
+            return []
+        if mtime == self._index_mtime and not force:
+            return []
+
+        index = load_index(self.registry_dir)
+        models = {name: loaded for name, loaded in self.models.items() if name in index}
+        reloaded = []
+        for name, meta in index.items():
+            current = models.get(name)
+            if current is not None and current[1]["version"] == meta["version"] and not force:
+                continue
+            try:
+                booster = xgb.Booster()
+                booster.load_model(os.path.join(self.registry_dir, meta["path"]))
+            except Exception as e:  # a model file still being written, keep the previous one
+                logger.warning(f"Could not load model {name}: {e}")
+                continue
+            models[name] = (booster, meta)
+            reloaded.append(name)
+        # Swap in one assignment so readers never see a half-updated dict
+        self.models = models
+        self._index_mtime = mtime
+        if reloaded:
+            incr("serving.reloads", len(reloaded))
+            logger.info(f"Loaded {len(reloaded)} model(s): {', '.join(sorted(reloaded))}")
+        return reloaded
+
+    def get(self, name):
+        loaded = self.models.get(name)
+        if loaded is None:
+            raise ModelNotFound(name)
+        return loaded
+
+## Micro-batching service
+
+class PredictionService:
+    def __init__(self, registry_dir=REGISTRY_DIR, max_batch=MAX_BATCH, max_wait=MAX_WAIT, reload_interval=RELOAD_INTERVAL):
+        self.store = ModelStore(registry_dir)
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.reload_interval = reload_interval
+        self._requests = queue.Queue()
+        self._thread = None
+        self._stopped = threading.Event()
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self._started_at = None
+        self._completed = 0
+        self._batches = 0
+
+    def start(self):
+        self.store.refresh(force=True)
+        self._started_at = time.perf_counter()
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="prediction-batcher", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        self._requests.put(None)
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # In-process API
+
+    def submit(self, event, year, compound, scenario) -> Future:
+        future = Future()
+        self._requests.put((get_model_name(event, year, compound), scenario, future, time.perf_counter()))
+        return future
+
+    def predict(self, event, year, compound, scenario, timeout=None) -> float:
+        """Predicted lap time for one scenario, batched with whatever else is in flight"""
+        return self.submit(event, year, compound, scenario).result(timeout)
+
+    def predict_many(self, event, year, compound, scenarios) -> "np.ndarray":
+        """Predictions for a list of scenarios, run directly as one batch"""
+        start = time.perf_counter()
+        booster, meta = self.store.get(get_model_name(event, year, compound))
+        predictions = booster.inplace_predict(encode_scenarios(scenarios, meta["features"]))
+        self._record([time.perf_counter() - start] * len(scenarios), batches=1)
+        return predictions
+
+    def get_models(self) -> dict:
+        return {name: meta for name, (_, meta) in self.store.models.items()}
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            latencies = np.array(self._latencies) * 1000
+            completed, batches = self._completed, self._batches
+        elapsed = time.perf_counter() - self._started_at if self._started_at else 0
+        return {
+            "requests": completed,
+            "batches": batches,
+            "mean_batch_size": completed / batches if batches else 0,
+            "p50_ms": float(np.percentile(latencies, 50)) if len(latencies) else None,
+            "p99_ms": float(np.percentile(latencies, 99)) if len(latencies) else None,
+            "throughput": completed / elapsed if elapsed else 0,
+            "models": len(self.store.models)
+        }
+
+    def reset_stats(self):
+        with self._lock:
+            self._latencies.clear()
+            self._completed = self._batches = 0
+            self._started_at = time.perf_counter()
+
+    # Batching loop
+
+    def _record(self, latencies, batches):
+        with self._lock:
+            self._latencies.extend(latencies)
+            self._completed += len(latencies)
+            self._batches += batches
+
+    def _next_batch(self):
+        """Block for one request, then take whatever else arrives within `max_wait`"""
+        try:
+            first = self._requests.get(timeout=self.reload_interval)
+        except queue.Empty:
+            return []
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(self._requests.get_nowait())
+            except queue.Empty:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._requests.get(timeout=remaining))
+                except queue.Empty:
+                    break
+        return batch
+
+    def _run(self):
+        last_reload = time.perf_counter()
+        while not self._stopped.is_set():
+            batch = [request for request in self._next_batch() if request is not None]
+            if batch:
+                try:
+                    self._run_batch(batch)
+                except Exception as e:  # keep the batcher alive, the batch's futures already hold their errors
+                    logger.error(f"Prediction batch failed: {e}")
+            if time.perf_counter() - last_reload >= self.reload_interval:
+                try:
+                    self.store.refresh()
+                except Exception as e:
+                    logger.error(f"Model reload failed: {e}")
+                last_reload = time.perf_counter()
+
+    def _run_batch(self, batch):
+        by_model = {}
+        for request in batch:
+            # Requests cancelled while queued are dropped, the rest can no longer be cancelled
+            if request[2].set_running_or_notify_cancel():
+                by_model.setdefault(request[0], []).append(request)
+
+        for name, requests in by_model.items():
+            try:
+                booster, meta = self.store.get(name)
+            except ModelNotFound as e:
+                for request in requests:
+                    request[2].set_exception(e)
+                continue
+
+            # Encode one scenario at a time so a malformed one fails only its own request
+            rows, encoded = [], []
+            for request in requests:
+                try:
+                    rows.append(encode_scenario(request[1], meta["features"]))
+                except Exception as e:
+                    request[2].set_exception(e)
+                    continue
+                encoded.append(request)
+            if not encoded:
+                continue
+
+            try:
+                with span("predict_batch", model=name, size=len(encoded)):
+                    predictions = booster.inplace_predict(np.array(rows, dtype=np.float32))
+            except Exception as e:
+                for request in encoded:
+                    request[2].set_exception(e)
+                continue
+            for request, prediction in zip(encoded, predictions):
+                request[2].set_result(float(prediction))
+
+        done = time.perf_counter()
+        ran = [request for requests in by_model.values() for request in requests]
+        self._record([done - request[3] for request in ran], batches=len(by_model))
+        incr("serving.requests", len(ran))
+        incr("serving.batches", len(by_model))
+
+## HTTP front end
+
+class PredictionHandler(BaseHTTPRequestHandler):
+    service = None  # set by `create_server`
+    protocol_version = "HTTP/1.1"  # keep-alive, clients reuse their connection
+    disable_nagle_algorithm = True  # headers and body go out in separate writes
+
+    def _send(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == "/stats":
+            self._send(200, self.service.get_stats())
+        elif self.path == "/models":
+            self._send(200, self.service.get_models())
+        elif self.path == "/health":
+            self._send(200, {"ok": True})
+        else:
+            self._send(404, {"error": f"Unknown path {self.path}"})
+
+    def do_POST(self):
+        if self.path != "/predict":
+            self._send(404, {"error": f"Unknown path {self.path}"})
+            return
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            model = (request["event"], int(request["year"]), request["compound"])
+            if "scenarios" in request:
+                predictions = self.service.predict_many(*model, request["scenarios"])
+                self._send(200, {"predictions": [float(p) for p in predictions]})
+            else:
+                self._send(200, {"prediction": self.service.predict(*model, request["scenario"])})
+        except ModelNotFound as e:
+            self._send(404, {"error": f"No model registered as {e.args[0]}"})
+        except (KeyError, ValueError, TypeError) as e:
+            self._send(400, {"error": f"Bad request: {e}"})
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+def create_server(service, host=HOST, port=PORT):
+    handler = type("BoundPredictionHandler", (PredictionHandler,), {"service": service})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+def serve(registry_dir=REGISTRY_DIR, host=HOST, port=PORT):
+    with PredictionService(registry_dir) as service:
+        server = create_server(service, host, port)
+        logger.info(f"Serving {len(service.store.models)} model(s) on http://{host}:{port}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+
+
+if __name__ == "__main__":
+    import argparse
+    from utils.instrumentation import configure_logging
+
+    parser = argparse.ArgumentParser(description="Local lap time prediction service")
+    parser.add_argument("--registry", default=REGISTRY_DIR)
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    args = parser.parse_args()
+
+    configure_logging("INFO")
+    serve(args.registry, args.host, args.port)
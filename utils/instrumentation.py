@@ -0,0 +1,168 @@
+"""
+Instrumentation
+===============
+
+Timed spans, counters and structured logging shared by the pipeline.
+
+    with span("session_load", event=event, session=ses):
+        session.load()
+    incr("db.round_trips")
+    logger = get_logger(__name__)
+    logger.info("Weekend stored", extra=fields(driver="HAM", event="Australia", year=2025))
+
+Log messages are f-strings; pipeline progress events (stages, tasks, streamed feeds) use a fixed
+message with their values as key=value fields, so they can be grepped and parsed.
+
+Counters are always kept. Spans are only recorded once `enable_profiling` is called (main.py does
+for --profile), so long runs don't accumulate them, and are written out with `export_profile`,
+either as a summary JSON or as a Chrome trace (open in chrome://tracing or https://ui.perfetto.dev).
+
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+import functools
+from contextlib import contextmanager
+
+_lock = threading.Lock()
+_local = threading.local()
+_profiling = False
+_spans = []
+_counters = {}
+_origin_ns = time.perf_counter_ns()
+
+## Logging
+
+class StructuredFormatter(logging.Formatter):
+    """`time level logger message key=value ...` with the key/values from extra=fields(...)"""
+    def format(self, record):
+        message = super().format(record)
+        record_fields = getattr(record, "fields", None)
+        if record_fields:
+            message += " " + " ".join(f"{key}={value}" for key, value in record_fields.items())
+        return message
+
+def fields(**kwargs):
+    return {"fields": kwargs}
+
+def get_logger(name):
+    return logging.getLogger(f"f1.{name}")
+
+def configure_logging(level="INFO"):
+    handler = logging.StreamHandler()
+    handler.setFormatter(StructuredFormatter("%(asctime)s %(levelname)-7s %(name)s %(message)s"))
+    root = logging.getLogger("f1")
+    root.handlers = [handler]
+    root.setLevel(level.upper() if isinstance(level, str) else level)
+    root.propagate = False
+
+## Spans and counters
+
+@contextmanager
+def span(name, **attrs):
+    """Time the enclosed block as `name`, nested under any span already open on this thread"""
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    parent = stack[-1] if stack else None
+    stack.append(name)
+    start = time.perf_counter_ns()
+    try:
+        yield
+    finally:
+        stack.pop()
+        record_span(name, start, time.perf_counter_ns(), parent, **attrs)
+
+def enable_profiling(enabled=True):
+    """Start (or stop) recording spans in this process"""
+    global _profiling
+    _profiling = enabled
+
+def is_profiling():
+    return _profiling
+
+def record_span(name, start_ns, end_ns, parent=None, **attrs):
+    """Record a span timed elsewhere (e.g. from HTTP client hooks), times from time.perf_counter_ns()"""
+    if not _profiling:
+        return
+    record = {
+        "name": name,
+        "parent": parent,
+        "start_us": (start_ns - _origin_ns) / 1000,
+        "duration_us": (end_ns - start_ns) / 1000,
+        "pid": os.getpid(),
+        "tid": threading.get_ident(),
+        "args": attrs
+    }
+    with _lock:
+        _spans.append(record)
+
+def timed(name):
+    """Decorator form of `span`"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def incr(name, value=1):
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+def get_counters():
+    with _lock:
+        return dict(_counters)
+
+def reset():
+    global _origin_ns
+    with _lock:
+        _spans.clear()
+        _counters.clear()
+        _origin_ns = time.perf_counter_ns()
+
+def get_span_summary():
+    """Count, total, mean and max duration (s) per span name, slowest total first"""
+    with _lock:
+        spans = list(_spans)
+    summary = {}
+    for record in spans:
+        entry = summary.setdefault(record["name"], {"count": 0, "total_s": 0.0, "max_s": 0.0})
+        seconds = record["duration_us"] / 1e6
+        entry["count"] += 1
+        entry["total_s"] += seconds
+        entry["max_s"] = max(entry["max_s"], seconds)
+    for entry in summary.values():
+        entry["mean_s"] = entry["total_s"] / entry["count"]
+    return dict(sorted(summary.items(), key=lambda item: item[1]["total_s"], reverse=True))
+
+## Export
+
+def get_chrome_trace():
+    with _lock:
+        spans = list(_spans)
+        counters = dict(_counters)
+    events = [
+        {"name": record["name"], "ph": "X", "ts": record["start_us"], "dur": record["duration_us"],
+         "pid": record["pid"], "tid": record["tid"], "args": {k: str(v) for k, v in record["args"].items()}}
+        for record in spans
+    ]
+    end_us = (time.perf_counter_ns() - _origin_ns) / 1000
+    events += [{"name": name, "ph": "C", "ts": end_us, "pid": os.getpid(), "args": {"value": value}} for name, value in counters.items()]
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+def export_profile(path, format=None):
+    """Write the run's profile; `format` is "chrome" or "json", defaulting to chrome for *.trace.json"""
+    if format is None:
+        format = "chrome" if path.endswith(".trace.json") else "json"
+    if format == "chrome":
+        profile = get_chrome_trace()
+    else:
+        profile = {"spans": get_span_summary(), "counters": get_counters()}
+    with open(path, "w") as f:
+        json.dump(profile, f, indent=2)
+    return path
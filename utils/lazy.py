@@ -0,0 +1,26 @@
+import sys
+import importlib
+import importlib.util
+
+def lazy_import(name: str):
+    """
+    Return module `name` without executing it until one of its attributes is first used.
+    Heavy libraries (fastf1, pandas, xgboost, ...) are imported this way at module level so that
+    importing our modules stays cheap for scripts and workers that never touch them.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError(f"No module named '{name}'", name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+def is_loaded(name: str) -> bool:
+    """True if `name` has actually been executed, not just registered lazily"""
+    module = sys.modules.get(name)
+    return module is not None and not isinstance(module, importlib.util._LazyModule)
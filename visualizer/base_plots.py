@@ -1,24 +1,46 @@
 import matplotlib as mpl
 from matplotlib import pyplot as plt
-from matplotlib.collections import LineCollection
+from matplotlib.collections import LineCollection, PolyCollection
+from matplotlib.patches import Patch
 import numpy as np
+import pandas as pd
 from matplotlib import colormaps
 from matplotlib import colors 
 
-import fastf1 as f1
+from data_engine.decimation import get_point_budget, decimate_trace
+from utils.instrumentation import timed
 
 heat_map = mpl.cm.plasma
 
-def plot_track_map_base(lap, colour, segments, title, metric):
-    fig, ax = plt.subplots(sharex=True, sharey=True, figsize=(12, 6.75))
+def get_figure(fig=None, figsize=None):
+    """Return a blank figure, clearing and reusing `fig` when one is passed in"""
+    if fig is None:
+        return plt.figure(figsize=figsize)
+    fig.clf()
+    if figsize is not None:
+        fig.set_size_inches(figsize)
+    return fig
+
+def finish_figure(fig, show):
+    if show:
+        plt.show()
+    return fig
+
+def plot_track_outline(ax, x, y, linewidth=16):
+    ax.plot(x, y, color='black', linestyle='-', linewidth=linewidth, zorder=0)
+
+@timed("render.track_map")
+def plot_track_map_base(lap, colour, segments, title, metric, fig=None, show=True, outline=None):
+    fig = get_figure(fig, figsize=(12, 6.75))
+    ax = fig.subplots()
     fig.suptitle(title, size=24, y=0.97)
 
-    plt.subplots_adjust(left=0.1, right=0.9, top=0.9, bottom=0.12)
+    fig.subplots_adjust(left=0.1, right=0.9, top=0.9, bottom=0.12)
     ax.axis('off')
 
-    # Plot track outline
-    ax.plot(lap.telemetry['X'], lap.telemetry['Y'], color='black',
-            linestyle='-', linewidth=16, zorder=0)
+    # Plot track outline, using the decimated X/Y when given
+    outline_x, outline_y = outline if outline is not None else (lap.telemetry['X'], lap.telemetry['Y'])
+    plot_track_outline(ax, outline_x, outline_y)
     
     # Plot coloured segments
     if metric == 'nGear':
@@ -48,25 +70,29 @@ def plot_track_map_base(lap, colour, segments, title, metric):
         legend.set_ticks(gear_range)
         legend.set_ticklabels([f"Gear {int(gear)}" for gear in gear_range])
     
-    plt.show()
+    return finish_figure(fig, show)
 
-def plot_overlay_speed_trace_base(d1_name, d2_name, d1_lap, d2_lap, title, circuit_info):
+@timed("render.overlay_speed_trace")
+def plot_overlay_speed_trace_base(d1_name, d2_name, d1_lap, d2_lap, title, corners, fig=None, show=True, max_points=None):
     d1_tel = d1_lap.get_car_data().add_distance()
     d2_tel = d2_lap.get_car_data().add_distance()
 
     d1_colour = 'red'
     d2_colour = 'blue'
 
-    fig, ax = plt.subplots()
-    ax.plot(d1_tel['Distance'], d1_tel['Speed'], color=d1_colour, label=d1_name)
-    ax.plot(d2_tel['Distance'], d2_tel['Speed'], color=d2_colour, label=d2_name)
+    fig = get_figure(fig)
+    ax = fig.subplots()
+    if max_points is None:
+        max_points = get_point_budget(fig.get_size_inches(), fig.dpi)
+    ax.plot(*decimate_trace(d1_tel['Distance'], d1_tel['Speed'], max_points), color=d1_colour, label=d1_name)
+    ax.plot(*decimate_trace(d2_tel['Distance'], d2_tel['Speed'], max_points), color=d2_colour, label=d2_name)
 
     v_min = d1_tel['Speed'].min()
     v_max = d1_tel['Speed'].max()
 
-    ax.vlines(x=circuit_info.corners['Distance'], ymin=v_min-20, ymax=v_max+20, linestyles='dotted', colors='grey')
+    ax.vlines(x=corners['Distance'], ymin=v_min-20, ymax=v_max+20, linestyles='dotted', colors='grey')
 
-    for _, corner in circuit_info.corners.iterrows():
+    for _, corner in corners.iterrows():
         txt = f"{corner['Number']}{corner['Letter']}"
         ax.text(corner['Distance'], v_min-25, txt, va='center_baseline', ha='center', size='small')
 
@@ -74,16 +100,20 @@ def plot_overlay_speed_trace_base(d1_name, d2_name, d1_lap, d2_lap, title, circu
     ax.set_ylabel('Speed in km/h')
 
     ax.legend()
-    plt.suptitle(title)
+    fig.suptitle(title)
 
-    plt.show()
+    return finish_figure(fig, show)
 
-def plot_single_trace_base(driver, lap, title, metric, circuit_info):
+@timed("render.single_trace")
+def plot_single_trace_base(driver, lap, title, metric, corners, fig=None, show=True, max_points=None):
     tel = lap.get_car_data().add_distance()
     colour = 'red'
 
-    fig, ax = plt.subplots()
-    ax.plot(tel['Distance'], tel[metric], color=colour, label=driver)
+    fig = get_figure(fig)
+    ax = fig.subplots()
+    if max_points is None:
+        max_points = get_point_budget(fig.get_size_inches(), fig.dpi)
+    ax.plot(*decimate_trace(tel['Distance'], tel[metric], max_points), color=colour, label=driver)
 
     distance_ticks = np.arange(0, tel['Distance'].max(), 100)
     ax.set_xticks(distance_ticks)
@@ -91,9 +121,9 @@ def plot_single_trace_base(driver, lap, title, metric, circuit_info):
     v_min = tel['Speed'].min()
     v_max = tel['Speed'].max()
 
-    ax.vlines(x=circuit_info.corners['Distance'], ymin=v_min-20, ymax=v_max+20, linestyles='dotted', colors='grey')
+    ax.vlines(x=corners['Distance'], ymin=v_min-20, ymax=v_max+20, linestyles='dotted', colors='grey')
 
-    for _, corner in circuit_info.corners.iterrows():
+    for _, corner in corners.iterrows():
         txt = f"{corner['Number']}{corner['Letter']}"
         ax.text(corner['Distance'], v_min-25, txt, va='center_baseline', ha='center', size='small')
 
@@ -102,12 +132,13 @@ def plot_single_trace_base(driver, lap, title, metric, circuit_info):
     ax.set_ylim(top=100)
 
     ax.legend()
-    plt.suptitle(title)
+    fig.suptitle(title)
 
-    plt.show()
+    return finish_figure(fig, show)
 
 
-def plot_scatter_chart_base(driver, laps, title):
+@timed("render.scatter_chart")
+def plot_scatter_chart_base(driver, laps, title, fig=None, show=True):
     x = np.array(laps["LapNumber"])
     y = np.array(laps["LapTime"].dt.total_seconds())
     tyre_dict = {"SOFT": "red", "MEDIUM": "yellow", "HARD": "white", "INTERS": "green", "WETS": "blue"}
@@ -115,49 +146,70 @@ def plot_scatter_chart_base(driver, laps, title):
 
     colours = [tyre_dict.get(compound, "black") for compound in tyre_compounds]
 
-    fig, ax = plt.subplots()
+    fig = get_figure(fig)
+    ax = fig.subplots()
     fig.patch.set_facecolor('darkgrey')
     ax.set_facecolor(colors.CSS4_COLORS['indigo'])
-    plt.title(title, color='white')
-    plt.xlabel("Lap Number", color='white')
-    plt.ylabel("Lap Time (s)", color='white')
+    ax.set_title(title, color='white')
+    ax.set_xlabel("Lap Number", color='white')
+    ax.set_ylabel("Lap Time (s)", color='white')
     ax.tick_params(colors='white')
 
     for spine in ax.spines.values():
         spine.set_edgecolor('white')
 
-    plt.scatter(x, y, c=colours)
-    plt.show()
-
-def plot_tyre_strategies_base(d1_name, d2_name, stints, title, session):
-    fig, ax = plt.subplots()
-
-    for driver_stints in stints:
-        previous_stint_end = 0
-        for idx, row in driver_stints.iterrows():
-            compound_colour = f1.plotting.get_compound_color(row["Compound"], session=session)
-
-            plt.barh(
-                y=row["Driver"],
-                width=row["StintLength"],
-                left=previous_stint_end,
-                color=compound_colour,
-                edgecolor="black",
-                fill=True
-            )
-
-            previous_stint_end += row["StintLength"]
-    
-    plt.title(title)
-    plt.xlabel("Lap Number")
-    plt.grid(False)
-
-    ax.invert_yaxis()
+    ax.scatter(x, y, c=colours)
+    return finish_figure(fig, show)
+
+def get_strategy_bars(stints, drivers, labels):
+    """(n, 4, 2) rectangle vertices, one per stint: a row per driver, split into a band per session label"""
+    height = 0.8 / len(labels)
+    row = pd.Categorical(stints["Driver"], categories=drivers).codes
+    band = pd.Categorical(stints["Session"], categories=labels).codes if "Session" in stints else np.zeros(len(stints), dtype=int)
+    y0 = row - 0.4 + band * height
+    y1 = y0 + height
+    x0 = stints["FirstLap"].to_numpy(dtype=float) - 1
+    x1 = stints["LastLap"].to_numpy(dtype=float)
+    return np.stack([np.column_stack([x0, y0]), np.column_stack([x0, y1]), np.column_stack([x1, y1]), np.column_stack([x1, y0])], axis=1)
+
+@timed("render.tyre_strategies")
+def plot_tyre_strategies_base(stints, title, compound_colours, fig=None, show=True):
+    """
+    Stint bars for every driver in `stints` (see `vis_data.get_session_stints`), drawn as one
+    collection. With a "Session" column each driver's row is split into a band per session.
+    """
+    drivers = list(pd.unique(stints["Driver"]))
+    labels = list(pd.unique(stints["Session"])) if "Session" in stints else [None]
+    colours = stints["Compound"].map(compound_colours).fillna("grey").to_numpy()
+
+    fig = get_figure(fig, figsize=(12, max(3, 0.3 * len(drivers) * len(labels) + 1.5)))
+    ax = fig.subplots()
+    ax.add_collection(PolyCollection(get_strategy_bars(stints, drivers, labels), facecolors=colours, edgecolors="black", linewidths=0.5))
+
+    ax.set_xlim(0, stints["LastLap"].max() + 1)
+    ax.set_ylim(len(drivers) - 0.5, -0.5)
+    ax.set_yticks(np.arange(len(drivers)), drivers)
+    if len(labels) > 1:
+        height = 0.8 / len(labels)
+        bands = (np.arange(len(drivers))[:, None] - 0.4 + (np.arange(len(labels)) + 0.5) * height).ravel()
+        ax.yaxis.remove_overlapping_locs = False  # the middle band sits on the driver's tick
+        ax.set_yticks(bands, labels * len(drivers), minor=True)
+        ax.tick_params(axis="y", which="minor", labelleft=False, labelright=True, labelsize="x-small", length=0)
+
+    used = [compound for compound in compound_colours if compound in set(stints["Compound"])]
+    fig.legend(handles=[Patch(facecolor=compound_colours[compound], edgecolor="black", label=compound) for compound in used],
+               loc="lower center", ncol=max(1, len(used)), frameon=False)
+
+    ax.set_title(title)
+    ax.set_xlabel("Lap Number")
+    ax.grid(False)
 
     ax.spines['top'].set_visible(False)
     ax.spines['right'].set_visible(False)
     ax.spines['left'].set_visible(False)
 
-    plt.tight_layout()
-    plt.show()
-
+    # Fixed margins, tight_layout would measure every tick label again
+    inches = fig.get_size_inches()
+    fig.subplots_adjust(left=0.7 / inches[0], right=1 - (1.6 if len(labels) > 1 else 0.3) / inches[0],
+                        top=1 - 0.5 / inches[1], bottom=1.1 / inches[1])
+    return finish_figure(fig, show)
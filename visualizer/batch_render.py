@@ -0,0 +1,173 @@
+"""
+Headless Batch Renderer
+=======================
+
+Render many charts to PNG/SVG without a display. Each session's specs go to one worker as a
+whole, so a session is loaded by one process only (see `load_session`), and each worker keeps one
+figure per chart type that is cleared and redrawn instead of creating a new figure for every chart.
+
+"""
+
+import os
+import time
+from itertools import combinations
+from typing import TypedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from matplotlib import pyplot as plt
+
+from utils.instrumentation import span, get_logger
+from visualizer.speed_vis import plot_track_map, plot_derived_track_map, plot_throttle_input_track_map, plot_overlay_speed_traces, plot_throttle_input_trace, plot_laps_scatter_chart, plot_tyre_strategies, plot_grid_tyre_strategies
+
+logger = get_logger(__name__)
+
+class ChartSpec(TypedDict, total=False):
+    chart: str
+    event: str
+    session: str
+    year: int
+    drivers: list
+    lap_type: str
+    metric: str
+    fmt: str
+
+CHART_FUNCS = {
+    "track_map": lambda spec, fig: plot_track_map(spec["drivers"][0], spec["event"], spec["session"], spec["year"], spec.get("metric", "Speed"), spec.get("lap_type", "Fastest"), fig=fig, show=False),
+    "derived_map": lambda spec, fig: plot_derived_track_map(spec["drivers"][0], spec["event"], spec["session"], spec["year"], spec.get("metric", "LongAccel"), spec.get("lap_type", "Fastest"), fig=fig, show=False),
+    "throttle_map": lambda spec, fig: plot_throttle_input_track_map(spec["drivers"][0], spec["event"], spec["session"], spec["year"], spec.get("lap_type", "Fastest"), fig=fig, show=False),
+    "overlay": lambda spec, fig: plot_overlay_speed_traces(spec["drivers"][0], spec["drivers"][1], spec["event"], spec["session"], spec["year"], spec.get("lap_type", "Fastest"), fig=fig, show=False),
+    "throttle_trace": lambda spec, fig: plot_throttle_input_trace(spec["drivers"][0], spec["event"], spec["session"], spec["year"], spec.get("lap_type", "Fastest"), fig=fig, show=False),
+    "scatter": lambda spec, fig: plot_laps_scatter_chart(spec["drivers"][0], spec["event"], spec["session"], spec["year"], fig=fig, show=False),
+    "tyre_strategy": lambda spec, fig: plot_tyre_strategies(spec["drivers"][0], spec["drivers"][1], spec["event"], spec["session"], spec["year"], fig=fig, show=False),
+    "grid_strategy": lambda spec, fig: plot_grid_tyre_strategies(spec["event"], spec["session"], spec["year"], spec["drivers"] or None, fig=fig, show=False),
+}
+
+SINGLE_DRIVER_CHARTS = ["track_map", "throttle_trace", "scatter"]
+PAIR_CHARTS = ["overlay", "tyre_strategy"]
+SESSION_CHARTS = ["grid_strategy"]  # whole grid, drivers left empty
+
+# One reusable figure per chart type, per worker process
+_figure_templates = {}
+
+def create_chart_spec(chart, event, session, year, drivers, lap_type="Fastest", metric="Speed", fmt="png"):
+    if chart not in CHART_FUNCS:
+        raise ValueError(f"Unknown chart type: {chart}")
+    chart_spec: ChartSpec = {
+        "chart": chart,
+        "event": event,
+        "session": session,
+        "year": year,
+        "drivers": list(drivers),
+        "lap_type": lap_type,
+        "metric": metric,
+        "fmt": fmt
+    }
+    return chart_spec
+
+def build_weekend_specs(event, year, drivers, sessions=("FP1", "FP2", "FP3", "Qualifying", "Race"), lap_type="Fastest", fmt="png"):
+    """Specs for a full weekend report: single-driver charts for every driver, comparisons for every driver pair, whole-grid charts"""
+    specs = []
+    for session in sessions:
+        for chart in SESSION_CHARTS:
+            specs.append(create_chart_spec(chart, event, session, year, [], lap_type, fmt=fmt))
+        for driver in drivers:
+            for chart in SINGLE_DRIVER_CHARTS:
+                specs.append(create_chart_spec(chart, event, session, year, [driver], lap_type, fmt=fmt))
+        for pair in combinations(drivers, 2):
+            for chart in PAIR_CHARTS:
+                specs.append(create_chart_spec(chart, event, session, year, pair, lap_type, fmt=fmt))
+    return specs
+
+def get_output_path(spec, out_dir):
+    name = f"{spec['year']}_{spec['event']}_{spec['session']}_{spec['chart']}_{'-'.join(spec['drivers']) or 'grid'}"
+    if spec["chart"] in ("track_map", "derived_map"):
+        name += f"_{spec.get('metric', 'Speed')}"
+    name = name.replace(" ", "_")
+    return os.path.join(out_dir, f"{name}.{spec.get('fmt', 'png')}")
+
+def init_worker():
+    plt.switch_backend("Agg")
+
+def render_chart(spec, out_dir, dpi=100):
+    """Render one spec to file, returning a timing record"""
+    start = time.perf_counter()
+    path = get_output_path(spec, out_dir)
+    try:
+        with span("render", chart=spec["chart"], session=spec["session"]):
+            fig = _figure_templates.get(spec["chart"])
+            fig = CHART_FUNCS[spec["chart"]](spec, fig)
+            _figure_templates[spec["chart"]] = fig
+            with span("render.save", fmt=spec.get("fmt", "png")):
+                fig.savefig(path, format=spec.get("fmt", "png"), dpi=dpi)
+        error = None
+    except Exception as e:
+        logger.warning(f"Failed to render {spec['chart']} {'-'.join(spec['drivers'])} {spec['session']}: {e}")
+        path = None
+        error = str(e)
+    return {
+        "chart": spec["chart"],
+        "event": spec["event"],
+        "session": spec["session"],
+        "year": spec["year"],
+        "drivers": "-".join(spec["drivers"]) or "grid",
+        "path": path,
+        "seconds": time.perf_counter() - start,
+        "error": error
+    }
+
+def render_chart_group(specs, out_dir, dpi=100):
+    return [render_chart(spec, out_dir, dpi) for spec in specs]
+
+def group_specs(specs):
+    """
+    One group per session, largest first so the longest sessions start early. A session is never
+    split across workers, each of which would otherwise load it again.
+    """
+    by_session = {}
+    for spec in specs:
+        key = (spec["year"], spec["event"], spec["session"])
+        by_session.setdefault(key, []).append(spec)
+    return sorted(by_session.values(), key=len, reverse=True)
+
+def render_batch(specs, out_dir, workers=None, dpi=100):
+    """Render all specs across a process pool, a whole session per task, and return one timing record per chart"""
+    os.makedirs(out_dir, exist_ok=True)
+    groups = group_specs(specs)
+    results = []
+
+    if workers == 1:
+        init_worker()
+        for group in groups:
+            results += render_chart_group(group, out_dir, dpi)
+        return results
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as executor:
+        futures = [executor.submit(render_chart_group, group, out_dir, dpi) for group in groups]
+        for future in as_completed(futures):
+            results += future.result()
+    return results
+
+def print_timing_summary(results, total_seconds=None):
+    failed = [result for result in results if result["error"]]
+    print(f"{'Chart':<16}{'Session':<28}{'Drivers':<12}{'Time (s)':>10}")
+    for result in sorted(results, key=lambda r: r["seconds"], reverse=True):
+        session = f"{result['year']} {result['event']} {result['session']}"
+        status = f"{result['seconds']:.3f}" if not result["error"] else "FAILED"
+        print(f"{result['chart']:<16}{session:<28}{result['drivers']:<12}{status:>10}")
+    render_time = sum(result["seconds"] for result in results)
+    print(f"\nRendered {len(results) - len(failed)}/{len(results)} charts, {render_time:.2f}s of chart time")
+    if total_seconds is not None:
+        print(f"Wall time: {total_seconds:.2f}s")
+    for result in failed:
+        print(f"Failed {result['chart']} {result['drivers']} {result['session']}: {result['error']}")
+
+
+if __name__ == "__main__":
+    event = "Australia"
+    year = 2025
+    drivers = ["HAM", "LEC"]
+
+    start = time.perf_counter()
+    specs = build_weekend_specs(event, year, drivers, sessions=("Qualifying", "Race"))
+    results = render_batch(specs, "renders")
+    print_timing_summary(results, time.perf_counter() - start)
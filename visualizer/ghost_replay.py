@@ -0,0 +1,85 @@
+"""
+Ghost-car Lap Replay
+====================
+
+Animate two or more laps on the track outline. Positions are precomputed and time-aligned by
+`prepare_ghost_data`, the outline is drawn once, and blitting means only the car markers and the
+delta text are redrawn each frame. Saving to .gif/.mp4 renders with the Agg canvas so it works
+without a display.
+
+"""
+
+from matplotlib import pyplot as plt
+from matplotlib import animation
+
+from visualizer.base_plots import get_figure, plot_track_outline
+from data_engine.vis_data import get_fastest_lap, get_median_lap, load_session, prepare_ghost_data
+from data_engine.circuit_geometry import get_circuit_geometry
+
+DEFAULT_COLOURS = ['red', 'blue', 'limegreen', 'orange', 'magenta', 'cyan']
+
+def create_ghost_animation(drivers, ghost_data, outline, title, fps=30, colours=None, fig=None):
+    colours = colours or DEFAULT_COLOURS
+    fig = get_figure(fig, figsize=(12, 6.75))
+    ax = fig.subplots()
+    fig.suptitle(title, size=20, y=0.97)
+    ax.axis('off')
+    ax.set_aspect('equal')
+
+    plot_track_outline(ax, *outline, linewidth=10)
+
+    markers = [
+        ax.plot([], [], 'o', markersize=12, color=colours[i % len(colours)], markeredgecolor='white', label=driver, animated=True)[0]
+        for i, driver in enumerate(drivers)
+    ]
+    delta_text = ax.text(0.02, 0.95, "", transform=ax.transAxes, va='top', family='monospace', animated=True)
+    ax.legend(loc='lower right')
+
+    times, x, y, delta = ghost_data["times"], ghost_data["x"], ghost_data["y"], ghost_data["delta"]
+
+    def init():
+        for marker in markers:
+            marker.set_data([], [])
+        delta_text.set_text("")
+        return markers + [delta_text]
+
+    def update(frame):
+        for i, marker in enumerate(markers):
+            marker.set_data([x[i, frame]], [y[i, frame]])
+        lines = [f"{times[frame]:7.2f}s"]
+        lines += [f"{driver}: {delta[i, frame]:+.3f}s" for i, driver in enumerate(drivers[1:], start=1)]
+        delta_text.set_text("\n".join(lines))
+        return markers + [delta_text]
+
+    return animation.FuncAnimation(fig, update, frames=len(times), init_func=init, blit=True, interval=1000 / fps)
+
+def save_ghost_replay(anim, path, fps=30, dpi=100):
+    """Write the animation to .gif (Pillow) or any ffmpeg-supported video format"""
+    if path.endswith(".gif"):
+        writer = animation.PillowWriter(fps=fps)
+    else:
+        writer = animation.FFMpegWriter(fps=fps)
+    anim.save(path, writer=writer, dpi=dpi)
+
+def plot_ghost_replay(drivers, event, session, year, lap_type="Fastest", fps=30, path=None, show=True):
+    lap_func_map = {"Fastest": get_fastest_lap, "Median": get_median_lap}
+
+    session_obj = load_session(year, event, session)
+    laps = [lap_func_map[lap_type](driver, session_obj) for driver in drivers]
+
+    ghost_data = prepare_ghost_data(laps, fps)
+    outline = get_circuit_geometry(session_obj)["outline"]
+    title = f"{' vs '.join(drivers)} - {lap_type} Lap - {session} {event} {year}"
+
+    if path is not None:
+        plt.switch_backend("Agg")
+    anim = create_ghost_animation(drivers, ghost_data, outline, title, fps)
+    if path is not None:
+        save_ghost_replay(anim, path, fps)
+    elif show:
+        plt.show()
+    return anim
+
+
+if __name__ == "__main__":
+    plot_ghost_replay(["HAM", "LEC"], "Australia", "Qualifying", 2025, path="ghost_replay.gif")
@@ -1,92 +1,110 @@
-from data_engine.race_data import get_cleaned_weekend_data, get_cleaned_session_data
-import fastf1 as f1
-import numpy as np
+import pandas as pd
+
 from visualizer.base_plots import plot_track_map_base, plot_overlay_speed_trace_base, plot_scatter_chart_base, plot_single_trace_base, plot_tyre_strategies_base
-from data_engine.vis_data import get_fastest_lap, get_median_lap, get_laps, prepare_track_data
-import fastf1.plotting
+from data_engine.vis_data import get_fastest_lap, get_median_lap, get_laps, get_session_stints, prepare_track_data, prepare_derived_track_data, load_session
+from data_engine.telemetry_processing import get_session_telemetry, get_processed_lap_channels
+from data_engine.circuit_geometry import get_circuit_geometry
 
-def plot_track_map(driver, event, session, year, metric, lap_type):
+def plot_track_map(driver, event, session, year, metric, lap_type, fig=None, show=True):
     lap_func_map = {"Fastest": get_fastest_lap, "Median": get_median_lap}
 
-    session_obj = f1.get_session(year, event, session)
-    session_obj.load()
+    session_obj = load_session(year, event, session)
 
     lap = lap_func_map[lap_type](driver, session_obj)
     title = f"{event} {session} {year} - {driver} - {lap_type} Lap {metric}: {lap["LapTime"]}"
 
-    plot_track_lap_metric(lap, metric, title)
+    return plot_track_lap_metric(lap, metric, title, get_circuit_geometry(session_obj), fig=fig, show=show)
+
+def plot_track_lap_metric(lap, metric, title, geometry=None, fig=None, show=True):
+    """Track map of one lap's metric, drawn on the circuit's cached outline when `geometry` is given"""
+    x, y, colour, segments = prepare_track_data(lap, metric, geometry=geometry)
+    outline = geometry["outline"] if geometry is not None else (x, y)
+    return plot_track_map_base(lap, colour, segments, title, metric, fig=fig, show=show, outline=outline)
 
-def plot_track_lap_metric(lap, metric, title):
-    x, y, colour, segments = prepare_track_data(lap, metric)
-    plot_track_map_base(lap, colour, segments, title, metric)
+def plot_derived_track_map(driver, event, session, year, metric, lap_type, fig=None, show=True):
+    """Track map of a derived channel (LongAccel, LatAccel, SmoothSpeed, Braking, LiftCoast) from the processed session telemetry"""
+    lap_func_map = {"Fastest": get_fastest_lap, "Median": get_median_lap}
 
-def plot_overlay_speed_traces(d1_name, d2_name, event, session, year, lap_type):
+    session_obj = load_session(year, event, session)
+
+    lap = lap_func_map[lap_type](driver, session_obj)
+    channels = get_processed_lap_channels(get_session_telemetry(year, event, session), driver, lap["LapNumber"])
+    title = f"{event} {session} {year} - {driver} - {lap_type} Lap {metric}: {lap["LapTime"]}"
+
+    x, y, colour, segments = prepare_derived_track_data(channels, metric)
+    outline = get_circuit_geometry(session_obj)["outline"]
+    return plot_track_map_base(lap, colour, segments, title, metric, fig=fig, show=show, outline=outline)
+
+def plot_overlay_speed_traces(d1_name, d2_name, event, session, year, lap_type, fig=None, show=True):
     func_map = {"Fastest": get_fastest_lap, "Median": get_median_lap}
 
-    session_obj = f1.get_session(year, event, session)
-    session_obj.load()
+    session_obj = load_session(year, event, session)
 
     d1_lap = func_map[lap_type](d1_name, session_obj)
     d2_lap = func_map[lap_type](d2_name, session_obj)
 
-    circuit_info = session_obj.get_circuit_info()
+    corners = get_circuit_geometry(session_obj)["corners"]
     title = f"{d1_name}'s and {d2_name}'s {lap_type} Lap in {session} - {event} - {year}"
 
-    plot_overlay_speed_trace_base(d1_name, d2_name, d1_lap, d2_lap, title, circuit_info)
+    return plot_overlay_speed_trace_base(d1_name, d2_name, d1_lap, d2_lap, title, corners, fig=fig, show=show)
 
-def plot_throttle_input_track_map(driver, event, session, year, lap_type):
+def plot_throttle_input_track_map(driver, event, session, year, lap_type, fig=None, show=True):
     func_map = {"Fastest": get_fastest_lap, "Median": get_median_lap}
 
-    session_obj = f1.get_session(year, event, session)
-    session_obj.load()
+    session_obj = load_session(year, event, session)
 
     lap = func_map[lap_type](driver, session_obj)
 
     title = f"{driver}'s throttle input for {lap_type} Lap in {session} - {event} - {year}"
-    plot_track_lap_metric(lap, "Throttle", title)
+    return plot_track_lap_metric(lap, "Throttle", title, get_circuit_geometry(session_obj), fig=fig, show=show)
 
-def plot_throttle_input_trace(driver, event, session, year, lap_type):
+def plot_throttle_input_trace(driver, event, session, year, lap_type, fig=None, show=True):
     func_map = {"Fastest": get_fastest_lap, "Median": get_median_lap}
 
-    session_obj = f1.get_session(year, event, session)
-    session_obj.load()
+    session_obj = load_session(year, event, session)
 
     lap = func_map[lap_type](driver, session_obj)
 
-    circuit_info = session_obj.get_circuit_info()
+    corners = get_circuit_geometry(session_obj)["corners"]
     title = f"{driver}'s throttle input for {lap_type} Lap in {session} - {event} - {year}"
 
-    plot_single_trace_base(driver, lap, title, "Throttle", circuit_info)
+    return plot_single_trace_base(driver, lap, title, "Throttle", corners, fig=fig, show=show)
   
-def plot_laps_scatter_chart(driver, event, session, year):
-    session_obj = f1.get_session(year, event, session)
-    session_obj.load()
+def plot_laps_scatter_chart(driver, event, session, year, fig=None, show=True):
+    session_obj = load_session(year, event, session)
     laps = get_laps(driver, session_obj.laps)
 
-    plot_scatter_chart_base(driver, laps, "")
-
-def get_driver_stints(driver, laps):
-    stints = laps[laps["Driver"] == driver][["Driver", "Stint", "Compound", "LapNumber"]]
-
-    stints = stints.groupby(['Stint', 'Compound']).agg({'LapNumber': 'count', 'Driver': 'first'}).reset_index()
-
-    stints = stints.rename(columns={"LapNumber": "StintLength"})
-    return stints
-
-def plot_tyre_strategies(d1_name, d2_name, event, session, year):
-    session_obj = f1.get_session(year, event, session)
-    session_obj.load()
-
-    d1_laps = get_laps(d1_name, session_obj.laps)
-    d2_laps = get_laps(d2_name, session_obj.laps)
-
-    d1_stints = get_driver_stints(d1_name, d1_laps)
-    d2_stints = get_driver_stints(d2_name, d2_laps)
-
+    return plot_scatter_chart_base(driver, laps, "", fig=fig, show=show)
+
+def get_compound_colours(session_obj):
+    import fastf1.plotting
+    return fastf1.plotting.get_compound_mapping(session=session_obj)
+
+def plot_grid_tyre_strategies(event, session, year, drivers=None, compare=(), title=None, fig=None, show=True):
+    """
+    Every driver's tyre strategy (or just `drivers`'), with the sessions in `compare`, as
+    (event, session, year) tuples, overlaid in a band per session under each driver
+    """
+    sessions = [(event, session, year)] + list(compare)
+    stints = []
+    for overlay_event, overlay_session, overlay_year in sessions:
+        session_stints = get_session_stints(load_session(overlay_year, overlay_event, overlay_session).laps)
+        if len(sessions) > 1:
+            session_stints["Session"] = f"{overlay_event} {overlay_session} {overlay_year}"
+        stints.append(session_stints)
+    stints = pd.concat(stints, ignore_index=True)
+    if drivers is not None:
+        stints = stints[stints["Driver"].isin(drivers)]
+
+    if title is None:
+        title = f"Tyre Strategies during {session} - {event} - {year}"
+        if compare:
+            title += " vs " + ", ".join(f"{e} {s} {y}" for e, s, y in compare)
+    return plot_tyre_strategies_base(stints, title, get_compound_colours(load_session(year, event, session)), fig=fig, show=show)
+
+def plot_tyre_strategies(d1_name, d2_name, event, session, year, fig=None, show=True):
     title = f"{d1_name} and {d2_name} Tyre Strategies during {session} - {event} - {year}"
-
-    plot_tyre_strategies_base(d1_name, d2_name, [d1_stints, d2_stints], title, session_obj)
-
+    return plot_grid_tyre_strategies(event, session, year, [d1_name, d2_name], title=title, fig=fig, show=show)
 
 if __name__ == "__main__":
     driver = "HAM"
@@ -95,5 +113,5 @@ if __name__ == "__main__":
     year = 2025
     
 
-    plot_tyre_strategies("HAM", "LEC", event, session, year)
+    plot_grid_tyre_strategies(event, session, year)
     